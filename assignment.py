@@ -0,0 +1,122 @@
+import numpy as np
+
+try:  # SciPy is optional; the NumPy Hungarian solver below is used without it.
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+
+def cost_matrix(agent_positions, task_positions, heuristic=None):
+    """(agents, tasks) matrix of distances from each agent to each task cell.
+
+    Uses exact distances from a heuristics.DistanceTable when given (one
+    vectorised field lookup per task), Manhattan distances otherwise.
+    Unreachable pairs cost infinity.
+    """
+    agents = np.asarray(agent_positions, dtype=np.int64).reshape(-1, 2)
+    targets = np.asarray(task_positions, dtype=np.int64).reshape(-1, 2)
+    if heuristic is None:
+        return np.abs(agents[:, None, :] - targets[None, :, :]).sum(axis=2).astype(np.float64)
+    costs = np.empty((len(agents), len(targets)), dtype=np.float64)
+    for column, target in enumerate(targets):
+        costs[:, column] = heuristic.distances_to(tuple(target), agents)
+    return costs
+
+
+def greedy_assignment(costs):
+    """Repeatedly take the cheapest remaining (agent, task) pair, as hbh_assignment always has."""
+    costs = np.asarray(costs, dtype=np.float64)
+    pairs = []
+    if not costs.size:
+        return pairs
+    used_rows = np.zeros(costs.shape[0], dtype=bool)
+    used_columns = np.zeros(costs.shape[1], dtype=bool)
+    limit = min(costs.shape)
+    for flat in np.argsort(costs, axis=None, kind='stable'):
+        row, column = divmod(int(flat), costs.shape[1])
+        if not np.isfinite(costs[row, column]):
+            break
+        if used_rows[row] or used_columns[column]:
+            continue
+        used_rows[row] = used_columns[column] = True
+        pairs.append((row, column))
+        if len(pairs) == limit:
+            break
+    return pairs
+
+
+def _hungarian(costs):
+    """Minimum-cost assignment of every row of a (rows <= columns) matrix, O(rows^2 * columns)."""
+    n, m = costs.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    owner = np.zeros(m + 1, dtype=np.int64)  # Row (1-based) assigned to each column, 0 if none
+    way = np.zeros(m + 1, dtype=np.int64)
+    for row in range(1, n + 1):
+        owner[0] = row
+        column = 0
+        min_slack = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[column] = True
+            current = owner[column]
+            free = np.flatnonzero(~used)
+            slack = costs[current - 1, free - 1] - u[current] - v[free]
+            better = slack < min_slack[free]
+            min_slack[free[better]] = slack[better]
+            way[free[better]] = column
+            next_column = free[np.argmin(min_slack[free])]
+            delta = min_slack[next_column]
+            u[owner[used]] += delta
+            v[used] -= delta
+            min_slack[~used] -= delta
+            column = next_column
+            if owner[column] == 0:
+                break
+        while column:
+            previous = way[column]
+            owner[column] = owner[previous]
+            column = previous
+    return [(owner[column] - 1, column - 1) for column in range(1, m + 1) if owner[column]]
+
+
+def hungarian_assignment(costs):
+    """Optimal assignment minimising the total cost; pairs with infinite cost are dropped."""
+    costs = np.asarray(costs, dtype=np.float64)
+    if not costs.size:
+        return []
+    finite = np.isfinite(costs)
+    if not finite.any():
+        return []
+    # Stand-in for infinity that no finite assignment can beat
+    padded = np.where(finite, costs, (np.abs(costs[finite]).max() + 1) * (min(costs.shape) + 1))
+    if linear_sum_assignment is not None:
+        rows, columns = linear_sum_assignment(padded)
+        pairs = list(zip(rows.tolist(), columns.tolist()))
+    elif costs.shape[0] <= costs.shape[1]:
+        pairs = _hungarian(padded)
+    else:
+        pairs = [(row, column) for column, row in _hungarian(padded.T)]
+    return sorted((int(row), int(column)) for row, column in pairs if finite[row, column])
+
+
+STRATEGIES = {
+    'greedy': greedy_assignment,
+    'hungarian': hungarian_assignment,
+}
+
+
+def assign(costs, strategy='greedy'):
+    """Solve an (agents, tasks) cost matrix with one of STRATEGIES, returning (row, column) pairs."""
+    try:
+        solver = STRATEGIES[strategy]
+    except KeyError:
+        raise ValueError(f"Unknown assignment strategy {strategy!r}, expected one of {sorted(STRATEGIES)}")
+    return solver(costs)
+
+
+def select_agent(queue_lengths, distances):
+    """Index of the least busy agent, breaking ties by distance, or None without agents."""
+    if not len(queue_lengths):
+        return None
+    return int(np.lexsort((np.asarray(distances), np.asarray(queue_lengths)))[0])
@@ -0,0 +1,24 @@
+import os
+
+import numpy as np
+
+
+def save_atomic(path, data, compressed=False):
+    """Save an array as .npy, or a dict of arrays as .npz, so `path` is never left half-written.
+
+    The data goes to a temporary file next to `path` that then replaces it
+    in one step, so readers (including concurrent runs) and crashes only
+    ever see the old file or the complete new one.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as file:
+            if isinstance(data, dict):
+                (np.savez_compressed if compressed else np.savez)(file, **data)
+            else:
+                np.save(file, data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,235 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from itertools import islice
+
+import numpy as np
+
+from grid import OBSTACLE
+from map_loader import iter_scenario, load_map
+from mapd_problem import Agent as SimAgent, Map
+from mla_star import Agent, Environment, Task, hbh_assignment, mla_star
+from simulation import SimulationEngine
+
+# One representative map per family under maps/
+MAP_FAMILIES = {
+    'empty': 'maps/empty-32-32.map',
+    'random': 'maps/random-64-64-10.map',
+    'maze': 'maps/maze-32-32-2.map',
+    'room': 'maps/room-64-64-8.map',
+    'warehouse': 'maps/warehouse-10-20-10-2-1.map',
+    'city': 'maps/Berlin_1_256.map',
+}
+ASSIGNMENT_SIZES = (8, 32, 128)
+SIMULATION_AGENTS = (16, 128)
+# Result fields describing the workload; results are only compared when these match.
+WORKLOAD_KEYS = ('queries', 'steps')
+
+
+def scenario_entries(map_file, count):
+    """First `count` entries of the map's even-1 scenario, so every run uses the same queries."""
+    name = os.path.splitext(os.path.basename(map_file))[0]
+    matches = sorted(glob.glob(os.path.join('scenarios', '*', f'{name}-even-1.scen')))
+    if not matches:
+        raise FileNotFoundError(f"No scenario found for {map_file}")
+    return list(islice(iter_scenario(matches[0]), count))
+
+
+def measure(function, repeat, setup=None):
+    """Time `function` `repeat` times (after one warm-up) and measure its peak traced memory once."""
+    state = setup() if setup else None
+    function(state)
+    timings = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        started = time.perf_counter()
+        function(state)
+        timings.append(time.perf_counter() - started)
+
+    state = setup() if setup else None
+    tracemalloc.start()
+    try:
+        function(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'repeat': repeat,
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'peak_memory_bytes': peak,
+    }
+
+
+def bench_mla_star(family, map_file, queries, repeat):
+    environment = Environment.from_grid(load_map(map_file))
+    entries = scenario_entries(map_file, queries + 1)
+    legs = [(entry.start, Task(index, entry.goal, entries[index + 1].start)) for index, entry in enumerate(entries[:-1])]
+
+    def run(_):
+        for start, task in legs:
+            mla_star(start, [task], environment)
+
+    result = measure(run, repeat)
+    result['queries'] = len(legs)
+    return f'mla_star/{family}', result
+
+
+def bench_hbh_assignment(size, map_file, repeat):
+    grid = load_map(map_file)
+    environment = Environment.from_grid(grid)
+    entries = scenario_entries(map_file, 2 * size)
+
+    def setup():
+        agents = [Agent(index, entry.start) for index, entry in enumerate(entries[:size])]
+        tasks = [Task(index, entry.goal, entries[size + index].goal) for index, entry in enumerate(entries[:size])]
+        return agents, tasks
+
+    def run(state):
+        agents, tasks = state
+        hbh_assignment(agents, tasks, environment)
+
+    return f'hbh_assignment/{size}x{size}', measure(run, repeat, setup)
+
+
+def bench_time_step(num_agents, map_file, steps, repeat):
+    grid = load_map(map_file)
+    ys, xs = np.nonzero(grid.cells == OBSTACLE)
+    obstacles = list(zip(xs.tolist(), ys.tolist()))
+    starts = [entry.start for entry in scenario_entries(map_file, num_agents)]
+
+    def setup():
+        agents = [SimAgent(name=f"Agent {index}", location=start) for index, start in enumerate(starts)]
+        return Map(grid.width, grid.height, obstacles=obstacles, agents=agents, seed=0)
+
+    def run(game_map):
+        for _ in range(steps):
+            game_map.time_step()
+
+    result = measure(run, repeat, setup)
+    result['steps'] = steps
+    result['steps_per_second'] = steps / result['median']
+    return f'time_step/{num_agents}', result
+
+
+def bench_engine_step(num_agents, map_file, steps, repeat):
+    grid = load_map(map_file)
+    entries = scenario_entries(map_file, num_agents)
+
+    def setup():
+        engine = SimulationEngine(grid, [entry.start for entry in entries])
+        for agent, entry in enumerate(entries):
+            engine.assign(agent, engine.add_task(entry.goal, entry.start))
+        return engine
+
+    def run(engine):
+        engine.run(steps)
+
+    result = measure(run, repeat, setup)
+    result['steps'] = steps
+    result['steps_per_second'] = steps / result['median']
+    return f'engine_step/{num_agents}', result
+
+
+def run_suite(repeat=5, quick=False):
+    families = dict(list(MAP_FAMILIES.items())[:3]) if quick else MAP_FAMILIES
+    sizes = ASSIGNMENT_SIZES[:2] if quick else ASSIGNMENT_SIZES
+    results = {}
+    for family, map_file in families.items():
+        name, result = bench_mla_star(family, map_file, queries=5 if quick else 20, repeat=repeat)
+        results[name] = result
+    for size in sizes:
+        name, result = bench_hbh_assignment(size, MAP_FAMILIES['warehouse'], repeat)
+        results[name] = result
+    for num_agents in SIMULATION_AGENTS:
+        name, result = bench_time_step(num_agents, MAP_FAMILIES['warehouse'], steps=50, repeat=repeat)
+        results[name] = result
+        name, result = bench_engine_step(num_agents, MAP_FAMILIES['warehouse'], steps=500, repeat=repeat)
+        results[name] = result
+    return {
+        'meta': {
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'quick': quick,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=0.10, memory_threshold=0.25):
+    """Return (name, metric, baseline, current, ratio) rows for every regression beyond the thresholds."""
+    regressions = []
+    for name, result in current['results'].items():
+        reference = baseline['results'].get(name)
+        if reference is None or any(reference.get(key) != result.get(key) for key in WORKLOAD_KEYS):
+            continue  # Not the same workload, e.g. a --quick run against a full one
+        for metric, limit in (('median', threshold), ('peak_memory_bytes', memory_threshold)):
+            before, after = reference.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            ratio = after / before
+            if ratio > 1 + limit:
+                regressions.append((name, metric, before, after, ratio))
+    return regressions
+
+
+def print_results(report, baseline=None):
+    for name, result in sorted(report['results'].items()):
+        line = f"{name:28s} median {result['median'] * 1000:10.3f} ms   peak {result['peak_memory_bytes'] / 1024:10.1f} KiB"
+        reference = (baseline or {}).get('results', {}).get(name)
+        if reference:
+            line += f"   x{result['median'] / reference['median']:.2f} vs baseline"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the planning and simulation stack.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help="Run the suite and save the results as JSON")
+    run_parser.add_argument('--output', default='bench_results.json')
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--quick', action='store_true', help="Fewer maps, queries and sizes")
+    run_parser.add_argument('--baseline', help="Compare against this earlier results file")
+    run_parser.add_argument('--threshold', type=float, default=0.10)
+    compare_parser = subparsers.add_parser('compare', help="Compare two saved result files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        report = run_suite(repeat=args.repeat, quick=args.quick)
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+        baseline_file = args.baseline
+    else:
+        with open(args.current, 'r') as file:
+            report = json.load(file)
+        baseline_file = args.baseline
+
+    baseline = None
+    if baseline_file:
+        with open(baseline_file, 'r') as file:
+            baseline = json.load(file)
+    print_results(report, baseline)
+    if baseline is None:
+        return 0
+
+    regressions = compare(baseline, report, threshold=args.threshold)
+    for name, metric, before, after, ratio in regressions:
+        print(f"REGRESSION {name} {metric}: {before:.6g} -> {after:.6g} (x{ratio:.2f})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
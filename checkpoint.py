@@ -0,0 +1,158 @@
+import glob
+import logging
+import os
+from array import array
+
+import numpy as np
+
+from atomic_io import save_atomic
+from mapd_problem import Map
+
+logger = logging.getLogger(__name__)
+
+
+def save_snapshot(game_map, path):
+    """Write the full state of a mapd_problem.Map (grid, agents, task queues, RNG) to a compressed .npz."""
+    save_atomic(path, game_map.state_arrays(), compressed=True)
+
+
+def load_snapshot(path):
+    with np.load(path) as data:
+        return Map.from_state(data)
+
+
+class Checkpointer:
+    """Writes a snapshot of a Map every `every` steps into `directory`, keeping the newest `keep`."""
+
+    def __init__(self, directory, every=1000, keep=3):
+        if keep < 1:
+            raise ValueError("keep must be at least 1")
+        self.directory = directory
+        self.every = every
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, time):
+        return os.path.join(self.directory, f"snapshot_{time:010d}.npz")
+
+    def snapshots(self):
+        """Snapshot paths, oldest first."""
+        return sorted(glob.glob(os.path.join(self.directory, 'snapshot_*.npz')))
+
+    def latest(self):
+        snapshots = self.snapshots()
+        return snapshots[-1] if snapshots else None
+
+    def maybe_save(self, game_map):
+        """Save if the map's time is a multiple of `every`; returns the path written, if any."""
+        if game_map.time % self.every:
+            return None
+        path = self.path(game_map.time)
+        save_snapshot(game_map, path)
+        snapshots = self.snapshots()
+        for old in snapshots[:len(snapshots) - self.keep]:
+            os.remove(old)
+        logger.info("Checkpoint at t=%d written to %s", game_map.time, path)
+        return path
+
+    def run(self, game_map, steps):
+        """Advance `game_map` by `steps` time steps, checkpointing along the way."""
+        for _ in range(steps):
+            game_map.time_step()
+            self.maybe_save(game_map)
+        return game_map
+
+    def resume(self):
+        """Map restored from the latest snapshot, or None if there is none."""
+        path = self.latest()
+        return load_snapshot(path) if path else None
+
+
+class ReplayLog:
+    """Per-step record of a Map run: agent moves and the tasks created.
+
+    Attach with `game_map.recorder = log`. Only moves are stored, as flat
+    integer arrays, so a long run costs a few bytes per agent move.
+    `fast_forward` replays the moves instead of calling move_to, while
+    still drawing tasks from the map's RNG so its state stays in sync.
+    The recorded tasks check that the replay has not diverged.
+    """
+
+    def __init__(self, start_time=0):
+        self.start_time = start_time
+        self.move_offsets = array('q', [0])  # Moves of step k are move_* [offsets[k]:offsets[k + 1]]
+        self.move_agent = array('i')
+        self.move_x = array('i')
+        self.move_y = array('i')
+        self.task_step = array('q')
+        self.task_locations = array('i')  # px, py, dx, dy per recorded task
+
+    @property
+    def steps(self):
+        return len(self.move_offsets) - 1
+
+    @property
+    def end_time(self):
+        return self.start_time + self.steps
+
+    def agent_moved(self, index, location):
+        self.move_agent.append(index)
+        self.move_x.append(location[0])
+        self.move_y.append(location[1])
+
+    def task_added(self, task):
+        self.task_step.append(self.steps)
+        self.task_locations.extend(task.pickup_location + task.delivery_location)
+
+    def end_step(self):
+        self.move_offsets.append(len(self.move_agent))
+
+    def fast_forward(self, game_map, until=None):
+        """Replay recorded steps on `game_map` (e.g. restored from a snapshot) up to time `until`."""
+        until = self.end_time if until is None else min(until, self.end_time)
+        if not self.start_time <= game_map.time <= until:
+            raise ValueError(f"Map time {game_map.time} is outside the log ({self.start_time}-{self.end_time})")
+        recorder, game_map.recorder = game_map.recorder, None
+        task_steps = self.task_step.tolist()
+        next_task = int(np.searchsorted(task_steps, game_map.time - self.start_time))
+        try:
+            while game_map.time < until:
+                step = game_map.time - self.start_time
+                first, last = self.move_offsets[step], self.move_offsets[step + 1]
+                moves = {agent: (x, y) for agent, x, y in zip(self.move_agent[first:last], self.move_x[first:last],
+                                                              self.move_y[first:last])}
+                tasks_before = game_map._task_count
+                game_map._time_step(moves)
+                expected = None
+                if next_task < len(task_steps) and task_steps[next_task] == step:
+                    expected = tuple(self.task_locations[4 * next_task:4 * next_task + 4])
+                    next_task += 1
+                created = None
+                if game_map._task_count != tasks_before:
+                    task = game_map.tasks[-1]  # Appended this step; it cannot be delivered before the next one
+                    created = task.pickup_location + task.delivery_location
+                if created != expected:
+                    raise ValueError(f"Replay diverged at t={game_map.time - 1}: task {created} != recorded {expected}")
+        finally:
+            game_map.recorder = recorder
+        return game_map
+
+    def save(self, path):
+        save_atomic(path, {
+            'start_time': np.array([self.start_time], dtype=np.int64),
+            'move_offsets': np.frombuffer(self.move_offsets, dtype=np.int64),
+            'move_agent': np.frombuffer(self.move_agent, dtype=np.int32),
+            'move_x': np.frombuffer(self.move_x, dtype=np.int32),
+            'move_y': np.frombuffer(self.move_y, dtype=np.int32),
+            'task_step': np.frombuffer(self.task_step, dtype=np.int64),
+            'task_locations': np.frombuffer(self.task_locations, dtype=np.int32),
+        }, compressed=True)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            log = cls(int(data['start_time'][0]))
+            for name, typecode in (('move_offsets', 'q'), ('move_agent', 'i'), ('move_x', 'i'), ('move_y', 'i'),
+                                   ('task_step', 'q'), ('task_locations', 'i')):
+                setattr(log, name, array(typecode, data[name].tobytes()))
+        return log
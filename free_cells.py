@@ -0,0 +1,63 @@
+import numpy as np
+
+
+class FreeCellIndex:
+    """Set of flat cell indices with O(1) add, remove, membership and uniform sampling.
+
+    Members are packed at the front of a dense array and each cell remembers
+    its slot, so removal swaps the last member into the freed slot.
+    """
+
+    def __init__(self, num_cells):
+        self._dense = np.empty(num_cells, dtype=np.int64)
+        self._slot = np.full(num_cells, -1, dtype=np.int64)
+        self._size = 0
+
+    @classmethod
+    def from_mask(cls, mask):
+        """Build an index holding every cell where the flat boolean `mask` is True."""
+        mask = np.asarray(mask, dtype=bool).ravel()
+        return cls.from_cells(mask.size, np.flatnonzero(mask))
+
+    @classmethod
+    def from_cells(cls, num_cells, cells):
+        """Build an index whose members are `cells` in this slot order (as returned by cells())."""
+        cells = np.asarray(cells, dtype=np.int64)
+        index = cls(num_cells)
+        index._size = cells.size
+        index._dense[:cells.size] = cells
+        index._slot[cells] = np.arange(cells.size)
+        return index
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, cell):
+        return 0 <= cell < len(self._slot) and self._slot[cell] >= 0
+
+    def add(self, cell):
+        if self._slot[cell] >= 0:
+            return
+        self._dense[self._size] = cell
+        self._slot[cell] = self._size
+        self._size += 1
+
+    def discard(self, cell):
+        slot = self._slot[cell]
+        if slot < 0:
+            return
+        self._size -= 1
+        last = self._dense[self._size]
+        self._dense[slot] = last
+        self._slot[last] = slot
+        self._slot[cell] = -1
+
+    def sample(self, rng):
+        """Uniformly random member using `rng.randrange` (e.g. the random module), or None if empty."""
+        if not self._size:
+            return None
+        return int(self._dense[rng.randrange(self._size)])
+
+    def cells(self):
+        """Current members as an array view (invalidated by the next update)."""
+        return self._dense[:self._size]
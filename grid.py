@@ -0,0 +1,96 @@
+from array import array
+
+import numpy as np
+
+# Cell codes stored in Grid.cells. Only OBSTACLE blocks movement; the task
+# markers are written by the simulator and ignored by the neighbor table.
+FREE = 0
+OBSTACLE = 1
+PICKUP = 2
+DELIVERY = 3
+
+# 4-directional movement, in the order the planner has always expanded neighbors.
+DIRECTIONS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+
+class Grid:
+    """Grid map stored as a (height, width) uint8 array with flat cell indices.
+
+    Positions are (x, y) tuples and the flat index of a cell is y * width + x.
+    The neighbor table is built once in CSR form: the neighbors of cell i are
+    neighbor_indices[neighbor_offsets[i]:neighbor_offsets[i + 1]].
+    """
+
+    def __init__(self, width, height, obstacles=None, cells=None):
+        self.width = width
+        self.height = height
+        self.num_cells = width * height
+        self.version = 0  # Bumped on every obstacle edit
+        if cells is None:
+            self.cells = np.zeros((height, width), dtype=np.uint8)
+            for (x, y) in obstacles or []:
+                self.cells[y, x] = OBSTACLE
+        else:
+            self.cells = np.ascontiguousarray(cells, dtype=np.uint8)
+            assert self.cells.shape == (height, width)
+        self._build_neighbor_table()
+
+    @classmethod
+    def from_passable(cls, passable):
+        """Build a grid from a (height, width) boolean array that is True on free cells."""
+        passable = np.asarray(passable, dtype=bool)
+        height, width = passable.shape
+        return cls(width, height, cells=np.where(passable, FREE, OBSTACLE))
+
+    @property
+    def passable(self):
+        return self.cells != OBSTACLE
+
+    def _build_neighbor_table(self):
+        flat = self.cells.ravel() != OBSTACLE
+        ys, xs = np.divmod(np.arange(self.num_cells, dtype=np.int64), self.width)
+        candidates = np.empty((self.num_cells, len(DIRECTIONS)), dtype=np.int64)
+        valid = np.empty((self.num_cells, len(DIRECTIONS)), dtype=bool)
+        for k, (dx, dy) in enumerate(DIRECTIONS):
+            nx, ny = xs + dx, ys + dy
+            inside = (nx >= 0) & (nx < self.width) & (ny >= 0) & (ny < self.height)
+            target = np.where(inside, ny * self.width + nx, 0)
+            candidates[:, k] = target
+            valid[:, k] = inside & flat & flat[target]
+
+        self.neighbor_offsets = np.zeros(self.num_cells + 1, dtype=np.int32)
+        np.cumsum(valid.sum(axis=1), out=self.neighbor_offsets[1:])
+        self.neighbor_indices = candidates[valid].astype(np.int32)
+        # Compact copies for scalar access from pure-Python search loops.
+        self.offsets = array('i', self.neighbor_offsets.tobytes())
+        self.indices = array('i', self.neighbor_indices.tobytes())
+
+    def set_obstacle(self, position, blocked=True):
+        """Add or remove an obstacle and rebuild the neighbor table."""
+        x, y = position
+        self.cells[y, x] = OBSTACLE if blocked else FREE
+        self._build_neighbor_table()
+        self.version += 1
+
+    def index(self, position):
+        return position[1] * self.width + position[0]
+
+    def position(self, index):
+        y, x = divmod(index, self.width)
+        return (x, y)
+
+    def in_bounds(self, position):
+        return 0 <= position[0] < self.width and 0 <= position[1] < self.height
+
+    def is_passable(self, position):
+        return self.in_bounds(position) and self.cells[position[1], position[0]] != OBSTACLE
+
+    def neighbor_indices_of(self, index):
+        return self.indices[self.offsets[index]:self.offsets[index + 1]]
+
+    def neighbors(self, position):
+        """Passable 4-connected neighbors of `position` as (x, y) tuples."""
+        if not self.is_passable(position):
+            return []
+        width = self.width
+        return [(i % width, i // width) for i in self.neighbor_indices_of(position[1] * width + position[0])]
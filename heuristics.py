@@ -0,0 +1,174 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from atomic_io import save_atomic
+from grid import Grid
+
+
+DEFAULT_CACHE_DIR = ".heuristic_cache"
+
+
+def grid_hash(passable):
+    """Return a stable hash of a passability array (used as the cache key for a map)."""
+    passable = np.ascontiguousarray(passable, dtype=bool)
+    digest = hashlib.sha1()
+    digest.update(np.asarray(passable.shape, dtype=np.int64).tobytes())
+    digest.update(passable.tobytes())
+    return digest.hexdigest()
+
+
+def file_hash(path):
+    """Return the SHA-1 of a map file on disk."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def bfs_distance_field(grid, source, dtype=np.uint32):
+    """Exact 4-connected BFS distances from `source` (x, y) to every cell of `grid`.
+
+    Unreachable and blocked cells hold the maximum value of `dtype`. The
+    search runs frontier by frontier over the grid's CSR neighbor table.
+    """
+    unreachable = np.iinfo(dtype).max
+    offsets = grid.neighbor_offsets
+    indices = grid.neighbor_indices
+    dist = np.full(grid.num_cells, unreachable, dtype=dtype)
+
+    if grid.is_passable(source):
+        visited = np.zeros(grid.num_cells, dtype=bool)
+        frontier = np.array([grid.index(source)], dtype=np.int64)
+        visited[frontier] = True
+        depth = 0
+        while frontier.size:
+            dist[frontier] = depth
+            # Gather the CSR rows of every frontier cell in one shot.
+            starts = offsets[frontier]
+            counts = offsets[frontier + 1] - starts
+            rows = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            candidates = indices[rows]
+            frontier = np.unique(candidates[~visited[candidates]])
+            visited[frontier] = True
+            depth += 1
+
+    return dist.reshape(grid.height, grid.width)
+
+
+class DistanceTable:
+    """Exact distance-to-goal heuristic backed by cached BFS distance fields.
+
+    Fields are computed on demand for each goal cell, kept in a bounded LRU in
+    memory and, when `cache_dir` is set, persisted as `.npy` files that are
+    memory-mapped back in on later runs. The on-disk cache is keyed by
+    `map_key` (by default the hash of the passability array).
+    """
+
+    def __init__(self, grid, capacity=256, cache_dir=DEFAULT_CACHE_DIR, map_key=None):
+        if not isinstance(grid, Grid):
+            grid = Grid.from_passable(grid)
+        self.grid = grid
+        self.passable = grid.passable
+        self.height, self.width = self.passable.shape
+        self.capacity = capacity
+        self.map_key = map_key or grid_hash(self.passable)
+        self._fixed_key = map_key is not None
+        self._version = grid.version
+        # Distances never exceed the number of cells, so pick the smallest dtype that fits.
+        self.dtype = np.uint16 if self.passable.size < np.iinfo(np.uint16).max else np.uint32
+        self.unreachable = int(np.iinfo(self.dtype).max)
+        self.cache_dir = os.path.join(cache_dir, self.map_key) if cache_dir else None
+        self._fields = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_environment(cls, environment, **kwargs):
+        return cls(environment.grid, **kwargs)
+
+    @classmethod
+    def from_map_file(cls, path, grid, **kwargs):
+        """Build a table whose disk cache is keyed by the hash of the map file at `path`."""
+        kwargs.setdefault('map_key', file_hash(path))
+        return cls(grid, **kwargs)
+
+    def field(self, goal):
+        """Return the (height, width) distance field towards `goal`."""
+        if self.grid.version != self._version:
+            self._rebind()
+        goal = (int(goal[0]), int(goal[1]))
+        field = self._fields.get(goal)
+        if field is not None:
+            self._fields.move_to_end(goal)
+            self.hits += 1
+            return field
+
+        self.misses += 1
+        field = self._load(goal)
+        if field is None:
+            field = bfs_distance_field(self.grid, goal, dtype=self.dtype)
+            self._store(goal, field)
+
+        self._fields[goal] = field
+        if len(self._fields) > self.capacity:
+            self._fields.popitem(last=False)
+        return field
+
+    def distance(self, position, goal):
+        """Exact shortest-path length, or infinity if `goal` is unreachable from `position`."""
+        value = int(self.field(goal)[position[1], position[0]])
+        return float('inf') if value == self.unreachable else value
+
+    def distances_to(self, goal, positions):
+        """Vectorised lookup of distances from many (x, y) positions to `goal`."""
+        positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+        values = self.field(goal)[positions[:, 1], positions[:, 0]].astype(np.float64)
+        values[values == self.unreachable] = np.inf
+        return values
+
+    def precompute(self, goals):
+        """Warm the cache for a collection of goal cells (pickups, deliveries, endpoints)."""
+        for goal in goals:
+            self.field(goal)
+
+    def clear(self):
+        self._fields.clear()
+
+    def _rebind(self):
+        """Drop every field after an obstacle edit and re-key the disk cache to the new grid."""
+        self._fields.clear()
+        self.passable = self.grid.passable
+        self._version = self.grid.version
+        if not self._fixed_key:
+            self.map_key = grid_hash(self.passable)
+            if self.cache_dir:
+                self.cache_dir = os.path.join(os.path.dirname(self.cache_dir), self.map_key)
+        else:
+            self.cache_dir = None  # A file hash no longer describes the edited grid
+
+    def _path(self, goal):
+        return os.path.join(self.cache_dir, f"{goal[0]}_{goal[1]}.npy")
+
+    def _load(self, goal):
+        if not self.cache_dir:
+            return None
+        path = self._path(goal)
+        if not os.path.exists(path):
+            return None
+        try:
+            field = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        if field.shape != self.passable.shape or field.dtype != self.dtype:
+            return None
+        return field
+
+    def _store(self, goal, field):
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        save_atomic(self._path(goal), field)
@@ -0,0 +1,335 @@
+import heapq
+import logging
+import os
+import time
+from array import array
+
+import numpy as np
+
+from atomic_io import save_atomic
+from heuristics import DEFAULT_CACHE_DIR, grid_hash
+
+logger = logging.getLogger(__name__)
+
+# Entrances narrower than this get one transition in their middle, wider ones one at each end.
+MAX_SINGLE_TRANSITION = 6
+_START, _GOAL = -1, -2
+
+
+def _open_runs(mask):
+    """Half-open (start, end) ranges of the True runs in a 1-D boolean array."""
+    padded = np.concatenate(([False], mask, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+
+class HierarchicalPlanner:
+    """HPA*-style planner for large maps.
+
+    The grid is cut into square clusters of `cluster_size` cells. Each
+    maximal open stretch of a cluster border is an entrance with one or two
+    transitions. The transition cells inside a cluster are linked by their
+    exact in-cluster distances. This abstract graph is built once per map and
+    cached on disk, keyed by the passability hash and the cluster size.
+    Queries link the start and goal into the graph and search it with
+    weighted A*, and the chosen abstract edges are turned into cells one by
+    one. With `refine` a final A* finds the shortest path through the
+    clusters the abstract path visits; it never makes a path longer but
+    costs more than the abstract search itself, so it is off by default.
+
+    By default paths carry no optimality bound: transitions sit at fixed
+    points of each entrance, and `weight` above 1 speeds up the abstract
+    search at the price of abstract paths up to `weight` times longer
+    again. With `bounded` every path is at most `weight` times the shortest
+    one. Given a heuristics.DistanceTable, a path over that bound is
+    replaced by the optimal one read off the exact distance field; without
+    one, the query runs weighted A* on the flat grid instead.
+    """
+
+    def __init__(self, grid, cluster_size=16, weight=1.0, cache_dir=DEFAULT_CACHE_DIR, refine=False, bounded=False):
+        if weight < 1:
+            raise ValueError("weight must be at least 1")
+        self.grid = grid
+        self.cluster_size = cluster_size
+        self.weight = weight
+        self.refine = refine
+        self.bounded = bounded
+        self.cache_dir = cache_dir
+        self.expanded = 0  # Abstract nodes and flat cells expanded by the last search
+        self._version = None
+        self._prepare()
+
+    @property
+    def num_nodes(self):
+        return len(self._cells)
+
+    def _cache_path(self):
+        return os.path.join(self.cache_dir, grid_hash(self.grid.passable), f"hpa_{self.cluster_size}.npz")
+
+    def _prepare(self):
+        """(Re)build the cluster lookup and the abstract graph for the current grid version."""
+        grid, size = self.grid, self.cluster_size
+        self._clusters_x = -(-grid.width // size)
+        ys, xs = np.divmod(np.arange(grid.num_cells, dtype=np.int64), grid.width)
+        self._cluster = array('i', ((ys // size) * self._clusters_x + xs // size).astype(np.int32).tobytes())
+
+        graph = self._load() if self.cache_dir else None
+        if graph is None:
+            started = time.perf_counter()
+            graph = self._build()
+            logger.info("Built abstract graph with %d nodes in %.2fs", len(graph[0]), time.perf_counter() - started)
+            if self.cache_dir:
+                self._save(graph)
+        cells, offsets, targets, costs = graph
+
+        self._cells = cells.tolist()
+        self._node_of = {cell: node for node, cell in enumerate(self._cells)}
+        targets, costs, offsets = targets.tolist(), costs.tolist(), offsets.tolist()
+        self._edges = [list(zip(targets[offsets[node]:offsets[node + 1]], costs[offsets[node]:offsets[node + 1]]))
+                       for node in range(len(self._cells))]
+        self._cluster_nodes = {}
+        for node, cell in enumerate(self._cells):
+            self._cluster_nodes.setdefault(self._cluster[cell], []).append(node)
+        self._version = grid.version
+
+    def _transitions(self):
+        """(cell, cell) pairs facing each other across cluster borders."""
+        grid, size = self.grid, self.cluster_size
+        passable, width = grid.passable, grid.width
+        pairs = []
+        for x in range(size, grid.width, size):
+            for y0 in range(0, grid.height, size):
+                column = passable[y0:y0 + size, x - 1] & passable[y0:y0 + size, x]
+                for start, end in _open_runs(column):
+                    rows = [(start + end - 1) // 2] if end - start < MAX_SINGLE_TRANSITION else [start, end - 1]
+                    pairs.extend(((y0 + y) * width + x - 1, (y0 + y) * width + x) for y in rows)
+        for y in range(size, grid.height, size):
+            for x0 in range(0, grid.width, size):
+                row = passable[y - 1, x0:x0 + size] & passable[y, x0:x0 + size]
+                for start, end in _open_runs(row):
+                    columns = [(start + end - 1) // 2] if end - start < MAX_SINGLE_TRANSITION else [start, end - 1]
+                    pairs.extend(((y - 1) * width + x0 + x, y * width + x0 + x) for x in columns)
+        return pairs
+
+    def _build(self):
+        pairs = self._transitions()
+        node_of = {}
+        for pair in pairs:
+            for cell in pair:
+                node_of.setdefault(cell, len(node_of))
+        edges = [[] for _ in node_of]
+        for a, b in pairs:
+            edges[node_of[a]].append((node_of[b], 1))
+            edges[node_of[b]].append((node_of[a], 1))
+
+        members = {}
+        for cell, node in node_of.items():
+            members.setdefault(self._cluster[cell], []).append(cell)
+        for cells in members.values():
+            for source in cells:
+                distances, _ = self._cluster_bfs(source, cells)
+                edges[node_of[source]].extend((node_of[cell], distances[cell])
+                                              for cell in cells if cell != source and cell in distances)
+
+        cells = np.array(sorted(node_of, key=node_of.get), dtype=np.int64)
+        offsets = np.zeros(len(edges) + 1, dtype=np.int64)
+        np.cumsum([len(row) for row in edges], out=offsets[1:])
+        targets = np.array([node for row in edges for node, _ in row], dtype=np.int64)
+        costs = np.array([cost for row in edges for _, cost in row], dtype=np.int64)
+        return cells, offsets, targets, costs
+
+    def _load(self):
+        path = self._cache_path()
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return data['cells'], data['offsets'], data['targets'], data['costs']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save(self, graph):
+        path = self._cache_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        cells, offsets, targets, costs = graph
+        save_atomic(path, {'cells': cells, 'offsets': offsets, 'targets': targets, 'costs': costs})
+
+    def _cluster_bfs(self, source, targets=()):
+        """BFS from `source` that never leaves its cluster.
+
+        Stops once every cell of `targets` is reached. Returns (distances,
+        parents) as dicts over flat cell indices.
+        """
+        offsets, indices, clusters = self.grid.offsets, self.grid.indices, self._cluster
+        cluster = clusters[source]
+        distances, parents = {source: 0}, {source: -1}
+        remaining = set(targets)
+        remaining.discard(source)
+        frontier, depth = [source], 0
+        while frontier and remaining:
+            depth += 1
+            next_frontier = []
+            for cell in frontier:
+                for k in range(offsets[cell], offsets[cell + 1]):
+                    neighbor = indices[k]
+                    if neighbor in distances or clusters[neighbor] != cluster:
+                        continue
+                    distances[neighbor] = depth
+                    parents[neighbor] = cell
+                    remaining.discard(neighbor)
+                    next_frontier.append(neighbor)
+            frontier = next_frontier
+        return distances, parents
+
+    def _links(self, cell):
+        """In-cluster distances from `cell` to the abstract nodes of its cluster."""
+        nodes = self._cluster_nodes.get(self._cluster[cell], [])
+        distances, _ = self._cluster_bfs(cell, [self._cells[node] for node in nodes])
+        return {node: distances[self._cells[node]] for node in nodes if self._cells[node] in distances}
+
+    def _segment(self, source, target):
+        """Cells from `source` to `target` (same cluster or adjacent), excluding `source`."""
+        if target in self.grid.neighbor_indices_of(source):
+            return [target]  # A transition across a cluster border
+        _, parents = self._cluster_bfs(source, [target])
+        cells = []
+        while target != source:
+            cells.append(target)
+            target = parents[target]
+        cells.reverse()
+        return cells
+
+    def search(self, start, goal, heuristic=None):
+        """Path from `start` to `goal` as a list of (x, y) positions, or None.
+
+        `heuristic` is an optional heuristics.DistanceTable. It is only used by
+        `bounded` queries; the abstract search uses Manhattan distance.
+        """
+        grid = self.grid
+        if grid.version != self._version:
+            self._prepare()
+        self.expanded = 0
+        if not grid.is_passable(start) or not grid.is_passable(goal):
+            return None
+        source, target = grid.index(start), grid.index(goal)
+        if source == target:
+            return [tuple(start)]
+        if self.bounded:
+            if heuristic is None:
+                path_cells = self._corridor_search(source, target, weight=self.weight)
+                return None if path_cells is None else [grid.position(cell) for cell in path_cells]
+            exact = heuristic.distance(start, goal)
+            if exact == float('inf'):
+                return None
+
+        # Same cluster: the in-cluster path is a candidate the abstract path has to beat.
+        best_cost, best_nodes = float('inf'), None
+        if self._cluster[source] == self._cluster[target]:
+            distances, _ = self._cluster_bfs(source, [target])
+            if target in distances:
+                best_cost, best_nodes = distances[target], []
+
+        start_links, goal_links = self._links(source), self._links(target)
+        width, weight, cells = grid.width, self.weight, self._cells
+        gy, gx = divmod(target, width)
+
+        def estimate(node):
+            y, x = divmod(cells[node], width)
+            return weight * (abs(x - gx) + abs(y - gy))
+
+        costs, parents = {_START: 0}, {_START: None}
+        open_list = [(0, 0, 0, _START)]
+        tie, expanded = 1, 0
+        while open_list:
+            _, _, g, node = heapq.heappop(open_list)
+            if g > costs[node] or g >= best_cost:
+                continue
+            if node == _GOAL:
+                best_cost, best_nodes = g, self._abstract_path(parents)
+                break
+            expanded += 1
+            if node == _START:
+                successors = start_links.items()
+            else:
+                successors = self._edges[node]
+                if node in goal_links:
+                    successors = successors + [(_GOAL, goal_links[node])]
+            for successor, cost in successors:
+                next_g = g + cost
+                if next_g >= costs.get(successor, best_cost):
+                    continue
+                costs[successor] = next_g
+                parents[successor] = node
+                f = next_g if successor == _GOAL else next_g + estimate(successor)
+                heapq.heappush(open_list, (f, tie, next_g, successor))
+                tie += 1
+        self.expanded = expanded
+        if best_nodes is None:
+            return None
+
+        # Refine each abstract edge into cells.
+        waypoints = [cells[node] for node in best_nodes] + [target]
+        path_cells = [source]
+        for waypoint in waypoints:
+            path_cells.extend(self._segment(path_cells[-1], waypoint))
+        if self.refine and best_nodes:
+            path_cells = self._corridor_search(source, target, {self._cluster[cell] for cell in path_cells})
+        if self.bounded and len(path_cells) - 1 > weight * exact:
+            path_cells = self._descend(source, target, heuristic.field(goal).ravel())
+        return [(cell % width, cell // width) for cell in path_cells]
+
+    def _descend(self, source, target, field):
+        """Shortest cell path from `source` to `target`, following the exact distance `field` towards `target`."""
+        offsets, indices = self.grid.offsets, self.grid.indices
+        path = [source]
+        cell = source
+        while cell != target:
+            closer = int(field[cell]) - 1
+            cell = next(indices[k] for k in range(offsets[cell], offsets[cell + 1]) if field[indices[k]] == closer)
+            path.append(cell)
+        self.expanded += len(path) - 1
+        return path
+
+    def _corridor_search(self, source, target, corridor=None, weight=1):
+        """Weighted A* cell path from `source` to `target`, or None if it is unreachable.
+
+        Only clusters in `corridor` are entered, unless it is None. The path
+        is at most `weight` times the shortest one through those clusters.
+        """
+        offsets, indices, clusters, width = self.grid.offsets, self.grid.indices, self._cluster, self.grid.width
+        gy, gx = divmod(target, width)
+        costs, parents = {source: 0}, {source: -1}
+        open_list = [(0, 0, source)]
+        expanded = 0
+        while open_list:
+            _, g, cell = heapq.heappop(open_list)
+            if cell == target:
+                break
+            if g > costs[cell]:
+                continue
+            expanded += 1
+            for k in range(offsets[cell], offsets[cell + 1]):
+                neighbor = indices[k]
+                if corridor is not None and clusters[neighbor] not in corridor or g + 1 >= costs.get(neighbor, g + 2):
+                    continue
+                costs[neighbor] = g + 1
+                parents[neighbor] = cell
+                y, x = divmod(neighbor, width)
+                heapq.heappush(open_list, (g + 1 + weight * (abs(x - gx) + abs(y - gy)), g + 1, neighbor))
+        self.expanded += expanded
+        if target not in parents:
+            return None
+        path = [target]
+        while parents[path[-1]] != -1:
+            path.append(parents[path[-1]])
+        path.reverse()
+        return path
+
+    def _abstract_path(self, parents):
+        nodes = []
+        node = parents[_GOAL]
+        while node != _START:
+            nodes.append(node)
+            node = parents[node]
+        nodes.reverse()
+        return nodes
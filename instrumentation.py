@@ -0,0 +1,140 @@
+import contextlib
+import cProfile
+import io
+import json
+import pstats
+import time
+import tracemalloc
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('stats', 'name', 'started')
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.add_time(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class Stats:
+    """Counters and timers for the planner and simulator.
+
+    Everything is a no-op while `enabled` is False. Hot loops should count
+    into locals and report once per call behind an `if STATS.enabled:`
+    check, so a disabled run pays for a single branch.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.counters = {}
+        self.timers = {}  # name -> [calls, total seconds, max seconds]
+
+    def incr(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, name, seconds):
+        if not self.enabled:
+            return
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            if seconds > timer[2]:
+                timer[2] = seconds
+
+    def timer(self, name):
+        """Context manager that adds its wall time to timer `name`."""
+        return _Timer(self, name) if self.enabled else _NULL_TIMER
+
+    def reset(self):
+        self.counters.clear()
+        self.timers.clear()
+
+    def as_dict(self):
+        return {
+            'counters': dict(self.counters),
+            'timers': {name: {'calls': calls, 'total': total, 'mean': total / calls, 'max': longest}
+                       for name, (calls, total, longest) in self.timers.items()},
+        }
+
+    def to_json(self, path=None):
+        """Serialise the stats; written to `path` when given."""
+        text = json.dumps(self.as_dict(), indent=2, sort_keys=True)
+        if path is not None:
+            with open(path, 'w') as file:
+                file.write(text)
+        return text
+
+
+# Process-wide stats used by the planner and the simulator.
+STATS = Stats()
+
+
+def enable(reset=True):
+    if reset:
+        STATS.reset()
+    STATS.enabled = True
+    return STATS
+
+
+def disable():
+    STATS.enabled = False
+
+
+class ProfileReport:
+    def __init__(self):
+        self.profile = None
+        self.peak_memory = None
+        self.text = ''
+
+
+@contextlib.contextmanager
+def profiled(path=None, memory=True, sort='cumulative', limit=30):
+    """Opt-in cProfile (and tracemalloc) around a block.
+
+    The raw profile is dumped to `path` when given; the yielded report holds
+    the top `limit` functions as text and the peak traced memory in bytes.
+    """
+    report = ProfileReport()
+    profile = cProfile.Profile()
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if memory:
+        tracemalloc.reset_peak()
+    profile.enable()
+    try:
+        yield report
+    finally:
+        profile.disable()
+        if memory:
+            report.peak_memory = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+        report.profile = profile
+        if path is not None:
+            profile.dump_stats(path)
+        buffer = io.StringIO()
+        pstats.Stats(profile, stream=buffer).sort_stats(sort).print_stats(limit)
+        report.text = buffer.getvalue()
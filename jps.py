@@ -0,0 +1,151 @@
+import heapq
+
+
+class JumpPointSearch:
+    """Optimal jump point search for 4-connected grids.
+
+    Any shortest path can be rearranged, without changing its length, so that
+    it turns from horizontal to vertical only right after an obstacle ends
+    next to it; vertical-to-horizontal turns are unrestricted. Horizontal
+    jumps therefore only stop at such forced turns, vertical jumps stop
+    wherever a horizontal scan finds a jump point, and the A* search only
+    touches those cells. Passability is kept in a padded byte array so the
+    scans need no bounds checks; it is rebuilt when the grid's version changes.
+    """
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.expanded = 0  # Jump points expanded by the last search
+        self._version = None
+        self._refresh()
+
+    def _refresh(self):
+        grid = self.grid
+        self._stride = grid.width + 2
+        free = bytearray(self._stride * (grid.height + 2))
+        passable = grid.passable
+        for y in range(grid.height):
+            row = (y + 1) * self._stride + 1
+            free[row:row + grid.width] = passable[y].tobytes()
+        self._free = bytes(free)
+        self._version = grid.version
+
+    def _cell(self, position):
+        return (position[1] + 1) * self._stride + position[0] + 1
+
+    def _position(self, cell):
+        y, x = divmod(cell, self._stride)
+        return (x - 1, y - 1)
+
+    def _jump_horizontal(self, cell, step, goal):
+        free, stride = self._free, self._stride
+        while True:
+            cell += step
+            if not free[cell]:
+                return -1
+            if cell == goal:
+                return cell
+            back = cell - step
+            if (free[cell + stride] and not free[back + stride]) or (free[cell - stride] and not free[back - stride]):
+                return cell
+
+    def _jump_vertical(self, cell, step, goal):
+        free = self._free
+        while True:
+            cell += step
+            if not free[cell]:
+                return -1
+            if cell == goal:
+                return cell
+            if self._jump_horizontal(cell, 1, goal) != -1 or self._jump_horizontal(cell, -1, goal) != -1:
+                return cell
+
+    def _directions(self, cell, arrived):
+        """Directions to jump in after arriving at `cell` by moving `arrived` (0 at the start)."""
+        stride = self._stride
+        if arrived == 0:
+            return (1, -1, stride, -stride)
+        if arrived in (stride, -stride):
+            return (arrived, 1, -1)
+        free, back = self._free, cell - arrived
+        directions = [arrived]
+        for vertical in (stride, -stride):
+            if free[cell + vertical] and not free[back + vertical]:
+                directions.append(vertical)
+        return directions
+
+    def search(self, start, goal, heuristic=None):
+        """Shortest 4-connected path from `start` to `goal` as a list of positions, or None.
+
+        `heuristic` is an optional heuristics.DistanceTable; Manhattan distance otherwise.
+        """
+        if self.grid.version != self._version:
+            self._refresh()
+        self.expanded = 0
+        if not self.grid.is_passable(start) or not self.grid.is_passable(goal):
+            return None
+        if tuple(start) == tuple(goal):
+            return [tuple(start)]
+
+        stride = self._stride
+        start_cell, goal_cell = self._cell(start), self._cell(goal)
+        gx, gy = goal
+        if heuristic is not None:
+            field = heuristic.field(goal)
+            if heuristic.distance(start, goal) == float('inf'):
+                return None
+
+        def estimate(cell):
+            x, y = self._position(cell)
+            if heuristic is not None:
+                return int(field[y, x])
+            return abs(x - gx) + abs(y - gy)
+
+        best = {(start_cell, 0): 0}
+        parents = {(start_cell, 0): None}
+        open_list = [(estimate(start_cell), 0, 0, start_cell, 0)]
+        tie = 1
+        expanded = 0
+        while open_list:
+            f, _, g, cell, arrived = heapq.heappop(open_list)
+            if g > best[(cell, arrived)]:
+                continue
+            if cell == goal_cell:
+                self.expanded = expanded
+                return self._reconstruct((cell, arrived), parents)
+            expanded += 1
+            for step in self._directions(cell, arrived):
+                if step in (1, -1):
+                    jump = self._jump_horizontal(cell, step, goal_cell)
+                else:
+                    jump = self._jump_vertical(cell, step, goal_cell)
+                if jump == -1:
+                    continue
+                distance = abs(jump - cell) if step in (1, -1) else abs(jump - cell) // stride
+                next_g = g + distance
+                key = (jump, step)
+                if next_g >= best.get(key, float('inf')):
+                    continue
+                best[key] = next_g
+                parents[key] = (cell, arrived)
+                heapq.heappush(open_list, (next_g + estimate(jump), tie, next_g, jump, step))
+                tie += 1
+        self.expanded = expanded
+        return None
+
+    def _reconstruct(self, key, parents):
+        jump_points = []
+        while key is not None:
+            jump_points.append(self._position(key[0]))
+            key = parents[key]
+        jump_points.reverse()
+        # Fill in the straight segments between consecutive jump points.
+        path = [jump_points[0]]
+        for (x, y) in jump_points[1:]:
+            px, py = path[-1]
+            dx, dy = (x > px) - (x < px), (y > py) - (y < py)
+            while (px, py) != (x, y):
+                px, py = px + dx, py + dy
+                path.append((px, py))
+        return path
+
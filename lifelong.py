@@ -0,0 +1,175 @@
+import logging
+from collections import deque, namedtuple
+
+from simulation import SimulationEngine
+
+logger = logging.getLogger(__name__)
+
+# A task that becomes available at `release_time`; positions are (x, y).
+TaskRelease = namedtuple('TaskRelease', ['release_time', 'pickup', 'delivery'])
+
+
+def iter_task_file(path):
+    """Stream TaskRelease records from a task file without loading it.
+
+    Each non-empty line holds `release_time px py dx dy` separated by
+    whitespace, in non-decreasing release order; lines starting with `#`
+    are comments.
+    """
+    with open(path, 'r') as file:
+        for number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split()
+            if len(fields) != 5:
+                raise ValueError(f"{path}:{number}: expected 5 fields, got {len(fields)}")
+            release, px, py, dx, dy = map(int, fields)
+            yield TaskRelease(release, (px, py), (dx, dy))
+
+
+class TaskStream:
+    """Releases tasks from any iterable of TaskRelease records as simulated time passes.
+
+    Only one record is read ahead, so generators and task files of any
+    length can be streamed. Records must come in non-decreasing release order.
+    """
+
+    def __init__(self, records):
+        self._records = iter(records)
+        self._next = None
+        self.exhausted = False
+        self.released = 0
+        self._last_release = None  # Release time of the last record returned, across due() calls
+        self._advance()
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(iter_task_file(path))
+
+    def _advance(self):
+        self._next = next(self._records, None)
+        if self._next is None:
+            self.exhausted = True
+
+    def due(self, time):
+        """Records with release_time <= `time` that have not been returned yet."""
+        released = []
+        while self._next is not None and self._next.release_time <= time:
+            if self._last_release is not None and self._next.release_time < self._last_release:
+                raise ValueError("Task stream is not sorted by release time")
+            self._last_release = self._next.release_time
+            released.append(self._next)
+            self._advance()
+        self.released += len(released)
+        return released
+
+
+class RollingStats:
+    """Throughput and service time over the last `window` steps, plus running totals.
+
+    Memory is O(window) however long the run is.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._deliveries = deque()  # Per-step delivery counts
+        self._delivered_in_window = 0
+        self._service_times = deque()  # (step, service time) of tasks delivered in the window
+        self._service_in_window = 0
+        self.steps = 0
+        self.delivered = 0
+        self.total_service_time = 0
+
+    def record_step(self, service_times):
+        """Record one step and the service times (delivery minus release) of the tasks it delivered."""
+        self.steps += 1
+        self._deliveries.append(len(service_times))
+        self._delivered_in_window += len(service_times)
+        for service_time in service_times:
+            self._service_times.append((self.steps, service_time))
+            self._service_in_window += service_time
+        self.delivered += len(service_times)
+        self.total_service_time += sum(service_times)
+
+        if len(self._deliveries) > self.window:
+            self._delivered_in_window -= self._deliveries.popleft()
+        oldest = self.steps - self.window
+        while self._service_times and self._service_times[0][0] <= oldest:
+            self._service_in_window -= self._service_times.popleft()[1]
+
+    @property
+    def throughput(self):
+        """Deliveries per step over the window."""
+        return self._delivered_in_window / len(self._deliveries) if self._deliveries else 0.0
+
+    @property
+    def mean_service_time(self):
+        """Mean release-to-delivery time of the tasks delivered in the window."""
+        return self._service_in_window / len(self._service_times) if self._service_times else float('nan')
+
+    def as_dict(self):
+        return {
+            'steps': self.steps,
+            'delivered': self.delivered,
+            'throughput': self.throughput,
+            'mean_service_time': self.mean_service_time,
+            'overall_mean_service_time': self.total_service_time / self.delivered if self.delivered else float('nan'),
+        }
+
+
+class LifelongSimulation:
+    """Lifelong MAPD on top of SimulationEngine.
+
+    Each step releases the due tasks from `stream` and hands pending tasks to
+    idle agents. It then advances the engine and retires delivered tasks into
+    `stats`, recycling their engine slots. Only released, unfinished tasks
+    are kept, so memory and per-step cost do not grow with the length of the
+    run.
+    """
+
+    def __init__(self, grid, positions, stream, strategy='greedy', heuristic=None, window=1000, log_every=0):
+        self.engine = SimulationEngine(grid, positions)
+        self.stream = stream if isinstance(stream, TaskStream) else TaskStream(stream)
+        self.strategy = strategy
+        self.heuristic = heuristic
+        self.stats = RollingStats(window)
+        self.pending = []  # Released task ids waiting for an idle agent
+        self.log_every = log_every
+
+    @property
+    def time(self):
+        return self.engine.time
+
+    @property
+    def finished(self):
+        """True once the stream is exhausted and every released task has been delivered."""
+        return self.stream.exhausted and not self.engine.active_tasks
+
+    def step(self):
+        engine = self.engine
+        for record in self.stream.due(engine.time):
+            self.pending.append(engine.add_task(record.pickup, record.delivery))
+            engine.task_created_at[self.pending[-1]] = record.release_time
+        if self.pending:
+            self.pending = engine.assign_tasks(self.pending, self.strategy, self.heuristic)
+        engine.step()
+
+        delivered = engine.last_delivered
+        service_times = (engine.task_delivered_at[delivered] - engine.task_created_at[delivered]).tolist()
+        for task_id in delivered.tolist():
+            engine.retire_task(task_id)
+        self.stats.record_step(service_times)
+        if self.log_every and engine.time % self.log_every == 0:
+            logger.info("t=%d active=%d pending=%d throughput=%.3f", engine.time, engine.active_tasks,
+                        len(self.pending), self.stats.throughput)
+
+    def run(self, steps=None):
+        """Run `steps` steps, or until `finished` when `steps` is None (never, if agents deadlock)."""
+        if steps is None:
+            while not self.finished:
+                self.step()
+        else:
+            for _ in range(steps):
+                self.step()
+        return self.stats
@@ -0,0 +1,125 @@
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from atomic_io import save_atomic
+from grid import Grid, FREE, OBSTACLE
+
+# Terrain characters of the MovingAI format that agents can stand on.
+PASSABLE_CHARS = b'.GS'
+
+ScenarioEntry = namedtuple('ScenarioEntry', ['bucket', 'map_name', 'width', 'height', 'start', 'goal', 'optimal_length'])
+
+SCENARIO_DTYPE = np.dtype([
+    ('bucket', np.int32),
+    ('start_x', np.int32), ('start_y', np.int32),
+    ('goal_x', np.int32), ('goal_y', np.int32),
+    ('optimal_length', np.float64),
+])
+
+
+def is_resource_fork(path):
+    """True for the macOS `._*` metadata files shipped alongside the scenarios."""
+    return os.path.basename(path).startswith('._')
+
+
+def cache_path(path):
+    return path + '.npz'
+
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+def _read_cache(path):
+    """Return the cached arrays for `path`, or None if the cache is missing or stale."""
+    cached = cache_path(path)
+    if not os.path.exists(cached):
+        return None
+    try:
+        with np.load(cached) as data:
+            if not np.array_equal(data['source'], _source_stamp(path)):
+                return None
+            return {key: data[key] for key in data.files}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_cache(path, **arrays):
+    try:
+        save_atomic(cache_path(path), dict(arrays, source=_source_stamp(path)))
+    except OSError:
+        pass  # A read-only checkout just means every run parses the text
+
+
+def parse_map(path):
+    """Parse a `.map` file into its header and a (height, width) uint8 cell array."""
+    with open(path, 'rb') as file:
+        header = {}
+        for line in file:
+            line = line.strip()
+            if line == b'map':
+                break
+            key, _, value = line.partition(b' ')
+            header[key.decode()] = value.strip().decode()
+        height, width = int(header['height']), int(header['width'])
+        rows = [file.readline().rstrip(b'\r\n').ljust(width, b'@')[:width] for _ in range(height)]
+
+    chars = np.frombuffer(b''.join(rows), dtype=np.uint8).reshape(height, width)
+    passable = np.isin(chars, np.frombuffer(PASSABLE_CHARS, dtype=np.uint8))
+    header['height'], header['width'] = height, width
+    return header, np.where(passable, FREE, OBSTACLE).astype(np.uint8)
+
+
+def load_map(path, use_cache=True):
+    """Load a `.map` file as a Grid, going through the `.npz` cache next to it when possible."""
+    if use_cache:
+        cached = _read_cache(path)
+        if cached is not None:
+            cells = cached['cells']
+            return Grid(cells.shape[1], cells.shape[0], cells=cells)
+    _, cells = parse_map(path)
+    if use_cache:
+        _write_cache(path, cells=cells)
+    return Grid(cells.shape[1], cells.shape[0], cells=cells)
+
+
+def parse_scenario_line(line):
+    """Parse one tab-separated `.scen` line into a ScenarioEntry, or None for the version header."""
+    fields = line.rstrip('\r\n').split('\t')
+    if len(fields) < 9:
+        return None
+    bucket, map_name, width, height, start_x, start_y, goal_x, goal_y, optimal_length = fields[:9]
+    return ScenarioEntry(int(bucket), map_name, int(width), int(height),
+                         (int(start_x), int(start_y)), (int(goal_x), int(goal_y)), float(optimal_length))
+
+
+def iter_scenario(path):
+    """Lazily yield the ScenarioEntry records of a `.scen` file."""
+    with open(path, 'r') as file:
+        for line in file:
+            entry = parse_scenario_line(line)
+            if entry is not None:
+                yield entry
+
+
+def load_scenario(path, use_cache=True):
+    """Load a whole `.scen` file as a structured array with SCENARIO_DTYPE."""
+    if use_cache:
+        cached = _read_cache(path)
+        if cached is not None and cached['entries'].dtype == SCENARIO_DTYPE:
+            return cached['entries']
+    entries = np.array([(entry.bucket, *entry.start, *entry.goal, entry.optimal_length) for entry in iter_scenario(path)],
+                       dtype=SCENARIO_DTYPE)
+    if use_cache:
+        _write_cache(path, entries=entries)
+    return entries
+
+
+def iter_scenario_files(directory):
+    """Yield the `.scen` files of a directory in a stable order, skipping `._*` junk files."""
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.scen') and not is_resource_fork(name):
+            yield os.path.join(directory, name)
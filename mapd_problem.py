@@ -2,16 +2,36 @@ import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 from matplotlib.colors import ListedColormap
 import numpy as np
+import logging
 import random
 
+from assignment import select_agent
+from free_cells import FreeCellIndex
+from grid import Grid, FREE, PICKUP, DELIVERY
+from instrumentation import STATS
+from simulation import SimulationEngine
+
+logger = logging.getLogger(__name__)
+
 
 class Agent:
     def __init__(self, name, location=None):
         self.name = name
+        self._map = None  # Map whose free-cell index tracks this agent
+        self._location = None
         self.location = location
         self.task_queue = []  # Queue of tasks assigned to the agent
         self.current_task = None
 
+    @property
+    def location(self):
+        return self._location
+
+    @location.setter
+    def location(self, location):
+        previous, self._location = self._location, location
+        if self._map is not None:
+            self._map._agent_moved(previous, location)
     
     def assign_task(self, task):
         self.task_queue.append(task)
@@ -50,16 +70,16 @@ class Agent:
         if self.current_task:
             # Check if at pickup location and pick up the item
             if self.location == self.current_task.pickup_location:
-                print("Picking up")
+                logger.debug("Agent %s picking up", self.name)
                 self.current_task.pickup()
             # Check if at delivery location and deliver the item
             elif (self.location == self.current_task.delivery_location) and self.current_task.picked_up:
-                print("Delivering")
+                logger.debug("Agent %s delivering", self.name)
                 self.current_task.deliver()
                 self.current_task = None  # Task completed
                 if len(self.task_queue) > 0:
                     self.current_task = self.task_queue.pop(0)
-                    print("New task for agent")
+                    logger.debug("Agent %s starts its next task", self.name)
 
 class Task:
     def __init__(self, name, pickup_location, delivery_location):
@@ -75,121 +95,378 @@ class Task:
     def deliver(self):
         self.delivered = True
 
+class AgentList(list):
+    """List of a map's agents that keeps the map's free-cell index in sync on insert and removal."""
+
+    def __init__(self, game_map, agents=()):
+        super().__init__()
+        self._map = game_map
+        self.extend(agents)
+
+    def _attach(self, agent):
+        agent._map = self._map
+        self._map._agent_moved(None, agent.location)
+        return agent
+
+    def _detach(self, agent):
+        self._map._agent_moved(agent.location, None)
+        agent._map = None
+        return agent
+
+    def append(self, agent):
+        super().append(self._attach(agent))
+
+    def extend(self, agents):
+        for agent in agents:
+            self.append(agent)
+
+    def insert(self, index, agent):
+        super().insert(index, self._attach(agent))
+
+    def remove(self, agent):
+        super().remove(agent)
+        self._detach(agent)
+
+    def pop(self, index=-1):
+        return self._detach(super().pop(index))
+
+    def clear(self):
+        for agent in self:
+            self._detach(agent)
+        super().clear()
+
+    def __setitem__(self, index, value):
+        for agent in (self[index] if isinstance(index, slice) else [self[index]]):
+            self._detach(agent)
+        if isinstance(index, slice):
+            value = [self._attach(agent) for agent in value]
+        else:
+            value = self._attach(value)
+        super().__setitem__(index, value)
+
+    def __delitem__(self, index):
+        for agent in (self[index] if isinstance(index, slice) else [self[index]]):
+            self._detach(agent)
+        super().__delitem__(index)
+
+    def __iadd__(self, agents):
+        self.extend(agents)
+        return self
+
 class Map:
-    def __init__(self, width, height, obstacles=[], agents=[]):
+    def __init__(self, width, height, obstacles=[], agents=[], seed=None, retire_delivered=False):
         self.width = width
         self.height = height
-        self.agents = agents
-        self.grid = [[0 for _ in range(width)] for _ in range(height)]
+        self.rng = random.Random(seed)  # Per-simulation stream for task generation
+        self.time = 0
+        self.recorder = None  # Optional checkpoint.ReplayLog fed by time_step
+        self.grid = Grid(width, height, obstacles)
+        # Cells that are neither obstacles, task markers nor occupied by an agent
+        self.free_cells = FreeCellIndex.from_mask(self.grid.cells == FREE)
+        self._agent_count = np.zeros(self.grid.num_cells, dtype=np.int32)
+        self.agents = AgentList(self, agents)
         self.tasks = []
-        for (x, y) in obstacles:
-            self.grid[y][x] = 1
+        # Lifelong mode: delivered tasks are retired, so long runs keep only the active ones
+        self.retire_delivered = retire_delivered
+        self._task_count = 0
+        # Active tasks using each cell as a pickup / delivery, so a marker is cleared with its last task
+        self._pickups = np.zeros(self.grid.num_cells, dtype=np.int32)
+        self._deliveries = np.zeros(self.grid.num_cells, dtype=np.int32)
+        self._registered = set()  # Tasks whose markers add_task counted
+
+    def _agent_moved(self, previous, location):
+        """Update the free-cell index when an agent leaves `previous` and enters `location`."""
+        if previous is not None:
+            cell = self.grid.index(previous)
+            self._agent_count[cell] -= 1
+            if not self._agent_count[cell] and self.grid.cells[previous[1], previous[0]] == FREE:
+                self.free_cells.add(cell)
+        if location is not None:
+            cell = self.grid.index(location)
+            self._agent_count[cell] += 1
+            self.free_cells.discard(cell)
+
+    def _refresh_cell(self, x, y):
+        cell = self.grid.index((x, y))
+        if self.grid.cells[y, x] == FREE and not self._agent_count[cell]:
+            self.free_cells.add(cell)
+        else:
+            self.free_cells.discard(cell)
+
+    def set_obstacle(self, x, y, blocked=True):
+        """Add or remove an obstacle at (x, y)."""
+        self.grid.set_obstacle((x, y), blocked)
+        self._refresh_cell(x, y)
 
     def display(self):
-        display_grid = [row[:] for row in self.grid]
+        display_grid = self.grid.cells.copy()
+        if not self.agents:
+            return display_grid
         for agent in self.agents:
             if agent.location:
                 x, y = agent.location
-                display_grid[y][x] = 4
-            for task in self.tasks:
-                px, py = task.pickup_location
-                dx, dy = task.delivery_location
-                if not task.picked_up:
-                    display_grid[py][px] = 2
-                if not task.delivered:
-                    display_grid[dy][dx] = 3
+                display_grid[y, x] = 4
+        # Task markers are drawn over agents
+        for task in self.tasks:
+            px, py = task.pickup_location
+            dx, dy = task.delivery_location
+            if not task.picked_up:
+                display_grid[py, px] = PICKUP
+            if not task.delivered:
+                display_grid[dy, dx] = DELIVERY
         return display_grid 
 
     def is_position_free(self, x, y):
-        """Check if a position is free from obstacles and agents."""
-        if self.grid[y][x] != 0:  # Check if the cell is not empty or an obstacle
+        """Check if a position is free from obstacles, task markers and agents."""
+        if not (0 <= x < self.width and 0 <= y < self.height):
             return False
-        # Ensure no other agent is at the position
-        for agent in self.agents:
-            if agent.location == (x, y):
-                return False
-        return True
+        return y * self.width + x in self.free_cells
     
     def add_task(self, task):
+        self._registered.add(task)
         x, y = task.pickup_location
-        self.grid[y][x] = 2
+        self._pickups[self.grid.index((x, y))] += 1
+        self.grid.cells[y, x] = PICKUP
+        self._refresh_cell(x, y)
         x, y = task.delivery_location
-        self.grid[y][x] = 3
+        self._deliveries[self.grid.index((x, y))] += 1
+        self.grid.cells[y, x] = DELIVERY
+        self._refresh_cell(x, y)
+
+    def retire_task(self, task):
+        """Clear the markers no other active task still uses and forget a delivered task."""
+        if task in self._registered:  # Tasks never passed to add_task hold no marker counts
+            self._registered.discard(task)
+            for (x, y), counts in ((task.pickup_location, self._pickups), (task.delivery_location, self._deliveries)):
+                cell = self.grid.index((x, y))
+                counts[cell] -= 1
+                marker = self.grid.cells[y, x]
+                # A cell can be a pickup of one task and a delivery of another. As in add_task, the
+                # latest marker wins, so it stays while its tasks are active and the other one shows next.
+                if (marker == PICKUP and self._pickups[cell]) or (marker == DELIVERY and self._deliveries[cell]):
+                    continue
+                if marker in (PICKUP, DELIVERY):
+                    if self._pickups[cell]:
+                        self.grid.cells[y, x] = PICKUP
+                    elif self._deliveries[cell]:
+                        self.grid.cells[y, x] = DELIVERY
+                    else:
+                        self.grid.cells[y, x] = FREE
+                    self._refresh_cell(x, y)
+        if task in self.tasks:
+            self.tasks.remove(task)
     
     def find_random_free_position(self):
         """Find a random position on the grid that is not an obstacle, pickup, or delivery location,
             and is not completely surrounded by obstacles."""
-        free_positions = [(x, y) for y in range(self.height) for x in range(self.width)
-                            if self.is_position_free(x, y)]
-        return random.choice(free_positions) if free_positions else None
+        cell = self.free_cells.sample(self.rng)
+        return self.grid.position(cell) if cell is not None else None
 
     def add_random_task(self):
         """Randomly add a new task if conditions are met."""
-        if random.random() < 0.5:  # Adjust probability as needed
+        if self.rng.random() < 0.5:  # Adjust probability as needed
             pickup = self.find_random_free_position()
             delivery = self.find_random_free_position()
             if pickup and delivery:
-                new_task = Task(f"Task {len(self.tasks) + 1}", pickup, delivery)
-                print("New task created: ", new_task.pickup_location, " ", new_task.delivery_location)
+                self._task_count += 1
+                new_task = Task(f"Task {self._task_count}", pickup, delivery)
+                logger.debug("New task created: %s -> %s", new_task.pickup_location, new_task.delivery_location)
                 self.tasks.append(new_task)
                 self.assign_task_to_agent(new_task)
+                if self.recorder is not None:
+                    self.recorder.task_added(new_task)
                 return True
         return False
     
     def assign_task_to_agent(self, task):
         """Assign a task to the least busy agent, or the closest one if they're equally busy."""
         # Find the agent with the least number of tasks, preferring closer agents for tie-breaking.
-        least_busy_agents = sorted(self.agents, key=lambda x: (len(x.task_queue), np.linalg.norm(np.array(x.location) - np.array(task.pickup_location))))
-        if least_busy_agents:
-            least_busy_agents[0].assign_task(task)
-            print(f"Agent {least_busy_agents[0].name} gets task: ", task.pickup_location, " ", task.delivery_location)
+        if not self.agents:
+            return
+        queue_lengths = np.fromiter((len(agent.task_queue) for agent in self.agents), dtype=np.int64, count=len(self.agents))
+        locations = np.array([agent.location for agent in self.agents], dtype=np.float64)
+        distances = np.linalg.norm(locations - np.asarray(task.pickup_location, dtype=np.float64), axis=1)
+        least_busy_agent = self.agents[select_agent(queue_lengths, distances)]
+        least_busy_agent.assign_task(task)
+        logger.debug("Agent %s gets task: %s -> %s", least_busy_agent.name, task.pickup_location, task.delivery_location)
+
+    def run_vectorized(self, steps):
+        """Advance the agents' current tasks `steps` times with the batched SimulationEngine.
+
+        Random task generation is skipped; positions and task progress are
+        written back onto the agents afterwards.
+        """
+        engine = SimulationEngine.from_map(self)
+        engine.run(steps)
+        engine.write_back(self)
+        if self.retire_delivered:
+            for task in [task for task in self.tasks if task.delivered]:
+                self.retire_task(task)
+        return engine
+
+    def state_arrays(self):
+        """The full simulation state as a dict of NumPy arrays (see checkpoint.save_snapshot)."""
+        tasks = list(self.tasks)
+        listed = len(tasks)
+        known = {id(task) for task in tasks}
+        for agent in self.agents:
+            for task in ([agent.current_task] if agent.current_task else []) + agent.task_queue:
+                if id(task) not in known:  # Assigned directly, never added to Map.tasks
+                    known.add(id(task))
+                    tasks.append(task)
+        for task in self._registered:
+            if id(task) not in known:
+                known.add(id(task))
+                tasks.append(task)
+        task_index = {id(task): index for index, task in enumerate(tasks)}
+        queues = [[task_index[id(task)] for task in agent.task_queue] for agent in self.agents]
+        version, internal, gauss_next = self.rng.getstate()
+        return {
+            'meta': np.array([self.width, self.height, self.time, self._task_count, listed, version,
+                              self.retire_delivered], dtype=np.int64),
+            'cells': self.grid.cells,
+            'free_cells': self.free_cells.cells(),  # Slot order matters for sampling
+            'pickups': self._pickups,
+            'deliveries': self._deliveries,
+            'agent_names': np.array([agent.name for agent in self.agents], dtype=str),
+            'agent_locations': np.array([agent.location if agent.location else (-1, -1) for agent in self.agents],
+                                        dtype=np.int64).reshape(-1, 2),
+            'agent_current': np.array([task_index[id(agent.current_task)] if agent.current_task else -1
+                                       for agent in self.agents], dtype=np.int64),
+            'queue_offsets': np.cumsum([0] + [len(queue) for queue in queues], dtype=np.int64),
+            'queue_tasks': np.array([index for queue in queues for index in queue], dtype=np.int64),
+            'task_names': np.array([task.name for task in tasks], dtype=str),
+            'task_locations': np.array([task.pickup_location + task.delivery_location for task in tasks],
+                                       dtype=np.int64).reshape(-1, 4),
+            'task_flags': np.array([(task.picked_up, task.delivered, task in self._registered) for task in tasks],
+                                   dtype=bool).reshape(-1, 3),
+            'rng_state': np.array(internal, dtype=np.int64),
+            'rng_gauss': np.array([np.nan if gauss_next is None else gauss_next]),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a Map from state_arrays() output."""
+        width, height, time, task_count, listed, version, retire_delivered = state['meta'].tolist()
+        game_map = cls(width, height, retire_delivered=bool(retire_delivered))
+        game_map.grid = Grid(width, height, cells=np.array(state['cells']))
+        game_map.free_cells = FreeCellIndex.from_cells(game_map.grid.num_cells, state['free_cells'])
+        game_map._pickups = np.array(state['pickups'], dtype=np.int32)
+        game_map._deliveries = np.array(state['deliveries'], dtype=np.int32)
+        game_map.time, game_map._task_count = time, task_count
+
+        tasks = []
+        for name, locations, (picked_up, delivered, registered) in zip(
+                state['task_names'].tolist(), state['task_locations'].tolist(), state['task_flags'].tolist()):
+            task = Task(name, tuple(locations[:2]), tuple(locations[2:]))
+            task.picked_up, task.delivered = picked_up, delivered
+            if registered:
+                game_map._registered.add(task)
+            tasks.append(task)
+        game_map.tasks = tasks[:listed]
+
+        offsets, queued = state['queue_offsets'].tolist(), state['queue_tasks'].tolist()
+        for index, (name, location, current) in enumerate(zip(state['agent_names'].tolist(), state['agent_locations'].tolist(),
+                                                              state['agent_current'].tolist())):
+            agent = Agent(name, tuple(location) if location[0] >= 0 else None)
+            agent.current_task = tasks[current] if current >= 0 else None
+            agent.task_queue = [tasks[task] for task in queued[offsets[index]:offsets[index + 1]]]
+            agent._map = game_map
+            list.append(game_map.agents, agent)  # Occupancy is restored below, not replayed
+        locations = state['agent_locations']
+        occupied = locations[locations[:, 0] >= 0]
+        np.add.at(game_map._agent_count, occupied[:, 1] * width + occupied[:, 0], 1)
+
+        gauss = float(state['rng_gauss'][0])
+        game_map.rng.setstate((version, tuple(state['rng_state'].tolist()), None if np.isnan(gauss) else gauss))
+        return game_map
 
     def time_step(self):
         """Simulate a single time step in the environment."""
+        if STATS.enabled:
+            with STATS.timer('time_step'):
+                self._time_step()
+        else:
+            self._time_step()
+
+    def _time_step(self, moves=None):
+        """One step; with `moves` (agent index -> location) recorded moves replace move_to."""
+        debug = logger.isEnabledFor(logging.DEBUG)  # Checked once per step, not per agent
+        recorder = self.recorder
         # Add a random task
-        print("Time step")
         random_task_added = self.add_random_task()
-        if random_task_added:
-            print("Added new task")
-        for agent in self.agents:
-            print(f"Agent {agent.name} is at {agent.location}")
-            if agent.current_task:
-                if not agent.current_task.picked_up:
-                    print("Moving")
-                    agent.move_to(agent.current_task.pickup_location, self)
-                    print("Agent moved to: ", agent.location)
-                    agent.complete_task_if_possible()
-                elif not agent.current_task.delivered:
-                    agent.move_to(agent.current_task.delivery_location, self)
-                    print("Agent moved to: ", agent.location)
-                    agent.complete_task_if_possible()
+        if random_task_added and debug:
+            logger.debug("Added new task")
+        for index, agent in enumerate(self.agents):
+            task = agent.current_task
+            if not task:
+                continue
+            if task.picked_up and task.delivered:
+                logger.warning("Agent %s was assigned a task that is already picked up and delivered", agent.name)
+            else:
+                previous = agent.location
+                if moves is not None:
+                    agent.location = moves.get(index, previous)
                 else:
-                    print("Something went wrong. Assigned a task but delivered and picked up are true")
-
+                    agent.move_to(task.delivery_location if task.picked_up else task.pickup_location, self)
+                if recorder is not None and agent.location != previous:
+                    recorder.agent_moved(index, agent.location)
+                agent.complete_task_if_possible()
+                if task.delivered and self.retire_delivered:
+                    self.retire_task(task)
+            if debug:
+                logger.debug("Agent %s moved to %s", agent.name, agent.location)
+        self.time += 1
+        if recorder is not None:
+            recorder.end_step()
 
 # Example setup and the animation block encapsulated within the main guard
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Animate a small MAPD example.")
+    parser.add_argument('--headless', action='store_true', help="Render frames to files instead of a window")
+    parser.add_argument('--steps', type=int, default=20)
+    parser.add_argument('--output', default='frames', help="Frame directory in headless mode")
+    parser.add_argument('--format', choices=('png', 'npz'), default='png')
+    parser.add_argument('--every', type=int, default=1, help="Keep one frame every N steps")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--lifelong', action='store_true', help="Retire delivered tasks to bound memory")
+    args = parser.parse_args()
+
     cmap = ListedColormap(['white', 'blue', 'red', 'green', 'yellow'])
     agents = [Agent(name="Agent 1", location=(0, 0)), Agent(name="Agent 2", location=(1, 1))]
     width, height = 10, 10
     obstacles = [(1, 2), (2, 2), (3, 2), (4, 5), (5, 5)]
-    game_map = Map(width, height, obstacles=obstacles, agents=agents)
+    game_map = Map(width, height, obstacles=obstacles, agents=agents, seed=args.seed,
+                   retire_delivered=args.lifelong)
 
-    fig, ax = plt.subplots()
-    grid = game_map.display()  # Initial display to set up the grid
-    mat = ax.matshow(grid, cmap=cmap)  # Use the custom color map
-    plt.colorbar(mat, ticks=range(5), label='Cell Type')
+    if args.headless:
+        from rendering import Renderer
 
-    def update(frame_number):
-        """
-        Update function for the animation. This will be called at each frame of the animation.
-        
-        :param frame_number: The current frame number (automatically handled by FuncAnimation).
-        """
-        print("Frame Number: ", frame_number)
-        game_map.time_step()  # Progress the simulation by one time step.
-        grid = game_map.display()  # Get the updated display grid.
-        mat.set_data(grid)  # Update the displayed data.
+        plt.switch_backend('Agg')
+        with Renderer.for_map(game_map, args.output, fmt=args.format, every=args.every, scale=8) as renderer:
+            renderer.capture(game_map)
+            for _ in range(args.steps):
+                game_map.time_step()
+                renderer.capture(game_map)
+        print(f"Wrote {renderer.frames} frames to {args.output}")
+    else:
+        fig, ax = plt.subplots()
+        grid = game_map.display()  # Initial display to set up the grid
+        mat = ax.matshow(grid, cmap=cmap)  # Use the custom color map
+        plt.colorbar(mat, ticks=range(5), label='Cell Type')
+
+        def update(frame_number):
+            """
+            Update function for the animation. This will be called at each frame of the animation.
+
+            :param frame_number: The current frame number (automatically handled by FuncAnimation).
+            """
+            print("Frame Number: ", frame_number)
+            game_map.time_step()  # Progress the simulation by one time step.
+            grid = game_map.display()  # Get the updated display grid.
+            mat.set_data(grid)  # Update the displayed data.
 
-    ani = FuncAnimation(fig, update, frames=20, interval=500)  # Adjust 'frames' and 'interval' as needed
-    plt.show()
\ No newline at end of file
+        ani = FuncAnimation(fig, update, frames=args.steps, interval=500)  # Adjust 'frames' and 'interval' as needed
+        plt.show()
@@ -1,41 +1,78 @@
 import heapq
 import itertools
 import logging
+import time
+
+from assignment import assign, cost_matrix
+from grid import Grid
+from instrumentation import STATS
+from hierarchical import HierarchicalPlanner
+from jps import JumpPointSearch
+from reservation_table import ReservationTable
+from search_workspace import SearchWorkspace
 
 tiebreaker = itertools.count()
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 
 class Environment:
-    def __init__(self, size, obstacles=None, endpoints=None):
+    def __init__(self, size, obstacles=None, endpoints=None, heuristic=None, grid=None):
         self.size = size
         self.obstacles = obstacles if obstacles else []
         self.endpoints = endpoints if endpoints else []
-        logging.info(f"Environment created with size {self.size}, obstacles {self.obstacles}, and endpoints {self.endpoints}")
+        self.heuristic = heuristic  # Optional heuristics.DistanceTable with exact distances
+        # A prebuilt grid (e.g. from map_loader) already carries its obstacles
+        self.grid = grid if grid is not None else Grid(size[0], size[1], self.obstacles)
+        self._workspace = None
+        self.nodes_expanded = 0  # Total expansions of every search run on this environment
+        self.path_cache = None  # Optional path_cache.PathCache consulted by mla_star
+        self.last_search_complete = True  # False after a budgeted plan_goals call returned a partial path
+        self.search_mode = 'astar'  # 'jps' or 'hpa' chain single-leg searches instead
+        self._jps = None
+        self.hierarchy = None  # HierarchicalPlanner used by 'hpa'; a default one is built on first use
+        logger.info("Environment created with size %s, %d obstacles and %d endpoints", self.size, len(self.obstacles), len(self.endpoints))
+
+    @classmethod
+    def from_grid(cls, grid, endpoints=None, heuristic=None):
+        return cls((grid.width, grid.height), endpoints=endpoints, heuristic=heuristic, grid=grid)
+
+
+    @property
+    def workspace(self):
+        """Search workspace reused by every mla_star call on this environment."""
+        if self._workspace is None:
+            self._workspace = SearchWorkspace(self.grid)
+        return self._workspace
+
+    @property
+    def jps(self):
+        """Jump point searcher used when search_mode is 'jps'."""
+        if self._jps is None:
+            self._jps = JumpPointSearch(self.grid)
+        return self._jps
 
+    def leg_searcher(self):
+        """Single-leg searcher for the current non-default search_mode."""
+        if self.search_mode == 'jps':
+            return self.jps
+        if self.search_mode == 'hpa':
+            if self.hierarchy is None:
+                self.hierarchy = HierarchicalPlanner(self.grid)
+            return self.hierarchy
+        raise ValueError(f"Unknown search mode: {self.search_mode!r}")
+
+    def search_key(self):
+        """Identifies the spatial search in use, so cached paths are only reused by the same search."""
+        if self.search_mode != 'hpa':
+            return self.search_mode
+        hierarchy = self.leg_searcher()
+        return ('hpa', hierarchy.cluster_size, hierarchy.weight, hierarchy.refine, hierarchy.bounded)
 
     def is_valid(self, position):
-        valid = 0 <= position[0] < self.size[0] and 0 <= position[1] < self.size[1]
-        if valid:
-            if position in self.obstacles:
-                logging.debug(f"Position {position} is not valid because it's an obstacle.")
-                return False
-            logging.debug(f"Position {position} is valid.")
-            return True
-        logging.debug(f"Position {position} is out of bounds and not valid.")
-        return False
+        return self.grid.is_passable(position)
 
     def get_neighbors(self, position):
-        logging.debug(f"Getting neighbors for position {position}.")
-
-        directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]  # 4-directional movement
-        neighbors = []
-        for d in directions:
-            next_position = (position[0] + d[0], position[1] + d[1])
-            if self.is_valid(next_position):
-                neighbors.append(next_position)
-        logging.debug(f"Found neighbors for position {position}: {neighbors}.")
-        return neighbors
+        return self.grid.neighbors(position)
 
 class Agent:
     def __init__(self, id, current_location):
@@ -66,72 +103,279 @@ class Node:
         if not self.tasks or self.label - 1 >= len(self.tasks):
             return 0
         goal = self.tasks[self.label - 1].pickup_location if self.label == 1 else self.tasks[self.label - 1].delivery_location
-        return abs(self.position[0] - goal[0]) + abs(self.position[1] - goal[1])
+        return heuristic_distance(self.environment, self.position, goal)
     
     def __lt__(self, other):
         # First compare by f value, then by tiebreaker
         return (self.f, self.tiebreaker) < (other.f, other.tiebreaker)
 
-def mla_star(start, tasks, environment):
-    logging.info(f"Starting MLA* from {start} with tasks {tasks}.")
+def heuristic_distance(environment, position, goal):
+    """Exact distance when the environment has a distance table, Manhattan distance otherwise."""
+    if environment is not None and environment.heuristic is not None:
+        return environment.heuristic.distance(position, goal)
+    return abs(position[0] - goal[0]) + abs(position[1] - goal[1])
+
+def mla_star(start, tasks, environment, deadline=None, max_expansions=None):
+    """Spatial MLA* from `start` through each task's pickup and the last task's delivery.
+
+    `deadline`/`max_expansions` make the search anytime: see plan_goals.
+    """
+    logger.debug("Starting MLA* from %s with %d tasks.", start, len(tasks))
     goals = [task.pickup_location for task in tasks] + [tasks[-1].delivery_location]
-    open_list = []
-    closed_list = set()
-    start_node = Node(start, environment=environment, tasks=tasks)
-    heapq.heappush(open_list, start_node)
+    return plan_goals(start, goals, environment, deadline, max_expansions)
+
+def plan_goals(start, goals, environment, deadline=None, max_expansions=None):
+    """Spatial MLA* path from `start` through `goals` in order, or None.
+
+    With a `deadline` (time.perf_counter() value) or `max_expansions` the
+    A* mode returns the best partial path toward the current label once the
+    budget runs out, and environment.last_search_complete is False. Partial
+    paths are not cached. The 'jps' and 'hpa' modes ignore the budget.
+    """
+    environment.last_search_complete = True
+    cache = environment.path_cache
+    if cache is not None:
+        mode = environment.search_key()
+        found, path = cache.lookup(start, goals, environment.grid, mode)
+        if found:
+            return path
+    if environment.search_mode != 'astar':
+        if not STATS.enabled:
+            path = chained_search(start, goals, environment)
+        else:
+            with STATS.timer('search'):
+                path = chained_search(start, goals, environment)
+        if cache is not None:
+            cache.store(start, goals, environment.grid, path, mode)
+        return path
+    workspace = environment.workspace
+    if not STATS.enabled:
+        path = workspace.search(start, goals, environment.heuristic, deadline, max_expansions)
+    else:
+        with STATS.timer('search'):
+            path = workspace.search(start, goals, environment.heuristic, deadline, max_expansions)
+        STATS.incr('searches')
+        STATS.incr('nodes_expanded', workspace.expanded)
+        STATS.incr('heap_pushes', workspace.pushes)
+        STATS.incr('duplicates_pruned', workspace.pruned)
+        if not workspace.complete:
+            STATS.incr('partial_searches')
+    environment.nodes_expanded += workspace.expanded
+    environment.last_search_complete = workspace.complete
+    if cache is not None and workspace.complete:
+        cache.store(start, goals, environment.grid, path, mode)
+    return path
+
+def chained_search(start, goals, environment):
+    """MLA* for a fixed goal order as one single-leg search per label (agent -> pickups -> delivery).
+
+    Returns the same position list as mla_star, or None if any leg is unreachable.
+    """
+    searcher = environment.leg_searcher()
+    path = [tuple(start)]
+    expanded = 0
+    for goal in goals:
+        leg = searcher.search(path[-1], goal, environment.heuristic)
+        expanded += searcher.expanded
+        if leg is None:
+            path = None
+            break
+        path.extend(leg[1:])
+    environment.nodes_expanded += expanded
+    if STATS.enabled:
+        STATS.incr(f'{environment.search_mode}_searches')
+        STATS.incr('nodes_expanded', expanded)
+    return path
+
+def space_time_mla_star(start, tasks, environment, reservations=None, start_time=0, tmax=None, deadline=None,
+                        should_stop=None, horizon_slack=64):
+    """MLA* over (cell, label, time) states with wait actions.
+
+    Moves are checked against `reservations` (a ReservationTable over flat
+    cell indices) for vertex and swap conflicts, and the final cell must be
+    free to park in from the arrival time on. `tmax` is a hard time horizon;
+    by default it is the later of `start_time` and the last reservation, plus
+    the length of the shortest spatial route (exact distances when the
+    environment has a distance table, a spatial MLA* search otherwise) and
+    `horizon_slack` steps for detours around parked agents. `deadline` is a time.perf_counter() value
+    after which the search gives up; `should_stop` is an optional callable
+    (e.g. a memory check) polled alongside it that aborts the search when it
+    returns True. Returns one position per time step
+    starting at `start_time`, or None.
+    """
+    grid = environment.grid
+    goals = [grid.index(task.pickup_location) for task in tasks] + [grid.index(tasks[-1].delivery_location)]
+    goal_positions = [task.pickup_location for task in tasks] + [tasks[-1].delivery_location]
+    final_label = len(goals) + 1
+    if reservations is None:
+        reservations = ReservationTable()
+
+    # Remaining distance after finishing the leg towards goals[label - 1].
+    legs = [heuristic_distance(environment, goal_positions[k], goal_positions[k + 1]) for k in range(len(goals) - 1)]
+    remaining = [sum(legs[k:]) for k in range(len(goals))] + [0]
+    if tmax is None:
+        # A bound on the closed set: (cell, label, t) states would otherwise grow with cells² when
+        # the final goal can never be parked in.
+        if environment.heuristic is not None:
+            distance = heuristic_distance(environment, start, goal_positions[0]) + remaining[0]
+        else:
+            route = plan_goals(start, goal_positions, environment)
+            distance = len(route) - 1 if route else float('inf')
+        if distance == float('inf'):
+            return None
+        tmax = max(start_time, reservations.horizon) + distance + horizon_slack
+
+    def advance(cell, label, t):
+        while label < final_label and cell == goals[label - 1]:
+            if label == final_label - 1 and not reservations.can_park(cell, t):
+                break
+            label += 1
+        return label
+
+    def heuristic(cell, label):
+        if label == final_label:
+            return 0
+        return heuristic_distance(environment, grid.position(cell), goal_positions[label - 1]) + remaining[label - 1]
+
+    start_cell = grid.index(start)
+    if not grid.is_passable(start) or not reservations.is_vertex_free(start_cell, start_time):
+        return None
+    if environment.path_cache is not None:
+        # A cached spatial path that happens to be conflict-free needs no search at all
+        found, seed = environment.path_cache.lookup(start, goal_positions, grid, environment.search_key())
+        if found and seed is not None and start_time + len(seed) - 1 <= tmax:
+            cells = [grid.index(position) for position in seed]
+            if reservations.path_is_free(cells, start_time) and reservations.can_park(cells[-1], start_time + len(cells) - 1):
+                STATS.incr('seeded_paths')
+                return seed
+    start_label = advance(start_cell, 1, start_time)
+    start_state = (start_cell, start_label, start_time)
+    parents = {start_state: None}
+    counter = itertools.count()
+    open_list = [(start_time + heuristic(start_cell, start_label), next(counter), start_state)]
+    offsets, indices = grid.offsets, grid.indices
+    expanded = pruned = 0
+    started = time.perf_counter() if STATS.enabled else 0.0
+
+    def record():
+        environment.nodes_expanded += expanded
+        if STATS.enabled:
+            STATS.add_time('space_time_search', time.perf_counter() - started)
+            STATS.incr('searches')
+            STATS.incr('nodes_expanded', expanded)
+            STATS.incr('heap_pushes', len(parents))
+            STATS.incr('duplicates_pruned', pruned)
 
     while open_list:
-        current_node = heapq.heappop(open_list)
-        logging.debug("Exploring node at %s with label %d", current_node.position, current_node.label)
-        if current_node.label == len(goals) + 1:
-            return reconstruct_path(current_node)
-
-        closed_list.add(current_node.position)
-        for next_position in environment.get_neighbors(current_node.position):
-            if next_position in closed_list:
+        _, _, state = heapq.heappop(open_list)
+        cell, label, t = state
+        if label == final_label:
+            record()
+            path = []
+            while state is not None:
+                path.append(grid.position(state[0]))
+                state = parents[state]
+            return path[::-1]
+        if t >= tmax:
+            continue
+        expanded += 1
+        if not expanded & 0xFF and ((deadline is not None and time.perf_counter() > deadline)
+                                    or (should_stop is not None and should_stop())):
+            break
+
+        next_t = t + 1
+        successors = list(indices[offsets[cell]:offsets[cell + 1]])
+        successors.append(cell)  # Wait action
+        for next_cell in successors:
+            if not reservations.can_move(cell, next_cell, next_t):
+                continue
+            next_label = advance(next_cell, label, next_t)
+            next_state = (next_cell, next_label, next_t)
+            if next_state in parents:
+                pruned += 1
                 continue
-            neighbor = Node(next_position, g=current_node.g + 1, label=current_node.label, parent=current_node, environment=environment, tasks=tasks)
-            if neighbor.position == goals[neighbor.label - 1]:
-                neighbor.label += 1
-            heapq.heappush(open_list, neighbor)
+            h = heuristic(next_cell, next_label)
+            if h == float('inf'):
+                continue
+            parents[next_state] = state
+            heapq.heappush(open_list, (next_t + h, next(counter), next_state))
+    record()
     return None
 
+def commit_path(reservations, agent_id, path, environment, start_time=0):
+    """Reserve a position path returned by space_time_mla_star for `agent_id`."""
+    reservations.commit(agent_id, [environment.grid.index(p) for p in path], start_time)
+
 def get_neighbors(position):
     # Implement neighbor generation here (e.g., 4-directional or 8-directional movement)
     pass
 
 def reconstruct_path(node):
-    logging.debug(f"Reconstructing path starting from node {node.position}.")
     path = []
     while node is not None:
         path.append(node.position)
         node = node.parent
     return path[::-1]
 
-def hbh_assignment(agents, tasks, environment):
-    logging.info("Starting hbh_assignment.")
+def hbh_assignment(agents, tasks, environment, reservations=None, strategy='greedy', time_budget=None):
+    """Assign tasks to idle agents and plan a path for each chosen pair.
+
+    Each round builds one agent-task cost matrix (exact distances when the
+    environment has a distance table), solves it with an assignment.STRATEGIES
+    solver and runs MLA* only for the selected pairs. Pairs that turn out to
+    be infeasible are excluded from later rounds. With a ReservationTable the
+    agents are planned one after another in space-time and each committed
+    path becomes an obstacle for the next. `time_budget` caps each search
+    in seconds; a pair whose search runs out of time counts as infeasible.
+    """
+    logger.info("Starting hbh_assignment.")
+    failed = set()  # (agent id, task id) pairs without a feasible path
     t = 0
     while tasks:  # Continue until all tasks are assigned
         available_agents = [agent for agent in agents if not agent.path]  # Agents with no assigned task
         if not available_agents:  # No available agents to assign tasks
             break
 
-        # Generate agent-task pairs and sort by h-value (distance from agent to task pickup location)
-        agent_task_pairs = []
-        for agent in available_agents:
-            for task in tasks:
-                distance = abs(agent.current_location[0] - task.pickup_location[0]) + \
-                           abs(agent.current_location[1] - task.pickup_location[1])
-                agent_task_pairs.append((distance, agent, task))
-        agent_task_pairs.sort()
+        round_started = time.perf_counter() if STATS.enabled else 0.0
+        costs = cost_matrix([agent.current_location for agent in available_agents],
+                            [task.pickup_location for task in tasks], environment.heuristic)
+        if failed:
+            rows = {agent.id: row for row, agent in enumerate(available_agents)}
+            columns = {task.id: column for column, task in enumerate(tasks)}
+            for agent_id, task_id in failed:
+                if agent_id in rows and task_id in columns:
+                    costs[rows[agent_id], columns[task_id]] = float('inf')
 
-        for _, agent, task in agent_task_pairs:
+        progress = False
+        assigned_tasks = []
+        for row, column in assign(costs, strategy):
+            agent, task = available_agents[row], tasks[column]
+            deadline = time.perf_counter() + time_budget if time_budget is not None else None
             # Pass the current task as a list to match the expected argument format
-            path = mla_star(agent.current_location, [task], environment)
-            if path:  # If MLA* finds a feasible path
-                agent.path = path  # Assign path to agent
-                agent.current_location = task.delivery_location  # Update agent's location to the end of the path
-                tasks.remove(task)  # Remove assigned task from the list
+            if reservations is None:
+                path = mla_star(agent.current_location, [task], environment, deadline=deadline)
+                if not environment.last_search_complete:
+                    path = None  # Out of time; a partial path does not finish the task
+            else:
+                path = space_time_mla_star(agent.current_location, [task], environment, reservations, deadline=deadline)
+            progress = True
+            if not path:
+                failed.add((agent.id, task.id))
+                continue
+            if reservations is not None:
+                commit_path(reservations, agent.id, path, environment)
+            agent.path = path  # Assign path to agent
+            agent.current_location = task.delivery_location  # Update agent's location to the end of the path
+            assigned_tasks.append(task)
+
+        for task in assigned_tasks:
+            tasks.remove(task)  # Remove assigned task from the list
+        if STATS.enabled:
+            STATS.add_time('assignment_round', time.perf_counter() - round_started)
+            STATS.incr('assignment_rounds')
+
+        if not progress:  # Every remaining pair is known to be infeasible
+            break
 
         # Optionally, move agents to closest free endpoint if needed
         # This part depends on your specific scenario and environment setup
@@ -139,19 +383,22 @@ def hbh_assignment(agents, tasks, environment):
         t += 1  # Increment time step
 
 
-# Environment setup
-size = (10, 10)  # 10x10 grid
-obstacles = [(1, 2), (2, 2), (3, 2)]  # Obstacles in the environment
-endpoints = [(0, 9), (9, 0)]  # Endpoints where agents can rest
-environment = Environment(size, obstacles, endpoints)
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Environment setup
+    size = (10, 10)  # 10x10 grid
+    obstacles = [(1, 2), (2, 2), (3, 2)]  # Obstacles in the environment
+    endpoints = [(0, 9), (9, 0)]  # Endpoints where agents can rest
+    environment = Environment(size, obstacles, endpoints)
 
-# Agents and Tasks setup
-agents = [Agent(1, (0, 0)), Agent(2, (9, 9))]
-tasks = [Task(1, (2, 3), (5, 5)), Task(2, (7, 8), (1, 2))]
+    # Agents and Tasks setup
+    agents = [Agent(1, (0, 0)), Agent(2, (9, 9))]
+    tasks = [Task(1, (2, 3), (5, 5)), Task(2, (7, 8), (1, 2))]
 
-# Call the updated hbh_assignment function with the environment
-hbh_assignment(agents, tasks, environment)
+    # Call the updated hbh_assignment function with the environment
+    hbh_assignment(agents, tasks, environment)
 
-# Print out the paths assigned to each agent
-for agent in agents:
-    print(f"Agent {agent.id} path: {agent.path}")
+    # Print out the paths assigned to each agent
+    for agent in agents:
+        print(f"Agent {agent.id} path: {agent.path}")
@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from grid import Grid
+from heuristics import DEFAULT_CACHE_DIR
+from map_loader import is_resource_fork, iter_scenario, load_map
+from mla_star import Environment
+from run_benchmarks import solve_instance
+
+# Per-worker state, filled in by _init_worker
+_published = {}
+_environments = {}
+_segments = []
+_settings = {'cache_dir': DEFAULT_CACHE_DIR}
+
+
+def publish_grids(map_files):
+    """Copy each map's cell array into its own shared-memory segment exactly once.
+
+    Returns (segments, descriptors); the descriptors are what the workers
+    need to attach, and the caller must close and unlink the segments.
+    """
+    segments, descriptors = [], {}
+    for map_file in map_files:
+        cells = load_map(map_file).cells
+        segment = shared_memory.SharedMemory(create=True, size=cells.nbytes)
+        np.ndarray(cells.shape, dtype=np.uint8, buffer=segment.buf)[:] = cells
+        segments.append(segment)
+        descriptors[map_file] = (segment.name, cells.shape)
+    return segments, descriptors
+
+
+def _attach(name):
+    # Workers only borrow the segment; the publishing process owns and unlinks it.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 registers with the parent's tracker, which is harmless
+        return shared_memory.SharedMemory(name=name)
+
+
+def _init_worker(descriptors, cache_dir=DEFAULT_CACHE_DIR):
+    _published.update(descriptors)
+    _settings['cache_dir'] = cache_dir
+
+
+def _environment_for(map_file):
+    environment = _environments.get(map_file)
+    if environment is None:
+        name, shape = _published[map_file]
+        segment = _attach(name)
+        _segments.append(segment)
+        cells = np.ndarray(shape, dtype=np.uint8, buffer=segment.buf)
+        environment = Environment.from_grid(Grid(shape[1], shape[0], cells=cells))
+        _environments[map_file] = environment
+    return environment
+
+
+def run_job(job):
+    """Solve one (map, scenario, agent-count) job inside a worker process."""
+    environment = _environment_for(job['map_file'])
+    entries = list(islice(iter_scenario(job['scenario_file']), job['num_agents']))
+    result = dict(job)
+    if len(entries) < job['num_agents']:
+        result.update(solved=False, skipped='scenario has fewer agents')
+        return result
+    result.update(solve_instance(environment, entries, cache_dir=_settings['cache_dir']))
+    return result
+
+
+def job_key(job):
+    return (job['map_file'], job['scenario_file'], job['num_agents'])
+
+
+def load_completed(results_file):
+    """Keys of the jobs already recorded in an append-only results file.
+
+    Jobs recorded with an error are not completed, so a resumed run retries them.
+    """
+    completed = set()
+    if not os.path.exists(results_file):
+        return completed
+    with open(results_file, 'r') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+                if 'error' not in record:
+                    completed.add(job_key(record))
+            except (ValueError, KeyError):
+                continue  # A run killed mid-write leaves at most one truncated line
+    return completed
+
+
+def build_jobs(benchmarks, agent_counts):
+    jobs = []
+    for benchmark in benchmarks:
+        for scenario_file in benchmark['scenario_files']:
+            if is_resource_fork(scenario_file):
+                continue
+            for num_agents in agent_counts:
+                jobs.append({'benchmark': benchmark['name'], 'map_file': benchmark['map_file'],
+                             'scenario_file': scenario_file, 'num_agents': num_agents})
+    return jobs
+
+
+def run_parallel(benchmarks, agent_counts, results_file, workers=None, cache_dir=DEFAULT_CACHE_DIR):
+    """Run every pending job over a process pool, appending one JSON line per finished job.
+
+    A job that raises, or whose worker dies, is recorded with an `error`
+    field instead of a result and the rest of the run carries on.
+    """
+    completed = load_completed(results_file)
+    jobs = [job for job in build_jobs(benchmarks, agent_counts) if job_key(job) not in completed]
+    if not jobs:
+        return 0
+
+    map_files = sorted({job['map_file'] for job in jobs})
+    segments, descriptors = publish_grids(map_files)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(descriptors, cache_dir)) as pool, \
+                open(results_file, 'a') as results:
+            futures = {pool.submit(run_job, job): job for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as error:  # Includes BrokenProcessPool when a worker crashed
+                    result = dict(futures[future], error=repr(error))
+                result['finished_at'] = time.time()
+                results.write(json.dumps(result) + '\n')
+                results.flush()
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+    return len(jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run benchmarks.json scenarios over a process pool.")
+    parser.add_argument('benchmark_file', nargs='?', default='benchmarks.json')
+    parser.add_argument('--agents', type=int, nargs='+', default=[10, 50, 100])
+    parser.add_argument('--results', default='results.jsonl')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="Directory for cached distance fields")
+    args = parser.parse_args()
+
+    with open(args.benchmark_file, 'r') as file:
+        benchmarks = json.load(file)
+    count = run_parallel(benchmarks, args.agents, args.results, args.workers, args.cache_dir)
+    print(f"Finished {count} jobs, results in {args.results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+
+from instrumentation import STATS
+
+_NO_PATH = ()  # Cached result for a query without a path
+
+
+class PathCache:
+    """LRU memo of spatial MLA* results keyed by (start, goal sequence, search mode, grid version).
+
+    Memory is bounded both by the number of entries and by the total number
+    of path cells stored. Entries are tied to the grid's version counter, so
+    every obstacle edit drops the whole cache the next time it is used.
+    Queries without a path are cached as well. The search mode (see
+    Environment.search_key) is part of the key, so a suboptimal HPA* path is
+    never handed to a caller that expects an optimal one.
+    """
+
+    def __init__(self, capacity=4096, max_cells=1 << 20):
+        self.capacity = capacity
+        self.max_cells = max_cells
+        self._entries = OrderedDict()
+        self._cells = 0
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _sync(self, grid):
+        version = (id(grid), grid.version)
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self.clear()
+            self._version = version
+
+    def lookup(self, start, goals, grid, mode='astar'):
+        """Return (found, path); path is None for a cached query without a path."""
+        self._sync(grid)
+        key = (tuple(start), tuple(map(tuple, goals)), mode)
+        path = self._entries.get(key)
+        if path is None:
+            self.misses += 1
+            STATS.incr('path_cache_misses')
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        STATS.incr('path_cache_hits')
+        return True, (list(path) if path is not _NO_PATH else None)
+
+    def store(self, start, goals, grid, path, mode='astar'):
+        self._sync(grid)
+        key = (tuple(start), tuple(map(tuple, goals)), mode)
+        value = tuple(path) if path else _NO_PATH
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._cells -= len(previous)
+        self._entries[key] = value
+        self._cells += len(value)
+        while self._entries and (len(self._entries) > self.capacity or self._cells > self.max_cells):
+            _, evicted = self._entries.popitem(last=False)
+            self._cells -= len(evicted)
+
+    def clear(self):
+        self._entries.clear()
+        self._cells = 0
@@ -0,0 +1,295 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from assignment import assign, cost_matrix
+from grid import Grid
+from map_loader import load_map
+from mla_star import Environment, Task, mla_star
+
+logger = logging.getLogger(__name__)
+
+# Per-worker environment, built once by _init_worker
+_environment = None
+
+
+def _init_worker(cells, endpoints):
+    global _environment
+    height, width = cells.shape
+    _environment = Environment.from_grid(Grid(width, height, cells=cells), endpoints=endpoints)
+
+
+def _assign_batch(starts, pickups, strategy, blocked=()):
+    """Agent-task pairs for one tick, solved inside a worker process; `blocked` (row, column) pairs are excluded."""
+    costs = cost_matrix(starts, pickups)
+    for row, column in blocked:
+        costs[row, column] = float('inf')
+    return assign(costs, strategy)
+
+
+def _plan_task(start, task_id, pickup, delivery, time_budget):
+    """(complete, path) of the MLA* search through a task's pickup and delivery.
+
+    path is None if the task is unreachable (complete is True) or the search ran out of time (complete is False).
+    """
+    deadline = time.perf_counter() + time_budget if time_budget is not None else None
+    path = mla_star(start, [Task(task_id, pickup, delivery)], _environment, deadline=deadline)
+    if not _environment.last_search_complete:
+        return False, None
+    return True, ([list(position) for position in path] if path else None)
+
+
+class LatencyTracker:
+    """Task latencies (submission to returned path) over the last `window` planned tasks."""
+
+    def __init__(self, window=10000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentiles(self, quantiles=(50, 90, 99)):
+        result = {'count': self.count}
+        if self.samples:
+            values = np.percentile(np.fromiter(self.samples, dtype=float, count=len(self.samples)), quantiles)
+            result.update({f"p{quantile:g}": float(value) for quantile, value in zip(quantiles, values)})
+        return result
+
+
+class PlanningService:
+    """Local asyncio server that assigns and plans tasks as they arrive.
+
+    Clients speak JSON lines over localhost TCP or a Unix socket:
+
+    - `{"type": "agent", "id": 1, "location": [x, y]}` registers an agent, or
+      reports that it finished its path and is idle at `location`.
+    - `{"type": "task", "id": 7, "pickup": [x, y], "delivery": [x, y]}` queues
+      a task. Once it is planned the client that sent it receives
+      `{"type": "path", "task": 7, "agent": 1, "path": [[x, y], ...], "latency": s}`.
+    - `{"type": "stats"}` answers with the latency percentiles and queue sizes.
+
+    Every `tick` seconds the queued tasks are assigned to the idle agents as
+    one batch. The assignment and each MLA* search run on a process pool, so
+    the event loop only routes messages. Tasks that stay unassigned are
+    queued for the next tick. A task with no path is dropped and its client
+    gets `{"type": "error", "task": 7, ...}`. A search that runs out of
+    `time_budget` is not retried with the same agent (until that agent
+    reports a new location), and the task is dropped the same way once it
+    has timed out for every agent. If a whole batch fails (e.g. a worker
+    crashed), its tasks are queued again, its agents become idle and the
+    submitting clients get an error message; a broken pool is replaced.
+    """
+
+    def __init__(self, environment, tick=0.05, workers=None, strategy='greedy', time_budget=None):
+        self.grid = environment.grid
+        self.tick = tick
+        self.strategy = strategy
+        self.time_budget = time_budget
+        self.latency = LatencyTracker()
+        self.agents = {}  # agent id -> (x, y) of an idle agent, None while it follows a path
+        self._pending = deque()  # (task id, pickup, delivery, submitted at, writer)
+        self._failed = {}  # task id -> ids of the agents whose search for it ran out of time
+        self._batches = set()
+        self._pool_args = dict(max_workers=workers, initializer=_init_worker,
+                               initargs=(self.grid.cells, environment.endpoints))
+        self._executor = ProcessPoolExecutor(**self._pool_args)
+        self._server = None
+        self._ticker = None
+
+    async def start(self, host='127.0.0.1', port=0, path=None):
+        """Listen on a Unix socket at `path`, or on localhost TCP; returns the asyncio server."""
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle_client, path=path)
+        else:
+            self._server = await asyncio.start_server(self._handle_client, host, port)
+        self._ticker = asyncio.create_task(self._tick_loop())
+        logger.info("Planning service listening on %s", ', '.join(str(s.getsockname()) for s in self._server.sockets))
+        return self._server
+
+    @property
+    def address(self):
+        return self._server.sockets[0].getsockname()
+
+    async def close(self):
+        if self._ticker is not None:
+            self._ticker.cancel()
+            self._ticker = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        self._executor.shutdown()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+        return False
+
+    def stats(self):
+        return {
+            'type': 'stats',
+            'latency': self.latency.percentiles(),
+            'pending': len(self._pending),
+            'agents': len(self.agents),
+            'idle_agents': sum(location is not None for location in self.agents.values()),
+        }
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    reply = self._handle_message(json.loads(line), writer)
+                except (ValueError, KeyError, TypeError) as error:
+                    reply = {'type': 'error', 'message': str(error)}
+                if reply is not None:
+                    _send(writer, reply)
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _position(self, value):
+        position = (int(value[0]), int(value[1]))
+        if not self.grid.is_passable(position):
+            raise ValueError(f"{position} is not a free cell")
+        return position
+
+    def _handle_message(self, message, writer):
+        kind = message['type']
+        if kind == 'agent':
+            agent_id = message['id']
+            self.agents[agent_id] = self._position(message['location'])
+            for agents in self._failed.values():
+                agents.discard(agent_id)  # Timed out from its old location only
+            return None
+        if kind == 'task':
+            task = (message['id'], self._position(message['pickup']), self._position(message['delivery']))
+            self._pending.append(task + (time.perf_counter(), writer))
+            return None
+        if kind == 'stats':
+            return self.stats()
+        raise ValueError(f"Unknown message type: {kind!r}")
+
+    async def _tick_loop(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            idle = [(agent_id, location) for agent_id, location in self.agents.items() if location is not None]
+            if not idle or not self._pending:
+                continue
+            tasks = list(self._pending)
+            self._pending.clear()
+            for agent_id, _ in idle:
+                self.agents[agent_id] = None  # Busy until the batch hands its task back or it reports in
+            batch = asyncio.create_task(self._plan_batch(idle, tasks))
+            self._batches.add(batch)
+            batch.add_done_callback(self._batches.discard)
+
+    async def _plan_batch(self, idle, tasks):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        blocked = [(row, column) for row, (agent_id, _) in enumerate(idle) for column, task in enumerate(tasks)
+                   if agent_id in self._failed.get(task[0], ())]
+        try:
+            pairs = await loop.run_in_executor(self._executor, _assign_batch, [location for _, location in idle],
+                                               [task[1] for task in tasks], self.strategy, blocked)
+            searches = [loop.run_in_executor(self._executor, _plan_task, idle[row][1], *tasks[column][:3],
+                                             self.time_budget) for row, column in pairs]
+            paths = await asyncio.gather(*searches)
+        except Exception as error:
+            logger.exception("Planning a batch of %d tasks failed", len(tasks))
+            if isinstance(error, BrokenProcessPool):
+                self._executor.shutdown(wait=False)
+                self._executor = ProcessPoolExecutor(**self._pool_args)
+            self._requeue(idle, tasks, set(), set())
+            for task_id, _, _, _, writer in tasks:
+                _reply(writer, {'type': 'error', 'task': task_id, 'message': f"Planning failed: {error!r}"})
+            return
+
+        planned_agents, done_tasks = set(), set()
+        for (row, column), (complete, path) in zip(pairs, paths):
+            (agent_id, _), (task_id, _, _, submitted, writer) = idle[row], tasks[column]
+            if path is not None:
+                planned_agents.add(row)
+                done_tasks.add(column)
+                self._failed.pop(task_id, None)
+                latency = time.perf_counter() - submitted
+                self.latency.record(latency)
+                _reply(writer, {'type': 'path', 'task': task_id, 'agent': agent_id, 'path': path, 'latency': latency})
+                continue
+            if complete:
+                reason = "No path through the pickup and delivery"
+            else:
+                failed = self._failed.setdefault(task_id, set())
+                failed.add(agent_id)
+                if not failed.issuperset(self.agents):
+                    continue  # Another agent may still make it in time
+                reason = "Planning ran out of time for every agent"
+            done_tasks.add(column)
+            self._failed.pop(task_id, None)
+            _reply(writer, {'type': 'error', 'task': task_id, 'message': reason})
+        self._requeue(idle, tasks, planned_agents, done_tasks)
+        logger.debug("Settled %d of %d tasks in %.3fs", len(done_tasks), len(tasks), time.perf_counter() - started)
+
+    def _requeue(self, idle, tasks, planned_agents, done_tasks):
+        """Return the agents without a path to the idle pool and the unsettled tasks to the queue."""
+        for row, (agent_id, location) in enumerate(idle):
+            if row not in planned_agents and self.agents.get(agent_id, location) is None:
+                self.agents[agent_id] = location  # Unless it reported a new location meanwhile
+        # Unsettled tasks go back to the front of the queue in their original order.
+        self._pending.extendleft(reversed([task for column, task in enumerate(tasks) if column not in done_tasks]))
+
+
+def _send(writer, message):
+    writer.write(json.dumps(message).encode() + b'\n')
+
+
+def _reply(writer, message):
+    """Send to a task's client unless it has disconnected."""
+    if not writer.is_closing():
+        _send(writer, message)
+
+
+async def serve(environment, host='127.0.0.1', port=8765, path=None, **kwargs):
+    async with PlanningService(environment, **kwargs) as service:
+        server = await service.start(host, port, path)
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve online MAPD task planning over JSON lines.")
+    parser.add_argument('--map', help="A .map file; an empty grid of --size is used otherwise")
+    parser.add_argument('--size', type=int, nargs=2, default=[10, 10], metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--socket', help="Listen on this Unix socket instead of TCP")
+    parser.add_argument('--tick', type=float, default=0.05, help="Seconds between assignment batches")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--strategy', default='greedy')
+    parser.add_argument('--time-budget', type=float, default=None, help="Seconds per search")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    environment = Environment.from_grid(load_map(args.map)) if args.map else Environment(tuple(args.size))
+    try:
+        asyncio.run(serve(environment, args.host, args.port, args.socket, tick=args.tick, workers=args.workers,
+                          strategy=args.strategy, time_budget=args.time_budget))
+    except KeyboardInterrupt:
+        pass
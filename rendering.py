@@ -0,0 +1,229 @@
+import logging
+import multiprocessing
+import os
+import queue
+
+import numpy as np
+
+from grid import PICKUP, DELIVERY
+
+logger = logging.getLogger(__name__)
+
+AGENT = 4  # Display code of a cell holding an agent, as in Map.display
+# RGB colours of the display codes, matching the ListedColormap of the mapd_problem animation.
+PALETTE = np.array([
+    (255, 255, 255),  # Free: white
+    (0, 0, 255),      # Obstacle: blue
+    (255, 0, 0),      # Pickup: red
+    (0, 128, 0),      # Delivery: green
+    (255, 255, 0),    # Agent: yellow
+], dtype=np.uint8)
+FORMATS = ('png', 'npz')
+
+
+def map_overlay(game_map):
+    """Display codes drawn over the grid, as {flat cell: code}, in Map.display order."""
+    overlay = {}
+    if not game_map.agents:
+        return overlay
+    width = game_map.width
+    for agent in game_map.agents:
+        if agent.location:
+            overlay[agent.location[1] * width + agent.location[0]] = AGENT
+    for task in game_map.tasks:
+        if not task.picked_up:
+            overlay[task.pickup_location[1] * width + task.pickup_location[0]] = PICKUP
+        if not task.delivered:
+            overlay[task.delivery_location[1] * width + task.delivery_location[0]] = DELIVERY
+    return overlay
+
+
+class FrameBuffer:
+    """Persistent RGB image of a Map that is updated only where cells changed.
+
+    The grid is compared against the last rendered grid in one vectorised pass, and
+    agents and task markers touch only their own cells. Rendering a step costs
+    O(changed cells + agents + tasks) writes instead of a full redraw.
+    """
+
+    def __init__(self, height, width):
+        self.codes = np.zeros(height * width, dtype=np.uint8)  # Last rendered display codes
+        self.rgb = np.empty((height, width, 3), dtype=np.uint8)
+        self.rgb[:] = PALETTE[0]
+        self._base = np.zeros(height * width, dtype=np.uint8)  # Grid cells at the last update
+        self._overlay = {}
+
+    def update(self, game_map):
+        """Bring the buffer up to date; returns (cells, rgb) of the cells whose colour changed."""
+        base = game_map.grid.cells.ravel()
+        overlay = map_overlay(game_map)
+        dirty = np.flatnonzero(base != self._base)
+        self._base[dirty] = base[dirty]
+        touched = set(overlay)
+        touched.update(self._overlay)
+        if touched:
+            dirty = np.union1d(dirty, np.fromiter(touched, dtype=np.int64, count=len(touched)))
+        self._overlay = overlay
+
+        codes = self._base[dirty]
+        if overlay:
+            # dirty is sorted and holds every overlay cell.
+            overlay_cells = np.fromiter(overlay.keys(), dtype=np.int64, count=len(overlay))
+            overlay_codes = np.fromiter(overlay.values(), dtype=np.uint8, count=len(overlay))
+            codes[np.searchsorted(dirty, overlay_cells)] = overlay_codes
+        changed = codes != self.codes[dirty]
+        cells, codes = dirty[changed], codes[changed]
+        self.codes[cells] = codes
+        colours = PALETTE[codes]
+        self.rgb.reshape(-1, 3)[cells] = colours
+        return cells, colours
+
+
+class _FrameWriter:
+    """Applies frame diffs to its own copy of the image and writes frames to disk."""
+
+    def __init__(self, directory, height, width, fmt, scale, chunk_size):
+        _check_format(fmt)
+        self.directory = directory
+        self.fmt = fmt
+        self.scale = scale
+        self.chunk_size = chunk_size
+        self.rgb = np.empty((height, width, 3), dtype=np.uint8)
+        self.rgb[:] = PALETTE[0]
+        self._chunk = []
+        self._chunk_steps = []
+        self._chunks = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, step, cells, colours):
+        self.rgb.reshape(-1, 3)[cells] = colours
+        if self.fmt == 'png':
+            import matplotlib.image  # Writes through Agg/PIL, no display needed
+
+            image = self.rgb
+            if self.scale > 1:
+                image = image.repeat(self.scale, axis=0).repeat(self.scale, axis=1)
+            matplotlib.image.imsave(os.path.join(self.directory, f"frame_{step:08d}.png"), image)
+        else:
+            self._chunk.append(self.rgb.copy())
+            self._chunk_steps.append(step)
+            if len(self._chunk) == self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        """Write the buffered frames of the npz format as one compressed chunk."""
+        if not self._chunk:
+            return
+        path = os.path.join(self.directory, f"frames_{self._chunks:05d}.npz")
+        np.savez_compressed(path, frames=np.stack(self._chunk), steps=np.array(self._chunk_steps, dtype=np.int64))
+        self._chunks += 1
+        self._chunk, self._chunk_steps = [], []
+
+
+def _check_format(fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown frame format: {fmt!r}")
+
+
+def _writer_process(messages, *args):
+    writer = _FrameWriter(*args)
+    while True:
+        message = messages.get()
+        if message is None:
+            break
+        writer.write(*message)
+    writer.flush()
+
+
+class Renderer:
+    """Headless frame export for a Map, decoupled from the simulation loop.
+
+    Call `capture(game_map)` after every time step. Every `every`-th step
+    updates the FrameBuffer, and only the changed cells are sent over a
+    bounded multiprocessing queue to a worker process. The worker writes
+    PNG images (`fmt='png'`, upscaled by `scale`) or compressed npz chunks
+    of `chunk_size` frames (`fmt='npz'`). With `background=False` frames are
+    written inline, which is handy for debugging. If the worker dies,
+    the next `capture` or `close` raises RuntimeError instead of blocking
+    on the queue.
+    """
+
+    def __init__(self, directory, height, width, fmt='png', every=1, scale=1, chunk_size=256, queue_size=64,
+                 background=True):
+        _check_format(fmt)  # Before the worker starts, so a bad format fails here and not in the child
+        self.every = every
+        self.buffer = FrameBuffer(height, width)
+        self.frames = 0
+        self._steps = 0
+        args = (directory, height, width, fmt, scale, chunk_size)
+        if background:
+            self._writer = None
+            self._queue = multiprocessing.Queue(queue_size)
+            self._process = multiprocessing.Process(target=_writer_process, args=(self._queue,) + args, daemon=True)
+            self._process.start()
+        else:
+            self._writer = _FrameWriter(*args)
+            self._queue = self._process = None
+
+    @classmethod
+    def for_map(cls, game_map, directory, **kwargs):
+        return cls(directory, game_map.height, game_map.width, **kwargs)
+
+    def capture(self, game_map):
+        """Render the current state if this step is not decimated away."""
+        step = self._steps
+        self._steps += 1
+        if step % self.every:
+            return
+        cells, colours = self.buffer.update(game_map)
+        self.frames += 1
+        if self._writer is not None:
+            self._writer.write(step, cells, colours)
+        elif self._process is None:
+            raise RuntimeError("Renderer is closed")
+        else:
+            self._put((step, cells, colours))
+
+    def _put(self, message):
+        # Poll so that a dead worker, which never drains the queue, raises instead of blocking forever.
+        while True:
+            try:
+                self._queue.put(message, timeout=0.1)
+                return
+            except queue.Full:
+                if not self._process.is_alive():
+                    self._process.join()
+                    exitcode, self._process = self._process.exitcode, None
+                    raise RuntimeError(f"Frame writer exited with code {exitcode}")
+
+    def close(self):
+        """Write every pending frame and stop the worker."""
+        if self._writer is not None:
+            self._writer.flush()
+        elif self._process is not None:
+            self._put(None)
+            self._process.join()
+            exitcode, self._process = self._process.exitcode, None
+            if exitcode:
+                raise RuntimeError(f"Frame writer exited with code {exitcode}")
+            logger.info("Rendered %d frames", self.frames)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+def load_frames(directory):
+    """All frames of an npz export as a (frames, height, width, 3) array, plus their step numbers."""
+    paths = sorted(name for name in os.listdir(directory) if name.startswith('frames_') and name.endswith('.npz'))
+    frames, steps = [], []
+    for name in paths:
+        with np.load(os.path.join(directory, name)) as data:
+            frames.append(data['frames'])
+            steps.append(data['steps'])
+    if not frames:
+        return np.empty((0, 0, 0, 3), dtype=np.uint8), np.empty(0, dtype=np.int64)
+    return np.concatenate(frames), np.concatenate(steps)
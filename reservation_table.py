@@ -0,0 +1,98 @@
+from instrumentation import STATS
+
+
+class ReservationTable:
+    """Hashed vertex/edge reservations for prioritized space-time planning.
+
+    A committed path reserves (cell, t) for every step and the directed edge
+    (from_cell, to_cell, t) for every move, so vertex and swap conflicts are
+    both O(1) lookups. An agent that finishes its path can be parked at its
+    last cell, which blocks that cell for all later time steps. Reservations
+    are kept per agent so they can be released again when an agent replans.
+    Cells are flat grid indices (see grid.Grid.index).
+    """
+
+    def __init__(self):
+        self._vertices = {}  # cell -> {t: agent_id}
+        self._latest = {}  # cell -> last reserved t, so can_park is O(1)
+        self._edges = {}  # (from_cell, to_cell, t) -> agent_id
+        self._parked = {}  # cell -> (t, agent_id)
+        self._paths = {}  # agent_id -> (start_time, path, parked)
+        self.horizon = 0  # Last time step covered by any committed path
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __contains__(self, agent_id):
+        return agent_id in self._paths
+
+    def commit(self, agent_id, path, start_time=0, park=True):
+        """Reserve `path` (one cell per time step starting at `start_time`) for `agent_id`."""
+        if agent_id in self._paths:
+            STATS.incr('replans')
+            self.release(agent_id)
+        for offset, cell in enumerate(path):
+            t = start_time + offset
+            self._vertices.setdefault(cell, {})[t] = agent_id
+            if t > self._latest.get(cell, -1):
+                self._latest[cell] = t
+            if offset:
+                self._edges[(path[offset - 1], cell, t)] = agent_id
+        end_time = start_time + len(path) - 1
+        if park and path:
+            self._parked[path[-1]] = (end_time, agent_id)
+        self._paths[agent_id] = (start_time, list(path), park)
+        self.horizon = max(self.horizon, end_time)
+
+    def release(self, agent_id):
+        """Drop every reservation held by `agent_id`."""
+        start_time, path, park = self._paths.pop(agent_id)
+        for offset, cell in enumerate(path):
+            t = start_time + offset
+            times = self._vertices[cell]
+            if times.get(t) == agent_id:
+                del times[t]
+                if not times:
+                    del self._vertices[cell]
+                    del self._latest[cell]
+                elif self._latest[cell] == t:
+                    self._latest[cell] = max(times)  # Only when the latest reservation goes away
+            if offset and self._edges.get((path[offset - 1], cell, t)) == agent_id:
+                del self._edges[(path[offset - 1], cell, t)]
+        if park and path and self._parked.get(path[-1], (None, None))[1] == agent_id:
+            del self._parked[path[-1]]
+
+    def path_of(self, agent_id):
+        return self._paths[agent_id][1]
+
+    def is_vertex_free(self, cell, t):
+        times = self._vertices.get(cell)
+        if times is not None and t in times:
+            return False
+        parked = self._parked.get(cell)
+        return parked is None or t < parked[0]
+
+    def is_edge_free(self, from_cell, to_cell, t):
+        """True unless another agent swaps through the same edge while arriving at `t`."""
+        return (to_cell, from_cell, t) not in self._edges
+
+    def can_move(self, from_cell, to_cell, t):
+        """Check a move (or a wait when from_cell == to_cell) that arrives at `to_cell` at time `t`."""
+        if not self.is_vertex_free(to_cell, t):
+            return False
+        return from_cell == to_cell or self.is_edge_free(from_cell, to_cell, t)
+
+    def can_park(self, cell, t):
+        """True if an agent can stay at `cell` from time `t` onwards."""
+        if cell in self._parked:
+            return False
+        return self._latest.get(cell, -1) < t
+
+    def path_is_free(self, path, start_time=0):
+        """Check an already computed path against all reservations."""
+        if not path or not self.is_vertex_free(path[0], start_time):
+            return False
+        for offset in range(1, len(path)):
+            if not self.can_move(path[offset - 1], path[offset], start_time + offset):
+                return False
+        return True
@@ -0,0 +1,268 @@
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+
+from instrumentation import STATS
+from mla_star import plan_goals
+from reservation_table import ReservationTable
+
+logger = logging.getLogger(__name__)
+
+
+def windowed_search(environment, reservations, start, targets, start_time, window, final=False,
+                    deadline=None, max_expansions=None):
+    """Space-time MLA* that resolves conflicts only for the next `window` steps.
+
+    Searches (cell, label, t) states with wait actions from `start` at
+    `start_time` through the cells `targets` in order, checking moves against
+    `reservations`. If `final` is set and the last target can be parked in,
+    the search stops there. Otherwise it returns the conflict-free path,
+    `window` steps long, that ends with the least distance left. When the
+    budget runs out, the best state found so far is used. Returns a list of
+    flat cells, one per step.
+    """
+    grid = environment.grid
+    end_time = start_time + window
+    table = environment.heuristic
+    target_cells = [grid.index(target) for target in targets]
+    last = len(targets)
+    if table is not None:
+        fields = [table.field(target).ravel() for target in targets]
+        estimates = [lambda cell, field=field: int(field[cell]) for field in fields]
+    else:
+        width = grid.width
+        estimates = [lambda cell, tx=tx, ty=ty: abs(cell % width - tx) + abs(cell // width - ty) for tx, ty in targets]
+    legs = [estimates[label + 1](target_cells[label]) for label in range(last - 1)]
+    remaining = [sum(legs[label:]) for label in range(last)] + [0]
+
+    def heuristic(cell, label):
+        return 0 if label == last else estimates[label](cell) + remaining[label]
+
+    def advance(cell, label):
+        while label < last and cell == target_cells[label]:
+            label += 1
+        return label
+
+    start_cell = grid.index(start)
+    start_state = (start_cell, advance(start_cell, 0), start_time)
+    parents = {start_state: None}
+    counter = itertools.count()
+    start_h = heuristic(start_cell, start_state[1])
+    open_list = [(start_time + start_h, start_h, next(counter), start_state)]
+    best, best_key = start_state, (start_h, -start_time)
+    offsets, indices = grid.offsets, grid.indices
+    unreachable = table.unreachable if table is not None else None
+    expanded = 0
+    if max_expansions is None:
+        max_expansions = float('inf')
+    while open_list:
+        _, h, _, state = heapq.heappop(open_list)
+        cell, label, t = state
+        if (h, -t) < best_key:
+            best, best_key = state, (h, -t)
+        if (final and label == last and reservations.can_park(cell, t)) or t == end_time:
+            best = state  # Popped in f order, so no other window end is closer
+            break
+        if expanded >= max_expansions or (deadline is not None and not expanded & 0x3F
+                                          and time.perf_counter() > deadline):
+            break
+        expanded += 1
+        next_t = t + 1
+        for next_cell in itertools.chain(indices[offsets[cell]:offsets[cell + 1]], (cell,)):
+            if not reservations.can_move(cell, next_cell, next_t):
+                continue
+            next_label = advance(next_cell, label)
+            next_state = (next_cell, next_label, next_t)
+            if next_state in parents:
+                continue
+            next_h = heuristic(next_cell, next_label)
+            if unreachable is not None and next_label < last and estimates[next_label](next_cell) == unreachable:
+                continue
+            parents[next_state] = state
+            heapq.heappush(open_list, (next_t + next_h, next_h, next(counter), next_state))
+    environment.nodes_expanded += expanded
+    if STATS.enabled:
+        STATS.incr('windowed_searches')
+        STATS.incr('nodes_expanded', expanded)
+
+    path = []
+    state = best
+    while state is not None:
+        path.append(state[0])
+        state = parents[state]
+    return path[::-1]
+
+
+class RollingHorizonPlanner:
+    """Windowed, periodically replanned MAPD execution (WHCA*-style).
+
+    Every `replan_every` steps each agent gets a spatial MLA* path through its
+    remaining goals (ignoring other agents). Conflicts with the agents planned
+    before it are resolved only for the next `window` steps, on a fresh
+    reservation table. The planning order rotates between replans, and an
+    agent that cannot plan a safe window is given priority and the window is
+    planned again.
+    `time_budget` (seconds per replan) and `max_expansions` (per search)
+    bound each replan, so a step costs a predictable amount of time. Once
+    the budget is spent, the remaining agents keep the rest of their
+    previous window if it is still conflict-free, or wait.
+    """
+
+    def __init__(self, environment, window=8, replan_every=None, time_budget=None, max_expansions=None):
+        replan_every = replan_every or max(1, window // 2)
+        if not 1 <= replan_every <= window:
+            raise ValueError("replan_every must be between 1 and window")
+        self.environment = environment
+        self.window = window
+        self.replan_every = replan_every
+        self.time_budget = time_budget
+        self.max_expansions = max_expansions
+        self.time = 0
+        self.positions = {}  # agent id -> (x, y)
+        self.goals = {}  # agent id -> deque of (x, y) goals still to visit
+        self._plans = {}  # agent id -> flat cells from self.time on
+        self._since_replan = None
+        self.replans = 0
+        self.last_replan_seconds = 0.0
+        self.budget_exhausted = 0  # Replans that ran out of time before planning every agent
+        self.collisions = 0  # Steps with a vertex or swap conflict (a safety check; stays 0)
+
+    def add_agent(self, agent_id, position, goals=()):
+        grid = self.environment.grid
+        if not grid.is_passable(position):
+            raise ValueError(f"Agent {agent_id} starts on a blocked cell {position}")
+        self.positions[agent_id] = tuple(position)
+        self.goals[agent_id] = deque()
+        self._plans[agent_id] = [grid.index(position)]
+        self.assign(agent_id, goals)
+
+    def assign(self, agent_id, goals):
+        """Append goals (e.g. a task's pickup and delivery) to an agent's route."""
+        self.goals[agent_id].extend(tuple(goal) for goal in goals)
+        self._since_replan = None  # Replan on the next step
+
+    def _replan(self):
+        started = time.perf_counter()
+        deadline = started + self.time_budget if self.time_budget is not None else None
+        # Rotate priorities between replans so no agent always yields.
+        order = list(self.positions)
+        shift = self.replans % len(order) if order else 0
+        order = order[shift:] + order[:shift]
+        plans, failed, out_of_time = {}, None, False
+        # Unplanned agents first hold their cell for a single step only. An agent that then cannot
+        # finish the window safely is moved to the front and the window is planned again. The last
+        # attempt holds every unplanned cell for the whole window, which is always collision-free.
+        for _ in range(len(order)):
+            plans, failed, out_of_time = self._plan_window(order, 2, deadline)
+            if failed is None or out_of_time:
+                break
+            order.remove(failed)
+            order.insert(0, failed)
+            if STATS.enabled:
+                STATS.incr('rolling_restarts')
+        if failed is not None:
+            plans, _, out_of_time = self._plan_window(order, self.window + 1, deadline)
+        self._plans = plans
+        if out_of_time:
+            self.budget_exhausted += 1
+        self.replans += 1
+        self._since_replan = 0
+        self.last_replan_seconds = time.perf_counter() - started
+        if STATS.enabled:
+            STATS.add_time('rolling_replan', self.last_replan_seconds)
+
+    def _plan_window(self, order, hold, deadline):
+        """Plan agents in priority `order`; returns (plans, first agent without a safe plan, out of time)."""
+        environment, grid, window = self.environment, self.environment.grid, self.window
+        reservations = ReservationTable()
+        for agent_id, position in self.positions.items():
+            reservations.commit(agent_id, [grid.index(position)] * hold, self.time, park=False)
+        plans = {}
+        out_of_time = False
+        for agent_id in order:
+            position = self.positions[agent_id]
+            reservations.release(agent_id)
+            goals = self.goals[agent_id]
+            out_of_time = out_of_time or (deadline is not None and time.perf_counter() > deadline)
+            if out_of_time:
+                plan = self._fallback(agent_id, reservations)
+            elif not goals:
+                plan = windowed_search(environment, reservations, position, [position], self.time, window, final=True,
+                                       max_expansions=self.max_expansions)
+            else:
+                route = plan_goals(position, list(goals), environment, deadline, self.max_expansions)
+                if not route:
+                    logger.warning("Agent %s has no route to %s", agent_id, goals[0])
+                    route = [position]
+                targets = self._waypoints(route[1:window + 1], goals) + [route[min(window, len(route) - 1)]]
+                final = len(route) - 1 <= window and route[-1] == goals[-1]
+                plan = windowed_search(environment, reservations, position, targets, self.time, window, final=final,
+                                       deadline=deadline, max_expansions=self.max_expansions)
+            # A plan that ends inside the window stays put afterwards, so it must be able to park there.
+            park = len(plan) <= window
+            if park and not reservations.can_park(plan[-1], self.time + len(plan) - 1):
+                if hold <= window:
+                    return plans, agent_id, out_of_time
+                logger.warning("Agent %s has no safe plan at t=%d", agent_id, self.time)
+            reservations.commit(agent_id, plan, self.time, park=park)
+            plans[agent_id] = plan
+        return plans, None, out_of_time
+
+    @staticmethod
+    def _waypoints(cells, goals):
+        """Goals that the spatial route `cells` passes through, in order, so the window keeps visiting them."""
+        waypoints = []
+        pending = iter(goals)
+        goal = next(pending, None)
+        for cell in cells:
+            while goal is not None and cell == goal:
+                waypoints.append(goal)
+                goal = next(pending, None)
+        return waypoints
+
+    def _fallback(self, agent_id, reservations):
+        """The rest of the previous window if it is still free, else waiting in place."""
+        plan = self._plans[agent_id]
+        if reservations.path_is_free(plan, self.time) and reservations.can_park(plan[-1], self.time + len(plan) - 1):
+            return plan
+        return plan[:1]
+
+    def step(self):
+        """Advance every agent by one step; returns {agent id: position}."""
+        if self._since_replan is None or self._since_replan >= self.replan_every:
+            self._replan()
+        grid = self.environment.grid
+        previous = dict(self.positions)
+        for agent_id, plan in self._plans.items():
+            if len(plan) > 1:
+                plan.pop(0)
+            position = grid.position(plan[0])
+            self.positions[agent_id] = position
+            goals = self.goals[agent_id]
+            while goals and goals[0] == position:
+                goals.popleft()
+        if self._conflicting(previous, self.positions):
+            self.collisions += 1
+        self.time += 1
+        self._since_replan += 1
+        return dict(self.positions)
+
+    @staticmethod
+    def _conflicting(before, after):
+        """True if a step put two agents on one cell or swapped two agents."""
+        if len(set(after.values())) < len(after):
+            return True
+        moves = {(before[agent_id], position) for agent_id, position in after.items() if before[agent_id] != position}
+        return any((target, source) in moves for source, target in moves)
+
+    def run(self, steps):
+        for _ in range(steps):
+            self.step()
+        return dict(self.positions)
+
+    @property
+    def idle(self):
+        """True once every agent has reached all of its goals."""
+        return not any(self.goals.values())
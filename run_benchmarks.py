@@ -1,6 +1,17 @@
+import argparse
 import json
+import os
+import resource
+import sys
+import time
+from itertools import islice
 import numpy as np
 
+from heuristics import DEFAULT_CACHE_DIR, DistanceTable
+from map_loader import is_resource_fork, iter_scenario, load_map as load_grid, parse_scenario_line
+from mla_star import Environment, Task, commit_path, space_time_mla_star
+from reservation_table import ReservationTable
+
 class MapEnvironment:
     def __init__(self, dimensions, map_layout):
         self.dimensions = dimensions
@@ -11,25 +22,159 @@ class MapEnvironment:
         agent = {'start': start, 'goal': goal, 'type': scenario_type}
         self.agents.append(agent)
 
+    def reset_agents(self):
+        self.agents = []
+
 def load_map(file_path):
-    with open(file_path, 'r') as file:
-        lines = file.readlines()
-        map_layout = [list(line.strip()) for line in lines[4:]]  # Adjust as per your map file format
-    return map_layout  # Return only the map layout
+    # Cell array of the map (0 free, 1 obstacle), parsed once and cached next to the map file
+    return load_grid(file_path).cells
 
 def load_scenario(file_path, environment):
-    with open(file_path, 'r') as file:
-        # Identify the scenario type based on the file name
-        scenario_type = "even" if "even" in file_path else "random"
-        
-        for line in file:
-            start, goal = parse_line_to_positions(line)
-            # Pass the scenario type as an additional parameter to add_agent
-            environment.add_agent(start, goal, scenario_type)
+    if is_resource_fork(file_path):
+        return
+    # Identify the scenario type based on the file name
+    scenario_type = "even" if "even" in file_path else "random"
+
+    for entry in iter_scenario(file_path):
+        # Pass the scenario type as an additional parameter to add_agent
+        environment.add_agent(entry.start, entry.goal, scenario_type)
 
 def parse_line_to_positions(line):
-    # Convert line to start and goal positions; implementation depends on your scenario file format
-    return start_position, goal_position
+    # Convert a scenario line to (x, y) start and goal positions
+    entry = parse_scenario_line(line)
+    if entry is None:
+        return None, None
+    return entry.start, entry.goal
+
+def plan_agent(environment, reservations, agent_id, entry, horizon_slack=64, deadline=None, should_stop=None):
+    """Plan one scenario agent from start to goal around the committed paths and reserve it.
+
+    Returns the path, or None if the agent cannot be added.
+    """
+    distance = environment.heuristic.distance(entry.start, entry.goal)
+    if distance == float('inf'):
+        return None
+    # Waiting can only help until every earlier agent has parked
+    tmax = max(reservations.horizon, distance) + distance + horizon_slack
+    path = space_time_mla_star(entry.start, [Task(agent_id, entry.goal, entry.goal)], environment, reservations,
+                               tmax=tmax, deadline=deadline, should_stop=should_stop)
+    if path is not None:
+        commit_path(reservations, agent_id, path, environment)
+    return path
+
+def solve_instance(environment, entries, horizon_slack=64, cache_dir=DEFAULT_CACHE_DIR):
+    """Plan the first agents of a scenario one after another with space-time MLA*.
+
+    Each agent goes from its start to its goal and then parks there; earlier
+    agents' paths are reserved for the later ones. Returns a result dict with
+    solved, makespan, sum_of_costs, wall_time and nodes_expanded. Distance
+    fields are cached under `cache_dir` (None keeps them in memory only).
+    """
+    started = time.perf_counter()
+    expanded_before = environment.nodes_expanded
+    if environment.heuristic is None:
+        environment.heuristic = DistanceTable(environment.grid, cache_dir=cache_dir)
+    reservations = ReservationTable()
+    paths = []
+    for agent_id, entry in enumerate(entries):
+        path = plan_agent(environment, reservations, agent_id, entry, horizon_slack)
+        if path is None:
+            break
+        paths.append(path)
+
+    solved = len(paths) == len(entries)
+    return {
+        'solved': solved,
+        'makespan': max((len(path) - 1 for path in paths), default=0) if solved else None,
+        'sum_of_costs': sum(len(path) - 1 for path in paths) if solved else None,
+        'wall_time': time.perf_counter() - started,
+        'nodes_expanded': environment.nodes_expanded - expanded_before,
+    }
+
+def current_memory_mb():
+    """Resident memory of this process in MiB (peak resident memory where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1 << 20)
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+def sweep_scenario(environment, scenario_file, max_agents=None, time_limit=60.0, memory_limit_mb=None, horizon_slack=64,
+                   cache_dir=DEFAULT_CACHE_DIR):
+    """Grow the agent count of one scenario until the planner fails.
+
+    The instance with k agents reuses the reservation table of the k - 1
+    instance and only plans agent k, so its runtime is the cumulative
+    planning time. An instance fails when the new agent has no path, when
+    that cumulative time exceeds `time_limit` seconds, or when the process
+    uses more than `memory_limit_mb`; the scenario stops at the first
+    failure. Memory is also polled during each search, which is aborted as
+    soon as it goes over the limit. Returns one record per attempted agent count.
+    """
+    if environment.heuristic is None:
+        environment.heuristic = DistanceTable(environment.grid, cache_dir=cache_dir)
+    reservations = ReservationTable()
+    records = []
+    runtime = 0.0
+    expanded_before = environment.nodes_expanded
+    over_memory = None
+    if memory_limit_mb is not None:
+        def over_memory():
+            return current_memory_mb() > memory_limit_mb
+    for agent_id, entry in enumerate(islice(iter_scenario(scenario_file), max_agents)):
+        started = time.perf_counter()
+        path = plan_agent(environment, reservations, agent_id, entry, horizon_slack,
+                          deadline=started + time_limit - runtime, should_stop=over_memory)
+        runtime += time.perf_counter() - started
+        memory = current_memory_mb()
+        reason = None
+        if runtime > time_limit:
+            reason = 'time_limit'
+        elif over_memory is not None and memory > memory_limit_mb:
+            reason = 'memory_limit'
+        elif path is None:
+            reason = 'no_path'
+        records.append({'num_agents': agent_id + 1, 'solved': reason is None, 'runtime': runtime,
+                        'memory_mb': memory, 'nodes_expanded': environment.nodes_expanded - expanded_before,
+                        'failure': reason})
+        if reason is not None:
+            break
+    return records
+
+def sweep_benchmark(benchmark, max_agents=None, time_limit=60.0, memory_limit_mb=None, cache_dir=DEFAULT_CACHE_DIR):
+    """Success-rate and mean-runtime curves over agent counts for every scenario of a benchmark."""
+    environment = Environment.from_grid(load_grid(benchmark['map_file']))
+    solved_runtimes = {}  # agent count -> runtimes of the scenarios solved at that count
+    scenario_files = [path for path in benchmark['scenario_files'] if not is_resource_fork(path)]
+    largest = 0
+    for scenario_file in scenario_files:
+        records = sweep_scenario(environment, scenario_file, max_agents, time_limit, memory_limit_mb,
+                                 cache_dir=cache_dir)
+        for record in records:
+            largest = max(largest, record['num_agents'])
+            if record['solved']:
+                solved_runtimes.setdefault(record['num_agents'], []).append(record['runtime'])
+
+    agents = list(range(1, largest + 1))
+    return {
+        'agents': agents,
+        'success_rate': [len(solved_runtimes.get(count, [])) / len(scenario_files) for count in agents],
+        'mean_runtime': [float(np.mean(solved_runtimes[count])) if count in solved_runtimes else None for count in agents],
+    }
+
+def sweep(benchmark_file, output_file, max_agents=None, time_limit=60.0, memory_limit_mb=None,
+          cache_dir=DEFAULT_CACHE_DIR):
+    with open(benchmark_file, 'r') as file:
+        benchmarks = json.load(file)
+
+    curves = {}
+    for benchmark in benchmarks:
+        print(f"Sweeping Benchmark: {benchmark['name']}")
+        curves[benchmark['name']] = sweep_benchmark(benchmark, max_agents, time_limit, memory_limit_mb, cache_dir)
+        with open(output_file, 'w') as file:
+            json.dump(curves, file, indent=2)
+    return curves
 
 def main(benchmark_file):
     with open(benchmark_file, 'r') as file:
@@ -53,4 +198,16 @@ def main(benchmark_file):
 
 
 if __name__ == "__main__":
-    main("benchmarks.json")
+    parser = argparse.ArgumentParser(description="Run the benchmarks in a benchmark file.")
+    parser.add_argument('benchmark_file', nargs='?', default='benchmarks.json')
+    parser.add_argument('--sweep', action='store_true', help="Add agents one at a time until the planner fails")
+    parser.add_argument('--max-agents', type=int, default=None)
+    parser.add_argument('--time-limit', type=float, default=60.0, help="Seconds per instance")
+    parser.add_argument('--memory-limit', type=float, default=None, help="MiB per instance")
+    parser.add_argument('--output', default='sweep_results.json')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="Directory for cached distance fields")
+    args = parser.parse_args()
+    if args.sweep:
+        sweep(args.benchmark_file, args.output, args.max_agents, args.time_limit, args.memory_limit, args.cache_dir)
+    else:
+        main(args.benchmark_file)
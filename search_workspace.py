@@ -0,0 +1,154 @@
+import heapq
+import time
+from array import array
+
+
+class SearchWorkspace:
+    """Reusable MLA* search state for one grid.
+
+    g-values and parent pointers live in preallocated arrays indexed by
+    state = label * num_cells + cell. Entries are only valid when their
+    generation stamp matches the current search, so starting a new search is
+    a counter increment instead of clearing the arrays. The arrays grow when
+    a query needs more labels than any previous one.
+    """
+
+    def __init__(self, grid, num_labels=3):
+        self.grid = grid
+        self.num_labels = 0
+        self.generation = 0
+        self.expanded = 0  # Nodes expanded by the last search
+        self.pushes = 0  # Heap pushes by the last search
+        self.pruned = 0  # Stale heap entries and dominated successors skipped by the last search
+        self.complete = True  # False if the last search ran out of budget and returned a partial path
+        self._allocate(num_labels)
+
+    def _allocate(self, num_labels):
+        size = self.grid.num_cells * num_labels
+        self.g = array('l', bytes(array('l').itemsize * size))
+        self.parent = array('l', bytes(array('l').itemsize * size))
+        self.stamp = array('L', bytes(array('L').itemsize * size))
+        self.num_labels = num_labels
+        self.generation = 0
+
+    def reset(self, num_labels):
+        """Invalidate all stored states in O(1), growing the arrays if needed."""
+        if num_labels > self.num_labels:
+            self._allocate(num_labels)
+        self.generation += 1
+        self.expanded = 0
+        self.pushes = 0
+        self.pruned = 0
+        self.complete = True
+
+    def search(self, start, goals, heuristic=None, deadline=None, max_expansions=None):
+        """Shortest path from `start` through `goals` in order, as a list of positions.
+
+        `heuristic` is an optional heuristics.DistanceTable; without it the
+        Manhattan distance is used. Returns None if a goal is unreachable.
+
+        `deadline` (a time.perf_counter() value) and `max_expansions` bound
+        the search. When either runs out, the search returns the best partial
+        path found so far: the expanded state with the most goals reached,
+        closest to the next goal. `complete` is then set to False.
+        """
+        grid = self.grid
+        if not goals or not grid.is_passable(start):
+            return None
+        num_cells = grid.num_cells
+        width = grid.width
+        final = len(goals)
+        self.reset(final + 1)
+        generation = self.generation
+        g_values, parents, stamps = self.g, self.parent, self.stamp
+        offsets, indices = grid.offsets, grid.indices
+
+        goal_cells = [grid.index(goal) for goal in goals]
+        if heuristic is None:
+            fields = None
+            legs = [abs(a[0] - b[0]) + abs(a[1] - b[1]) for a, b in zip(goals, goals[1:])]
+        else:
+            fields = [heuristic.field(goal).ravel() for goal in goals]
+            unreachable = heuristic.unreachable
+            legs = [int(field[cell]) for field, cell in zip(fields[1:], goal_cells)]
+            if unreachable in legs:
+                return None
+        # Distance still to cover after reaching goals[label].
+        remaining = [sum(legs[label:]) for label in range(final)]
+
+        def advance(cell, label):
+            while label < final and cell == goal_cells[label]:
+                label += 1
+            return label
+
+        start_cell = grid.index(start)
+        start_label = advance(start_cell, 0)
+        start_state = start_label * num_cells + start_cell
+        g_values[start_state] = 0
+        parents[start_state] = -1
+        stamps[start_state] = generation
+        open_list = [(0, 0, 0, start_state)]
+        tie = 1
+        expanded = pruned = 0
+        budgeted = deadline is not None or max_expansions is not None
+        if max_expansions is None:
+            max_expansions = float('inf')
+        best_state, best_label, best_h = start_state, -1, 0
+
+        while open_list:
+            f, h, _, state = heapq.heappop(open_list)
+            g = f - h
+            if g > g_values[state]:
+                pruned += 1  # Superseded by a cheaper copy of the same state
+                continue
+            label, cell = divmod(state, num_cells)
+            if label == final:
+                self.expanded, self.pushes, self.pruned = expanded, tie, pruned
+                return self._reconstruct(state)
+            if budgeted:
+                if label > best_label or (label == best_label and h < best_h):
+                    best_state, best_label, best_h = state, label, h
+                # Checked before counting this expansion, so exactly max_expansions states are expanded.
+                if expanded >= max_expansions or (deadline is not None and not expanded & 0xFF
+                                                  and time.perf_counter() > deadline):
+                    self.expanded, self.pushes, self.pruned = expanded, tie, pruned
+                    self.complete = False
+                    return self._reconstruct(best_state)
+            expanded += 1
+
+            next_g = g + 1
+            for k in range(offsets[cell], offsets[cell + 1]):
+                next_cell = indices[k]
+                next_label = advance(next_cell, label)
+                next_state = next_label * num_cells + next_cell
+                if stamps[next_state] == generation and g_values[next_state] <= next_g:
+                    pruned += 1
+                    continue
+
+                if next_label == final:
+                    next_h = 0
+                elif fields is None:
+                    gx, gy = goals[next_label]
+                    next_h = abs(next_cell % width - gx) + abs(next_cell // width - gy) + remaining[next_label]
+                else:
+                    next_h = int(fields[next_label][next_cell])
+                    if next_h == unreachable:
+                        continue
+                    next_h += remaining[next_label]
+
+                g_values[next_state] = next_g
+                parents[next_state] = state
+                stamps[next_state] = generation
+                heapq.heappush(open_list, (next_g + next_h, next_h, tie, next_state))
+                tie += 1
+
+        self.expanded, self.pushes, self.pruned = expanded, tie, pruned
+        return None
+
+    def _reconstruct(self, state):
+        num_cells = self.grid.num_cells
+        path = []
+        while state != -1:
+            path.append(self.grid.position(state % num_cells))
+            state = self.parent[state]
+        return path[::-1]
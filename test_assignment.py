@@ -0,0 +1,53 @@
+import itertools
+import unittest
+
+import numpy as np
+
+import assignment
+from assignment import assign, cost_matrix, greedy_assignment, hungarian_assignment, select_agent
+
+
+def brute_force(costs):
+    rows, columns = costs.shape
+    best = float('inf')
+    for permutation in itertools.permutations(range(columns), rows):
+        best = min(best, sum(costs[row, column] for row, column in enumerate(permutation)))
+    return best
+
+
+class TestAssignment(unittest.TestCase):
+    def test_cost_matrix_manhattan(self):
+        costs = cost_matrix([(0, 0), (3, 3)], [(1, 2), (3, 0), (3, 3)])
+        np.testing.assert_array_equal(costs, [[3, 3, 6], [3, 3, 0]])
+
+    def test_greedy_takes_cheapest_pairs(self):
+        costs = np.array([[1.0, 2.0], [1.5, 10.0]])
+        self.assertEqual(greedy_assignment(costs), [(0, 0), (1, 1)])
+
+    def test_hungarian_is_optimal(self):
+        rng = np.random.default_rng(7)
+        original = assignment.linear_sum_assignment
+        assignment.linear_sum_assignment = None  # Exercise the NumPy fallback
+        try:
+            for shape in [(4, 4), (3, 6), (6, 3)]:
+                costs = rng.integers(0, 20, size=shape).astype(float)
+                pairs = hungarian_assignment(costs)
+                self.assertEqual(len(pairs), min(shape))
+                total = sum(costs[row, column] for row, column in pairs)
+                expected = brute_force(costs) if shape[0] <= shape[1] else brute_force(costs.T)
+                self.assertEqual(total, expected)
+        finally:
+            assignment.linear_sum_assignment = original
+
+    def test_infeasible_pairs_are_dropped(self):
+        costs = np.array([[np.inf, 1.0], [np.inf, 2.0]])
+        self.assertEqual(hungarian_assignment(costs), [(0, 1)])
+        self.assertEqual(greedy_assignment(costs), [(0, 1)])
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            assign(np.zeros((1, 1)), 'simplex')
+
+    def test_select_agent(self):
+        self.assertEqual(select_agent([1, 0, 0], [0.0, 5.0, 2.0]), 2)
+        self.assertIsNone(select_agent([], []))
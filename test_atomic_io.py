@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from atomic_io import save_atomic
+
+
+class _Unconvertible:
+    def __array__(self, *args, **kwargs):
+        raise RuntimeError("cannot convert")
+
+
+class TestSaveAtomic(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_array_and_dict(self):
+        path = os.path.join(self.directory, 'field.npy')
+        save_atomic(path, np.arange(4))
+        np.testing.assert_array_equal(np.load(path), np.arange(4))
+
+        path = os.path.join(self.directory, 'arrays.npz')
+        save_atomic(path, {'a': np.ones(3), 'b': np.zeros(2)}, compressed=True)
+        with np.load(path) as data:
+            self.assertEqual(sorted(data.files), ['a', 'b'])
+        self.assertEqual(sorted(os.listdir(self.directory)), ['arrays.npz', 'field.npy'])
+
+    def test_failed_write_keeps_old_file(self):
+        path = os.path.join(self.directory, 'arrays.npz')
+        save_atomic(path, {'a': np.ones(3)})
+        with self.assertRaises(RuntimeError):
+            save_atomic(path, {'a': np.ones(3), 'b': _Unconvertible()})
+        with np.load(path) as data:
+            self.assertEqual(data.files, ['a'])
+        self.assertEqual(os.listdir(self.directory), ['arrays.npz'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,23 @@
+import unittest
+
+from benchmark_suite import compare, measure
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+    def test_measure(self):
+        result = measure(lambda state: [0] * 1000, repeat=3)
+        self.assertEqual(result['repeat'], 3)
+        self.assertLessEqual(result['min'], result['median'])
+        self.assertGreater(result['peak_memory_bytes'], 0)
+
+    def test_compare_flags_regressions_only_for_matching_workloads(self):
+        baseline = {'results': {
+            'a': {'median': 1.0, 'peak_memory_bytes': 100, 'queries': 5},
+            'b': {'median': 1.0, 'peak_memory_bytes': 100, 'queries': 5},
+        }}
+        current = {'results': {
+            'a': {'median': 1.5, 'peak_memory_bytes': 100, 'queries': 5},
+            'b': {'median': 9.0, 'peak_memory_bytes': 100, 'queries': 20},
+        }}
+        self.assertEqual([row[:2] for row in compare(baseline, current)], [('a', 'median')])
+        self.assertEqual(compare(baseline, baseline), [])
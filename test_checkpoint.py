@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from checkpoint import Checkpointer, ReplayLog, load_snapshot, save_snapshot
+from mapd_problem import Agent, Map, Task
+
+
+def make_map(seed=1, retire_delivered=False):
+    agents = [Agent(name=f"Agent {index}", location=(index, 0)) for index in range(4)]
+    return Map(12, 12, obstacles=[(5, y) for y in range(2, 10)], agents=agents, seed=seed,
+               retire_delivered=retire_delivered)
+
+
+def state(game_map):
+    return (game_map.time, game_map.display().tobytes(), [agent.location for agent in game_map.agents],
+            [(task.name, task.picked_up) for task in game_map.tasks],
+            [[task.name for task in agent.task_queue] for agent in game_map.agents], game_map.rng.random())
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_seeded_runs_are_reproducible(self):
+        first, second = make_map(), make_map()
+        for _ in range(30):
+            first.time_step()
+            second.time_step()
+        self.assertEqual(state(first), state(second))
+
+    def test_snapshot_round_trip(self):
+        game_map = make_map()
+        game_map.agents[0].assign_task(Task("Manual", (3, 3), (4, 4)))  # Not in Map.tasks
+        for _ in range(25):
+            game_map.time_step()
+        path = os.path.join(self.directory, 'snapshot.npz')
+        save_snapshot(game_map, path)
+        restored = load_snapshot(path)
+        self.assertEqual(len(restored.free_cells), len(game_map.free_cells))
+        np.testing.assert_array_equal(restored._agent_count, game_map._agent_count)
+        for _ in range(25):
+            game_map.time_step()
+            restored.time_step()
+        self.assertEqual(state(restored), state(game_map))
+
+    def test_lifelong_snapshot_round_trip(self):
+        game_map = make_map(retire_delivered=True)
+        manual = Task("Manual", (3, 3), (4, 4))
+        game_map.add_task(manual)  # Markers counted, but neither listed nor assigned
+        for _ in range(25):
+            game_map.time_step()
+        path = os.path.join(self.directory, 'snapshot.npz')
+        save_snapshot(game_map, path)
+        restored = load_snapshot(path)
+        self.assertTrue(restored.retire_delivered)
+        self.assertEqual(len(restored._registered), len(game_map._registered))
+        for _ in range(25):
+            game_map.time_step()
+            restored.time_step()
+        self.assertEqual(state(restored), state(game_map))
+
+    def test_checkpointer_keep_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            Checkpointer(self.directory, keep=0)
+
+    def test_checkpointer_keeps_one(self):
+        checkpointer = Checkpointer(self.directory, every=10, keep=1)
+        checkpointer.run(make_map(), 25)
+        self.assertEqual([os.path.basename(path) for path in checkpointer.snapshots()], ['snapshot_0000000020.npz'])
+
+    def test_checkpointer_keeps_latest(self):
+        checkpointer = Checkpointer(self.directory, every=10, keep=2)
+        game_map = checkpointer.run(make_map(), 45)
+        self.assertEqual([os.path.basename(path) for path in checkpointer.snapshots()],
+                         ['snapshot_0000000030.npz', 'snapshot_0000000040.npz'])
+        resumed = checkpointer.resume()
+        self.assertEqual(resumed.time, 40)
+        for _ in range(5):
+            resumed.time_step()
+        self.assertEqual(state(resumed), state(game_map))
+
+    def test_replay_fast_forward(self):
+        game_map = make_map()
+        initial = os.path.join(self.directory, 'initial.npz')
+        save_snapshot(game_map, initial)
+        game_map.recorder = ReplayLog()
+        for _ in range(40):
+            game_map.time_step()
+        log_path = os.path.join(self.directory, 'replay.npz')
+        game_map.recorder.save(log_path)
+        log = ReplayLog.load(log_path)
+        self.assertEqual(log.steps, 40)
+
+        replayed = log.fast_forward(load_snapshot(initial), until=40)
+        self.assertEqual(state(replayed), state(game_map))
+
+    def test_replay_detects_divergence(self):
+        game_map = make_map()
+        game_map.recorder = ReplayLog()
+        for _ in range(20):
+            game_map.time_step()
+        with self.assertRaises(ValueError):
+            game_map.recorder.fast_forward(make_map(seed=2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import random
+import unittest
+
+import numpy as np
+
+from free_cells import FreeCellIndex
+
+
+class TestFreeCellIndex(unittest.TestCase):
+    def test_add_discard_contains(self):
+        index = FreeCellIndex.from_mask(np.array([True, False, True, True]))
+        self.assertEqual(len(index), 3)
+        self.assertNotIn(1, index)
+        index.discard(0)
+        self.assertNotIn(0, index)
+        self.assertEqual(sorted(index.cells().tolist()), [2, 3])
+        index.add(1)
+        index.add(1)
+        self.assertEqual(len(index), 3)
+        self.assertIn(1, index)
+
+    def test_sample_only_returns_members(self):
+        index = FreeCellIndex.from_mask(np.arange(100) % 7 == 0)
+        rng = random.Random(3)
+        for _ in range(200):
+            self.assertEqual(index.sample(rng) % 7, 0)
+        self.assertIsNone(FreeCellIndex(4).sample(rng))
@@ -0,0 +1,36 @@
+import unittest
+
+import numpy as np
+
+from grid import Grid, OBSTACLE, PICKUP
+
+
+class TestGrid(unittest.TestCase):
+    def test_index_round_trip(self):
+        grid = Grid(4, 3)
+        self.assertEqual(grid.index((3, 1)), 7)
+        self.assertEqual(grid.position(7), (3, 1))
+
+    def test_neighbor_table(self):
+        grid = Grid(3, 3, obstacles=[(1, 1)])
+        self.assertEqual(grid.neighbors((0, 0)), [(0, 1), (1, 0)])
+        self.assertEqual(sorted(grid.neighbors((1, 0))), [(0, 0), (2, 0)])
+        self.assertEqual(grid.neighbors((1, 1)), [])
+        self.assertEqual(grid.neighbor_offsets[-1], len(grid.neighbor_indices))
+
+    def test_is_passable(self):
+        grid = Grid(3, 3, obstacles=[(2, 0)])
+        self.assertFalse(grid.is_passable((2, 0)))
+        self.assertFalse(grid.is_passable((-1, 0)))
+        self.assertFalse(grid.is_passable((0, 3)))
+        self.assertTrue(grid.is_passable((0, 2)))
+
+    def test_task_markers_do_not_block_neighbors(self):
+        grid = Grid(2, 1)
+        grid.cells[0, 1] = PICKUP
+        self.assertEqual(grid.neighbors((0, 0)), [(1, 0)])
+
+    def test_from_passable(self):
+        grid = Grid.from_passable(np.array([[True, False], [True, True]]))
+        self.assertEqual(grid.cells[0, 1], OBSTACLE)
+        self.assertEqual(grid.neighbors((0, 0)), [(0, 1)])
@@ -0,0 +1,56 @@
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from grid import Grid
+from heuristics import DistanceTable, bfs_distance_field
+
+
+class TestHeuristics(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        # A wall at x=2 with a gap at the bottom forces a detour.
+        self.grid = Grid(5, 5, [(2, 0), (2, 1), (2, 2), (2, 3)])
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_bfs_distance_field(self):
+        field = bfs_distance_field(self.grid, (0, 0))
+        self.assertEqual(field[0, 0], 0)
+        self.assertEqual(field[0, 1], 1)
+        self.assertEqual(field[0, 3], 11)  # Around the wall through (2, 4)
+        self.assertEqual(field[0, 2], np.iinfo(np.uint32).max)
+
+    def test_distance_and_unreachable(self):
+        table = DistanceTable(Grid(3, 3, [(1, 0), (1, 1), (1, 2)]), cache_dir=None)
+        self.assertEqual(table.distance((0, 0), (0, 2)), 2)
+        self.assertEqual(table.distance((0, 0), (2, 2)), float('inf'))
+
+    def test_lru_eviction(self):
+        table = DistanceTable(self.grid, capacity=2, cache_dir=None)
+        table.field((0, 0))
+        table.field((4, 4))
+        table.field((0, 0))
+        table.field((1, 1))  # Evicts (4, 4), the least recently used field
+        self.assertEqual(list(table._fields), [(0, 0), (1, 1)])
+        self.assertEqual(table.hits, 1)
+
+    def test_disk_cache_is_reused(self):
+        DistanceTable(self.grid, cache_dir=self.cache_dir).field((4, 4))
+        table = DistanceTable(self.grid, cache_dir=self.cache_dir)
+        field = table.field((4, 4))
+        self.assertIsInstance(field, np.memmap)
+        self.assertEqual(table.distance((0, 0), (4, 4)), 8)
+
+    def test_distances_to(self):
+        table = DistanceTable(self.grid, cache_dir=None)
+        np.testing.assert_array_equal(table.distances_to((0, 0), [(0, 0), (1, 1), (3, 0)]), [0, 2, 11])
+
+    def test_obstacle_edit_drops_fields(self):
+        table = DistanceTable(Grid(3, 1), cache_dir=self.cache_dir)
+        self.assertEqual(table.distance((0, 0), (2, 0)), 2)
+        table.grid.set_obstacle((1, 0))
+        self.assertEqual(table.distance((0, 0), (2, 0)), float('inf'))
@@ -0,0 +1,149 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from grid import Grid
+from heuristics import DistanceTable, bfs_distance_field
+from hierarchical import HierarchicalPlanner
+from mla_star import Environment, Task, mla_star
+
+
+def is_valid_path(grid, path):
+    steps = zip(path, path[1:])
+    return all(grid.is_passable(cell) for cell in path) and all(abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1 for a, b in steps)
+
+
+class TestHierarchicalPlanner(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def random_grid(self, rng, width, height, density=0.2):
+        obstacles = [(x, y) for x in range(width) for y in range(height) if rng.random() < density]
+        return Grid(width, height, obstacles)
+
+    def test_paths_are_valid(self):
+        rng = random.Random(5)
+        for _ in range(5):
+            grid = self.random_grid(rng, 40, 30)
+            planner = HierarchicalPlanner(grid, cluster_size=8, cache_dir=None)
+            free = [grid.position(cell) for cell in np.flatnonzero(grid.passable.ravel()).tolist()]
+            for _ in range(20):
+                start, goal = rng.choice(free), rng.choice(free)
+                distances = bfs_distance_field(grid, goal)
+                optimal = int(distances[start[1], start[0]])
+                path = planner.search(start, goal)
+                if optimal == np.iinfo(distances.dtype).max:
+                    self.assertIsNone(path)
+                    continue
+                self.assertEqual((path[0], path[-1]), (start, goal))
+                self.assertTrue(is_valid_path(grid, path))
+                self.assertGreaterEqual(len(path) - 1, optimal)
+                self.assertLessEqual(len(path) - 1, 2 * optimal)
+
+    def test_refinement_shortens_paths(self):
+        rng = random.Random(7)
+        grid = self.random_grid(rng, 48, 48, density=0.25)
+        refined = HierarchicalPlanner(grid, cluster_size=8, cache_dir=None, refine=True)
+        raw = HierarchicalPlanner(grid, cluster_size=8, cache_dir=None)
+        free = [grid.position(cell) for cell in np.flatnonzero(grid.passable.ravel()).tolist()]
+        shorter = 0
+        for _ in range(40):
+            start, goal = rng.choice(free), rng.choice(free)
+            path, raw_path = refined.search(start, goal), raw.search(start, goal)
+            if raw_path is None:
+                self.assertIsNone(path)
+                continue
+            self.assertTrue(is_valid_path(grid, path))
+            self.assertEqual((path[0], path[-1]), (start, goal))
+            self.assertLessEqual(len(path), len(raw_path))
+            shorter += len(path) < len(raw_path)
+        self.assertGreater(shorter, 0)
+
+    def test_bounded_paths(self):
+        rng = random.Random(7)
+        grid = self.random_grid(rng, 48, 48, density=0.25)
+        table = DistanceTable(grid, cache_dir=None)
+        exact = HierarchicalPlanner(grid, cluster_size=8, cache_dir=None, bounded=True)
+        weighted = HierarchicalPlanner(grid, cluster_size=8, weight=1.5, cache_dir=None, bounded=True)
+        free = [grid.position(cell) for cell in np.flatnonzero(grid.passable.ravel()).tolist()]
+        for _ in range(40):
+            start, goal = rng.choice(free), rng.choice(free)
+            optimal = table.distance(start, goal)
+            for planner, heuristic in ((exact, table), (exact, None), (weighted, table), (weighted, None)):
+                path = planner.search(start, goal, heuristic)
+                if optimal == float('inf'):
+                    self.assertIsNone(path)
+                    continue
+                self.assertEqual((path[0], path[-1]), (start, goal))
+                self.assertTrue(is_valid_path(grid, path))
+                self.assertLessEqual(len(path) - 1, planner.weight * optimal)
+
+    def test_open_map_is_optimal(self):
+        planner = HierarchicalPlanner(Grid(32, 32), cluster_size=8, cache_dir=None)
+        self.assertEqual(len(planner.search((1, 2), (30, 29))) - 1, 29 + 27)
+        self.assertEqual(len(planner.search((3, 3), (5, 6))) - 1, 5)
+
+    def test_same_cluster_detour_through_neighbor(self):
+        # The wall splits the top-left cluster, so the only way round leaves it.
+        grid = Grid(8, 8, [(1, y) for y in range(4)])
+        planner = HierarchicalPlanner(grid, cluster_size=4, cache_dir=None)
+        path = planner.search((0, 0), (2, 0))
+        self.assertTrue(is_valid_path(grid, path))
+        self.assertEqual(path[-1], (2, 0))
+        self.assertEqual(len(path) - 1, 10)
+
+    def test_unreachable(self):
+        grid = Grid(16, 16, [(8, y) for y in range(16)])
+        planner = HierarchicalPlanner(grid, cluster_size=4, cache_dir=None)
+        self.assertIsNone(planner.search((0, 0), (15, 15)))
+
+    def test_graph_is_cached_on_disk(self):
+        grid = self.random_grid(random.Random(1), 32, 32)
+        first = HierarchicalPlanner(grid, cluster_size=8, cache_dir=self.cache_dir)
+        files = [name for _, _, names in os.walk(self.cache_dir) for name in names]
+        self.assertEqual(files, ['hpa_8.npz'])
+        second = HierarchicalPlanner(grid, cluster_size=8, cache_dir=self.cache_dir)
+        self.assertEqual(first.num_nodes, second.num_nodes)
+        self.assertEqual(first.search((0, 0), (31, 31)), second.search((0, 0), (31, 31)))
+
+    def test_grid_edit_rebuilds(self):
+        grid = Grid(16, 4)
+        planner = HierarchicalPlanner(grid, cluster_size=4, cache_dir=None)
+        for y in range(4):
+            grid.set_obstacle((8, y))
+        self.assertIsNone(planner.search((0, 0), (15, 0)))
+
+    def test_weight_below_one_rejected(self):
+        with self.assertRaises(ValueError):
+            HierarchicalPlanner(Grid(4, 4), weight=0.5, cache_dir=None)
+
+    def test_weighted_search_expands_less(self):
+        grid = self.random_grid(random.Random(2), 96, 96, density=0.15)
+        exact = HierarchicalPlanner(grid, cluster_size=8, cache_dir=None)
+        weighted = HierarchicalPlanner(grid, cluster_size=8, weight=2.0, cache_dir=None)
+        start, goal = (0, 0), (95, 95)
+        grid.set_obstacle(start, False)
+        grid.set_obstacle(goal, False)
+        self.assertIsNotNone(exact.search(start, goal))
+        self.assertIsNotNone(weighted.search(start, goal))
+        self.assertLessEqual(weighted.expanded, exact.expanded)
+
+    def test_mla_star_hpa_mode(self):
+        environment = Environment((24, 24), [(12, y) for y in range(20)])
+        environment.search_mode = 'hpa'
+        environment.hierarchy = HierarchicalPlanner(environment.grid, cluster_size=6, cache_dir=None)
+        path = mla_star((0, 0), [Task(1, (5, 5), (20, 2))], environment)
+        self.assertTrue(is_valid_path(environment.grid, path))
+        self.assertEqual((path[0], path[-1]), ((0, 0), (20, 2)))
+        self.assertIn((5, 5), path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import json
+import unittest
+
+import instrumentation
+from instrumentation import STATS, Stats, profiled
+from mla_star import Environment, Task, mla_star
+
+
+class TestInstrumentation(unittest.TestCase):
+    def tearDown(self):
+        instrumentation.disable()
+        STATS.reset()
+
+    def test_disabled_stats_record_nothing(self):
+        stats = Stats()
+        stats.incr('nodes_expanded', 10)
+        with stats.timer('search'):
+            pass
+        self.assertEqual(stats.as_dict(), {'counters': {}, 'timers': {}})
+
+    def test_search_counters(self):
+        instrumentation.enable()
+        environment = Environment((5, 5))
+        mla_star((0, 0), [Task(1, (4, 0), (4, 4))], environment)
+        self.assertEqual(STATS.counters['searches'], 1)
+        self.assertEqual(STATS.counters['nodes_expanded'], environment.nodes_expanded)
+        self.assertGreater(STATS.counters['heap_pushes'], 0)
+        exported = json.loads(STATS.to_json())
+        self.assertEqual(exported['timers']['search']['calls'], 1)
+
+    def test_profiled(self):
+        with profiled() as report:
+            sum(range(1000))
+        self.assertGreaterEqual(report.peak_memory, 0)
+        self.assertIn('function calls', report.text)
@@ -0,0 +1,84 @@
+import random
+import unittest
+
+import numpy as np
+
+from grid import Grid
+from heuristics import DistanceTable, bfs_distance_field
+from map_loader import load_map
+from mla_star import Environment, Task, mla_star
+
+
+def is_valid_path(grid, path):
+    steps = zip(path, path[1:])
+    return all(grid.is_passable(cell) for cell in path) and all(abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1 for a, b in steps)
+
+
+class TestJumpPointSearch(unittest.TestCase):
+    def test_matches_bfs_distance_on_random_maps(self):
+        rng = random.Random(3)
+        for _ in range(20):
+            width, height = rng.randint(5, 25), rng.randint(5, 25)
+            obstacles = [(x, y) for x in range(width) for y in range(height) if rng.random() < 0.25]
+            environment = Environment((width, height), obstacles)
+            free = [(x, y) for x in range(width) for y in range(height) if environment.is_valid((x, y))]
+            for _ in range(10):
+                start, goal = rng.choice(free), rng.choice(free)
+                distances = bfs_distance_field(environment.grid, goal)
+                path = environment.jps.search(start, goal)
+                expected = int(distances[start[1], start[0]])
+                if expected == np.iinfo(distances.dtype).max:
+                    self.assertIsNone(path)
+                    continue
+                self.assertEqual((path[0], path[-1]), (start, goal))
+                self.assertTrue(is_valid_path(environment.grid, path))
+                self.assertEqual(len(path) - 1, expected)
+
+    def test_unreachable_goal(self):
+        grid = Grid(5, 5, [(2, y) for y in range(5)])
+        environment = Environment.from_grid(grid)
+        self.assertIsNone(environment.jps.search((0, 0), (4, 4)))
+
+    def test_grid_edits_are_seen(self):
+        environment = Environment((5, 1))
+        self.assertEqual(len(environment.jps.search((0, 0), (4, 0))), 5)
+        environment.grid.set_obstacle((2, 0))
+        self.assertIsNone(environment.jps.search((0, 0), (4, 0)))
+
+    def test_mla_star_mode_matches_astar(self):
+        rng = random.Random(7)
+        obstacles = [(x, y) for x in range(30) for y in range(30) if rng.random() < 0.2]
+        astar = Environment((30, 30), obstacles)
+        jps = Environment((30, 30), obstacles)
+        jps.search_mode = 'jps'
+        free = [(x, y) for x in range(30) for y in range(30) if astar.is_valid((x, y))]
+        for index in range(20):
+            start, pickup, delivery = rng.sample(free, 3)
+            task = Task(index, pickup, delivery)
+            expected = mla_star(start, [task], astar)
+            path = mla_star(start, [task], jps)
+            if expected is None:
+                self.assertIsNone(path)
+                continue
+            self.assertEqual(len(path), len(expected))
+            self.assertTrue(is_valid_path(jps.grid, path))
+            self.assertIn(pickup, path)
+            self.assertEqual(path[-1], delivery)
+
+    def test_far_fewer_expansions_on_open_map(self):
+        grid = load_map('maps/empty-32-32.map', use_cache=False)
+        astar, jps = Environment.from_grid(grid), Environment.from_grid(grid)
+        jps.search_mode = 'jps'
+        task = Task(1, (31, 31), (0, 31))
+        self.assertEqual(len(mla_star((0, 0), [task], jps)), len(mla_star((0, 0), [task], astar)))
+        self.assertLess(jps.nodes_expanded * 10, astar.nodes_expanded)
+
+    def test_with_distance_table(self):
+        environment = Environment((20, 20), [(10, y) for y in range(19)])
+        environment.heuristic = DistanceTable(environment.grid, cache_dir=None)
+        path = environment.jps.search((0, 0), (19, 0), environment.heuristic)
+        self.assertEqual(len(path) - 1, 19 + 2 * 19)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from grid import Grid
+from lifelong import LifelongSimulation, RollingStats, TaskRelease, TaskStream, iter_task_file
+
+
+def random_tasks(rng, width, height, every=2):
+    time = 0
+    while True:
+        pickup = (rng.randrange(width), rng.randrange(height))
+        delivery = (rng.randrange(width), rng.randrange(height))
+        yield TaskRelease(time, pickup, delivery)
+        time += every
+
+
+class TestLifelong(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_task_file_stream(self):
+        path = os.path.join(self.directory, 'tasks.txt')
+        with open(path, 'w') as file:
+            file.write("# release px py dx dy\n0 1 1 2 2\n0 3 3 0 0\n\n5 1 0 0 1\n")
+        self.assertEqual(next(iter_task_file(path)), TaskRelease(0, (1, 1), (2, 2)))
+        stream = TaskStream.from_file(path)
+        self.assertEqual(len(stream.due(0)), 2)
+        self.assertEqual(stream.due(4), [])
+        self.assertEqual(stream.due(5), [TaskRelease(5, (1, 0), (0, 1))])
+        self.assertTrue(stream.exhausted)
+
+    def test_unsorted_stream_rejected(self):
+        stream = TaskStream([TaskRelease(3, (0, 0), (1, 1)), TaskRelease(1, (0, 0), (1, 1))])
+        with self.assertRaises(ValueError):
+            stream.due(10)
+
+    def test_unsorted_stream_rejected_across_calls(self):
+        stream = TaskStream([TaskRelease(1, (0, 0), (1, 1)), TaskRelease(5, (0, 0), (1, 1)),
+                             TaskRelease(4, (0, 0), (1, 1))])
+        self.assertEqual(len(stream.due(1)), 1)
+        self.assertEqual(len(stream.due(4)), 0)
+        with self.assertRaises(ValueError):
+            stream.due(5)
+
+    def test_rolling_stats_window(self):
+        stats = RollingStats(window=2)
+        stats.record_step([4])
+        stats.record_step([])
+        stats.record_step([2, 6])
+        self.assertEqual(stats.delivered, 3)
+        self.assertEqual(stats.throughput, 1.0)
+        self.assertEqual(stats.mean_service_time, 4.0)
+        self.assertEqual(stats.as_dict()['overall_mean_service_time'], 4.0)
+
+    def test_finite_stream_runs_to_completion(self):
+        tasks = [TaskRelease(0, (2, 2), (4, 4)), TaskRelease(10, (0, 4), (4, 0))]
+        simulation = LifelongSimulation(Grid(5, 5), [(0, 0)], tasks)
+        stats = simulation.run()
+        self.assertTrue(simulation.finished)
+        self.assertEqual(stats.delivered, 2)
+        self.assertEqual(simulation.engine.num_tasks, 1)  # The second task reused the first slot
+
+    def test_memory_stays_bounded(self):
+        # One agent, so the greedy mover cannot deadlock and the release rate stays below throughput.
+        simulation = LifelongSimulation(Grid(16, 16), [(0, 0)], random_tasks(random.Random(0), 16, 16, every=16), window=100)
+        simulation.run(5000)
+        self.assertGreater(simulation.stats.delivered, 250)
+        self.assertLessEqual(simulation.engine.num_tasks, 4)
+        self.assertLessEqual(len(simulation.stats._deliveries), 100)
+        self.assertLessEqual(len(simulation.pending), 1)
+
+if __name__ == '__main__':
+    unittest.main()
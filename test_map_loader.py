@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from grid import OBSTACLE
+from map_loader import iter_scenario, iter_scenario_files, load_map, load_scenario, parse_map
+
+MAP_TEXT = "type octile\nheight 3\nwidth 4\nmap\n..@.\r\n.T..\r\n....\r\n"
+SCEN_TEXT = "version 1\n0\tsmall.map\t4\t3\t0\t0\t3\t2\t5.00000000\n1\tsmall.map\t4\t3\t3\t0\t0\t2\t5.00000000\n"
+
+
+class TestMapLoader(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.map_path = os.path.join(self.directory, 'small.map')
+        self.scen_path = os.path.join(self.directory, 'small-even-1.scen')
+        with open(self.map_path, 'w') as file:
+            file.write(MAP_TEXT)
+        with open(self.scen_path, 'w') as file:
+            file.write(SCEN_TEXT)
+        with open(os.path.join(self.directory, '._small-even-1.scen'), 'wb') as file:
+            file.write(b'\x00\x05\x16\x07')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_parse_map(self):
+        header, cells = parse_map(self.map_path)
+        self.assertEqual(header['type'], 'octile')
+        self.assertEqual(cells.shape, (3, 4))
+        self.assertEqual(cells[0, 2], OBSTACLE)
+        self.assertEqual(cells[1, 1], OBSTACLE)
+        self.assertEqual(int(cells.sum()), 2)
+
+    def test_load_map_writes_and_uses_cache(self):
+        grid = load_map(self.map_path)
+        self.assertTrue(os.path.exists(self.map_path + '.npz'))
+        cached = load_map(self.map_path)
+        np.testing.assert_array_equal(grid.cells, cached.cells)
+        self.assertFalse(cached.is_passable((2, 0)))
+
+    def test_iter_scenario(self):
+        entries = list(iter_scenario(self.scen_path))
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0].start, (0, 0))
+        self.assertEqual(entries[1].goal, (0, 2))
+        self.assertEqual(entries[1].optimal_length, 5.0)
+
+    def test_load_scenario(self):
+        entries = load_scenario(self.scen_path)
+        self.assertEqual(list(entries['start_x']), [0, 3])
+        self.assertEqual(list(load_scenario(self.scen_path)['goal_y']), [2, 2])
+
+    def test_iter_scenario_files_skips_resource_forks(self):
+        self.assertEqual(list(iter_scenario_files(self.directory)), [self.scen_path])
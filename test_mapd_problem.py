@@ -99,9 +99,70 @@ class TestSimulation(unittest.TestCase):
 
         game_map.time_step()
 
+    def test_free_cell_index_follows_agents_and_tasks(self):
+        game_map = Map(width=3, height=1, obstacles=[], agents=[])
+        agent = Agent(name="A", location=(0, 0))
+        game_map.agents.append(agent)
+        self.assertEqual(len(game_map.free_cells), 2)
+        agent.move_to((2, 0), game_map)
+        self.assertTrue(game_map.is_position_free(0, 0))
+        self.assertFalse(game_map.is_position_free(1, 0))
+        game_map.add_task(Task(name="Task 1", pickup_location=(0, 0), delivery_location=(2, 0)))
+        self.assertEqual(len(game_map.free_cells), 0)
+        self.assertIsNone(game_map.find_random_free_position())
 
+    def test_set_obstacle(self):
+        game_map = Map(width=3, height=3, obstacles=[(1, 1)], agents=[])
+        game_map.set_obstacle(1, 1, blocked=False)
+        self.assertTrue(game_map.is_position_free(1, 1))
+        game_map.set_obstacle(0, 0)
+        self.assertFalse(game_map.is_position_free(0, 0))
+        self.assertEqual(game_map.grid.neighbors((1, 0)), [(1, 1), (2, 0)])
 
+    def test_retire_task_clears_markers_and_prunes(self):
+        game_map = Map(width=4, height=1, obstacles=[], agents=[])
+        first = Task(name="Task 1", pickup_location=(0, 0), delivery_location=(2, 0))
+        second = Task(name="Task 2", pickup_location=(2, 0), delivery_location=(3, 0))
+        for task in (first, second):
+            game_map.tasks.append(task)
+            game_map.add_task(task)
+        game_map.retire_task(first)
+        self.assertEqual(game_map.tasks, [second])
+        self.assertTrue(game_map.is_position_free(0, 0))
+        self.assertEqual(game_map.grid.cells[0, 2], 2)  # Still the pickup of the second task
+        game_map.retire_task(second)
+        self.assertEqual(len(game_map.free_cells), 4)
 
+    def test_retire_task_keeps_latest_marker(self):
+        game_map = Map(width=3, height=1, obstacles=[], agents=[])
+        first = Task(name="Task 1", pickup_location=(0, 0), delivery_location=(1, 0))
+        second = Task(name="Task 2", pickup_location=(1, 0), delivery_location=(2, 0))
+        game_map.add_task(first)
+        game_map.add_task(second)  # Its pickup marker replaces the first task's delivery marker
+        game_map.retire_task(first)
+        self.assertEqual(game_map.grid.cells[0, 1], 2)
+        game_map.retire_task(second)
+        self.assertEqual(len(game_map.free_cells), 3)
 
+    def test_retire_unregistered_task_keeps_other_markers(self):
+        game_map = Map(width=3, height=1, obstacles=[], agents=[])
+        registered = Task(name="Task 1", pickup_location=(0, 0), delivery_location=(2, 0))
+        game_map.add_task(registered)
+        game_map.retire_task(Task(name="Task 2", pickup_location=(0, 0), delivery_location=(2, 0)))
+        self.assertEqual(game_map.grid.cells[0].tolist(), [2, 0, 3])
+        game_map.retire_task(registered)
+        self.assertEqual(game_map.grid.cells[0].tolist(), [0, 0, 0])
 
+    def test_delivered_tasks_are_kept_unless_lifelong(self):
+        for retire_delivered in (False, True):
+            agent = Agent(name="A", location=(0, 0))
+            game_map = Map(width=3, height=1, obstacles=[], agents=[agent], retire_delivered=retire_delivered)
+            game_map.rng.random = lambda: 1.0  # No random tasks
+            task = Task(name="Task 1", pickup_location=(1, 0), delivery_location=(2, 0))
+            game_map.tasks.append(task)
+            agent.assign_task(task)
+            for _ in range(3):
+                game_map.time_step()
+            self.assertTrue(task.delivered)
+            self.assertEqual(game_map.tasks, [] if retire_delivered else [task])
 
@@ -0,0 +1,154 @@
+import unittest
+
+from mla_star import Agent, Environment, Task, commit_path, hbh_assignment, mla_star, space_time_mla_star
+from reservation_table import ReservationTable
+
+
+class TestMLAStar(unittest.TestCase):
+    def setUp(self):
+        self.environment = Environment((5, 5), obstacles=[(1, 2), (2, 2), (3, 2)])
+
+    def test_mla_star_visits_pickup_then_delivery(self):
+        path = mla_star((0, 0), [Task(1, (4, 0), (4, 4))], self.environment)
+        self.assertEqual(path[0], (0, 0))
+        self.assertIn((4, 0), path)
+        self.assertEqual(path[-1], (4, 4))
+        self.assertEqual(len(path) - 1, 8)
+
+    def test_hbh_assignment_stops_on_unreachable_task(self):
+        agents = [Agent(1, (0, 0))]
+        tasks = [Task(1, (0, 4), (2, 2))]  # Delivery is an obstacle
+        hbh_assignment(agents, tasks, self.environment)
+        self.assertEqual(agents[0].path, [])
+        self.assertEqual(len(tasks), 1)
+
+
+class TestSpaceTimeMLAStar(unittest.TestCase):
+    def setUp(self):
+        self.environment = Environment((5, 1))
+        self.grid = self.environment.grid
+
+    def test_matches_spatial_search_without_reservations(self):
+        path = space_time_mla_star((0, 0), [Task(1, (2, 0), (4, 0))], self.environment)
+        self.assertEqual(path, [(0, 0), (1, 0), (2, 0), (3, 0), (4, 0)])
+
+    def test_waits_for_reserved_vertex(self):
+        reservations = ReservationTable()
+        # Another agent passes through (2, 0) at t=2 and leaves the corridor.
+        reservations.commit('other', [self.grid.index((2, 0))], start_time=2, park=False)
+        path = space_time_mla_star((0, 0), [Task(1, (4, 0), (4, 0))], self.environment, reservations)
+        self.assertEqual(len(path), 6)
+        self.assertNotEqual(path[2], (2, 0))
+        self.assertEqual(path[-1], (4, 0))
+
+    def test_swap_conflict_is_rejected(self):
+        reservations = ReservationTable()
+        commit_path(reservations, 'other', [(1, 0), (0, 0)], self.environment)
+        self.assertFalse(reservations.can_move(self.grid.index((0, 0)), self.grid.index((1, 0)), 1))
+        self.assertTrue(reservations.can_move(self.grid.index((2, 0)), self.grid.index((3, 0)), 1))
+
+    def test_parked_agent_blocks_corridor(self):
+        reservations = ReservationTable()
+        commit_path(reservations, 'other', [(2, 0)], self.environment)
+        self.assertIsNone(space_time_mla_star((0, 0), [Task(1, (4, 0), (4, 0))], self.environment, reservations, tmax=20))
+
+    def test_should_stop_aborts_search(self):
+        environment = Environment((40, 40), obstacles=[(20, y) for y in range(39)])
+        task = Task(1, (39, 0), (39, 0))
+        calls = []
+        self.assertIsNone(space_time_mla_star((0, 0), [task], environment, should_stop=lambda: not calls.append(1)))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(space_time_mla_star((0, 0), [task], environment, should_stop=lambda: False)[-1], (39, 0))
+
+    def test_unparkable_goal_is_bounded(self):
+        environment = Environment((30, 30))
+        reservations = ReservationTable()
+        commit_path(reservations, 'other', [(29, 29)], environment)  # Parked on the goal forever
+        self.assertIsNone(space_time_mla_star((0, 0), [Task(1, (29, 29), (29, 29))], environment, reservations))
+        # Time is bounded by the route length plus slack, not by the number of cells.
+        self.assertLess(environment.nodes_expanded, 900 * (58 + 64))
+
+    def test_can_park_after_latest_reservation_is_released(self):
+        reservations = ReservationTable()
+        reservations.commit('early', [3, 2], 0, park=False)
+        reservations.commit('late', [1, 1, 2, 2], 0, park=False)
+        self.assertFalse(reservations.can_park(2, 3))
+        self.assertTrue(reservations.can_park(2, 4))
+        reservations.release('late')
+        self.assertTrue(reservations.can_park(2, 2))
+        self.assertFalse(reservations.can_park(2, 1))
+        reservations.release('early')
+        self.assertTrue(reservations.can_park(2, 0))
+
+    def test_release(self):
+        reservations = ReservationTable()
+        commit_path(reservations, 'other', [(2, 0), (3, 0)], self.environment)
+        reservations.release('other')
+        self.assertTrue(reservations.path_is_free([self.grid.index((2, 0)), self.grid.index((3, 0))]))
+        self.assertEqual(len(reservations), 0)
+
+    def test_hbh_assignment_commits_conflict_free_paths(self):
+        environment = Environment((5, 5))
+        reservations = ReservationTable()
+        agents = [Agent(1, (0, 2)), Agent(2, (4, 2))]
+        tasks = [Task(1, (2, 2), (4, 2)), Task(2, (2, 2), (0, 2))]
+        hbh_assignment(agents, tasks, environment, reservations)
+        first, second = agents[0].path, agents[1].path
+        self.assertTrue(first and second)
+        for t in range(min(len(first), len(second))):
+            self.assertNotEqual(first[t], second[t])
+
+
+class TestSearchWorkspace(unittest.TestCase):
+    def test_back_to_back_searches_reuse_workspace(self):
+        environment = Environment((6, 6), obstacles=[(2, 0), (2, 1), (2, 2), (2, 3)])
+        workspace = environment.workspace
+        first = mla_star((0, 0), [Task(1, (5, 0), (0, 5))], environment)
+        second = mla_star((5, 5), [Task(2, (0, 0), (5, 5))], environment)
+        self.assertIs(environment.workspace, workspace)
+        self.assertEqual(len(first) - 1, 13 + 10)
+        self.assertEqual(len(second) - 1, 10 + 10)
+        self.assertEqual(workspace.generation, 2)
+
+    def test_start_on_pickup(self):
+        environment = Environment((3, 3))
+        self.assertEqual(mla_star((0, 0), [Task(1, (0, 0), (0, 2))], environment), [(0, 0), (0, 1), (0, 2)])
+
+    def test_revisits_cells_with_a_new_label(self):
+        # The delivery lies back along the way to the pickup, which a position-only closed set cannot find.
+        environment = Environment((4, 1))
+        path = mla_star((1, 0), [Task(1, (3, 0), (0, 0))], environment)
+        self.assertEqual(path, [(1, 0), (2, 0), (3, 0), (2, 0), (1, 0), (0, 0)])
+
+    def test_exact_heuristic_matches_manhattan(self):
+        from heuristics import DistanceTable
+        environment = Environment((6, 6), obstacles=[(2, 0), (2, 1), (2, 2), (2, 3)])
+        plain = mla_star((0, 0), [Task(1, (5, 0), (0, 5))], environment)
+        environment.heuristic = DistanceTable.from_environment(environment, cache_dir=None)
+        exact = mla_star((0, 0), [Task(1, (5, 0), (0, 5))], environment)
+        self.assertEqual(len(plain), len(exact))
+        self.assertLessEqual(environment.workspace.expanded, 30)
+
+    def test_expansion_budget_returns_partial_path(self):
+        from path_cache import PathCache
+        environment = Environment((20, 20), obstacles=[(10, y) for y in range(19)])
+        environment.path_cache = PathCache()
+        task = Task(1, (19, 0), (19, 19))
+        partial = mla_star((0, 0), [task], environment, max_expansions=50)
+        self.assertFalse(environment.last_search_complete)
+        self.assertEqual(environment.workspace.expanded, 50)
+        self.assertEqual(environment.nodes_expanded, 50)
+        self.assertEqual(partial[0], (0, 0))
+        self.assertLess(len(partial), 20)
+        self.assertEqual(len(environment.path_cache), 0)  # Partial paths are never cached
+        full = mla_star((0, 0), [task], environment)
+        self.assertTrue(environment.last_search_complete)
+        self.assertEqual(full[-1], (19, 19))
+
+    def test_expired_deadline_counts_as_infeasible(self):
+        environment = Environment((200, 200))
+        agents = [Agent(1, (0, 0))]
+        tasks = [Task(1, (199, 199), (0, 199))]
+        hbh_assignment(agents, tasks, environment, time_budget=-1.0)
+        self.assertEqual(agents[0].path, [])
+        self.assertEqual(len(tasks), 1)
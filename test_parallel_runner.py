@@ -0,0 +1,86 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import parallel_runner
+from map_loader import parse_map
+from parallel_runner import build_jobs, load_completed, publish_grids, run_parallel
+
+MAP_TEXT = "type octile\nheight 3\nwidth 4\nmap\n..@.\n.T..\n....\n"
+SCEN_TEXT = "version 1\n0\tsmall.map\t4\t3\t0\t0\t3\t2\t5.00000000\n1\tsmall.map\t4\t3\t3\t0\t0\t2\t5.00000000\n"
+
+
+class TestParallelRunner(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.map_path = os.path.join(self.directory, 'small.map')
+        with open(self.map_path, 'w') as file:
+            file.write(MAP_TEXT)
+        self.scenarios = []
+        for index in (1, 2):
+            path = os.path.join(self.directory, f'small-even-{index}.scen')
+            with open(path, 'w') as file:
+                file.write(SCEN_TEXT)
+            self.scenarios.append(path)
+        self.results = os.path.join(self.directory, 'results.jsonl')
+        self.cache_dir = os.path.join(self.directory, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def benchmarks(self, scenario_files):
+        return [{'name': 'small', 'map_file': self.map_path, 'scenario_files': scenario_files}]
+
+    def test_jobs_cover_every_scenario_and_agent_count(self):
+        fork = os.path.join(self.directory, '._small-even-1.scen')
+        jobs = build_jobs(self.benchmarks(self.scenarios + [fork]), [1, 2])
+        self.assertEqual([(job['scenario_file'], job['num_agents']) for job in jobs],
+                         [(path, count) for path in self.scenarios for count in (1, 2)])
+
+    def test_grid_is_published_once_and_shared(self):
+        segments, descriptors = publish_grids([self.map_path])
+        try:
+            parallel_runner._init_worker(descriptors, self.cache_dir)
+            environment = parallel_runner._environment_for(self.map_path)
+            self.assertIs(parallel_runner._environment_for(self.map_path), environment)
+            np.testing.assert_array_equal(environment.grid.cells, parse_map(self.map_path)[1])
+            # The worker's grid is a view of the segment, not a copy.
+            np.ndarray(environment.grid.cells.shape, dtype=np.uint8, buffer=segments[0].buf)[0, 0] = 1
+            self.assertEqual(environment.grid.cells[0, 0], 1)
+        finally:
+            parallel_runner._environments.clear()
+            parallel_runner._published.clear()
+            for segment in parallel_runner._segments:
+                segment.close()
+            parallel_runner._segments.clear()
+            for segment in segments:
+                segment.close()
+                segment.unlink()
+
+    def test_resume_skips_completed_jobs(self):
+        benchmarks = self.benchmarks(self.scenarios)
+        self.assertEqual(run_parallel(benchmarks, [1, 2], self.results, workers=1, cache_dir=self.cache_dir), 4)
+        with open(self.results) as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual(len(records), 4)
+        self.assertTrue(all(record['solved'] for record in records if record['num_agents'] == 1))
+        self.assertEqual(run_parallel(benchmarks, [1, 2], self.results, workers=1, cache_dir=self.cache_dir), 0)
+
+    def test_failing_job_is_recorded_and_retried(self):
+        missing = os.path.join(self.directory, 'missing.scen')
+        benchmarks = self.benchmarks([missing] + self.scenarios)
+        self.assertEqual(run_parallel(benchmarks, [1], self.results, workers=1, cache_dir=self.cache_dir), 3)
+        with open(self.results) as file:
+            records = {record['scenario_file']: record for record in map(json.loads, file)}
+        self.assertIn('FileNotFoundError', records[missing]['error'])
+        self.assertTrue(records[self.scenarios[1]]['solved'])
+        self.assertEqual(len(load_completed(self.results)), 2)
+        self.assertEqual(run_parallel(benchmarks, [1], self.results, workers=1, cache_dir=self.cache_dir), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+
+from mla_star import Environment, Task, mla_star, space_time_mla_star
+from path_cache import PathCache
+from reservation_table import ReservationTable
+
+
+class TestPathCache(unittest.TestCase):
+    def setUp(self):
+        self.environment = Environment((5, 5))
+        self.environment.path_cache = PathCache(capacity=2)
+        self.task = Task(1, (4, 0), (4, 4))
+
+    def test_repeated_query_hits_cache(self):
+        first = mla_star((0, 0), [self.task], self.environment)
+        expanded = self.environment.nodes_expanded
+        second = mla_star((0, 0), [self.task], self.environment)
+        self.assertEqual(first, second)
+        self.assertEqual(self.environment.nodes_expanded, expanded)
+        self.assertEqual((self.environment.path_cache.hits, self.environment.path_cache.misses), (1, 1))
+
+    def test_obstacle_change_invalidates(self):
+        mla_star((0, 0), [self.task], self.environment)
+        self.environment.grid.set_obstacle((2, 2))
+        mla_star((0, 0), [self.task], self.environment)
+        self.assertEqual(self.environment.path_cache.misses, 2)
+        self.assertEqual(self.environment.path_cache.invalidations, 1)
+
+    def test_search_mode_is_part_of_the_key(self):
+        from hierarchical import HierarchicalPlanner
+        environment = Environment((24, 24), [(12, y) for y in range(20)])
+        environment.path_cache = PathCache()
+        environment.search_mode = 'hpa'
+        environment.hierarchy = HierarchicalPlanner(environment.grid, cluster_size=6, cache_dir=None)
+        task = Task(1, (0, 23), (23, 0))
+        mla_star((0, 0), [task], environment)
+        environment.search_mode = 'astar'
+        optimal = mla_star((0, 0), [task], environment)
+        self.assertEqual(environment.path_cache.misses, 2)
+        self.assertEqual(len(environment.path_cache), 2)
+        self.assertEqual(len(optimal) - 1, 23 + 46)
+
+    def test_lru_eviction(self):
+        cache = PathCache(capacity=2)
+        grid = self.environment.grid
+        cache.store((0, 0), [(1, 0)], grid, [(0, 0), (1, 0)])
+        cache.store((0, 0), [(2, 0)], grid, None)
+        cache.lookup((0, 0), [(1, 0)], grid)
+        cache.store((0, 0), [(3, 0)], grid, [(0, 0), (1, 0), (2, 0), (3, 0)])
+        self.assertEqual(cache.lookup((0, 0), [(2, 0)], grid), (False, None))
+        self.assertEqual(cache.lookup((0, 0), [(1, 0)], grid), (True, [(0, 0), (1, 0)]))
+
+    def test_cell_budget(self):
+        cache = PathCache(max_cells=3)
+        grid = self.environment.grid
+        cache.store((0, 0), [(1, 0)], grid, [(0, 0), (1, 0)])
+        cache.store((0, 0), [(2, 0)], grid, [(0, 0), (1, 0), (2, 0)])
+        self.assertEqual(len(cache), 1)
+
+    def test_cached_path_seeds_space_time_search(self):
+        spatial = mla_star((0, 0), [self.task], self.environment)
+        expanded = self.environment.nodes_expanded
+        path = space_time_mla_star((0, 0), [self.task], self.environment, ReservationTable())
+        self.assertEqual(path, spatial)
+        self.assertEqual(self.environment.nodes_expanded, expanded)
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+from mla_star import Environment
+from planning_service import LatencyTracker, PlanningService, _init_worker
+
+
+async def _request(reader, writer, message):
+    writer.write(json.dumps(message).encode() + b'\n')
+    await writer.drain()
+    return json.loads(await asyncio.wait_for(reader.readline(), 30))
+
+
+class TestLatencyTracker(unittest.TestCase):
+    def test_percentiles(self):
+        tracker = LatencyTracker(window=100)
+        for value in range(1, 101):
+            tracker.record(value / 1000)
+        stats = tracker.percentiles()
+        self.assertEqual(stats['count'], 100)
+        self.assertAlmostEqual(stats['p50'], 0.0505)
+        self.assertLess(stats['p90'], stats['p99'])
+
+    def test_empty(self):
+        self.assertEqual(LatencyTracker().percentiles(), {'count': 0})
+
+
+class TestPlanningService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.service = PlanningService(Environment((10, 10), obstacles=[(1, 2), (2, 2), (3, 2)]), tick=0.01, workers=1)
+
+    async def asyncTearDown(self):
+        await self.service.close()
+
+    async def test_task_is_planned_over_tcp(self):
+        await self.service.start()
+        reader, writer = await asyncio.open_connection(*self.service.address)
+        writer.write(b'{"type": "agent", "id": 1, "location": [0, 0]}\n')
+        reply = await _request(reader, writer, {'type': 'task', 'id': 7, 'pickup': [2, 3], 'delivery': [5, 5]})
+        self.assertEqual(reply['type'], 'path')
+        self.assertEqual((reply['task'], reply['agent']), (7, 1))
+        self.assertEqual(reply['path'][0], [0, 0])
+        self.assertIn([2, 3], reply['path'])
+        self.assertEqual(reply['path'][-1], [5, 5])
+
+        stats = await _request(reader, writer, {'type': 'stats'})
+        self.assertEqual(stats['latency']['count'], 1)
+        self.assertIn('p99', stats['latency'])
+        self.assertEqual(stats['idle_agents'], 0)  # Busy until it reports in again
+        writer.close()
+        await writer.wait_closed()
+
+    async def test_tasks_wait_for_an_idle_agent(self):
+        await self.service.start()
+        reader, writer = await asyncio.open_connection(*self.service.address)
+        writer.write(b'{"type": "agent", "id": 1, "location": [0, 0]}\n')
+        first = await _request(reader, writer, {'type': 'task', 'id': 1, 'pickup': [0, 5], 'delivery': [5, 5]})
+        writer.write(b'{"type": "task", "id": 2, "pickup": [9, 9], "delivery": [9, 0]}\n')
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.service.stats()['pending'], 1)
+        second = await _request(reader, writer, {'type': 'agent', 'id': 1, 'location': first['path'][-1]})
+        self.assertEqual((second['task'], second['path'][0]), (2, [5, 5]))
+        writer.close()
+        await writer.wait_closed()
+
+    async def test_invalid_messages(self):
+        await self.service.start()
+        reader, writer = await asyncio.open_connection(*self.service.address)
+        self.assertEqual((await _request(reader, writer, {'type': 'nope'}))['type'], 'error')
+        reply = await _request(reader, writer, {'type': 'task', 'id': 1, 'pickup': [1, 2], 'delivery': [5, 5]})
+        self.assertEqual(reply['type'], 'error')  # Pickup on an obstacle
+        writer.write(b'not json\n')
+        self.assertEqual(json.loads(await reader.readline())['type'], 'error')
+        writer.close()
+        await writer.wait_closed()
+
+    async def test_unreachable_task_does_not_block_the_queue(self):
+        await self.service.close()
+        # (9, 9) is walled off; task 5's pickup is nearer the agent, so it is assigned first.
+        self.service = PlanningService(Environment((10, 10), obstacles=[(8, 9), (9, 8)]), tick=0.01, workers=1)
+        await self.service.start()
+        reader, writer = await asyncio.open_connection(*self.service.address)
+        writer.write(b'{"type": "task", "id": 5, "pickup": [1, 0], "delivery": [9, 9]}\n')
+        writer.write(b'{"type": "task", "id": 6, "pickup": [5, 5], "delivery": [5, 0]}\n')
+        writer.write(b'{"type": "agent", "id": 1, "location": [0, 0]}\n')
+        error = json.loads(await asyncio.wait_for(reader.readline(), 30))
+        self.assertEqual((error['type'], error['task']), ('error', 5))
+        reply = json.loads(await asyncio.wait_for(reader.readline(), 30))
+        self.assertEqual((reply['type'], reply['task']), ('path', 6))
+        self.assertEqual(self.service.stats()['pending'], 0)
+        writer.close()
+        await writer.wait_closed()
+
+    async def test_timed_out_agent_is_not_retried(self):
+        await self.service.start()
+        reader, writer = await asyncio.open_connection(*self.service.address)
+        writer.write(b'{"type": "agent", "id": 1, "location": [0, 0]}\n')
+        writer.write(b'{"type": "agent", "id": 2, "location": [9, 9]}\n')
+        self.assertEqual((await _request(reader, writer, {'type': 'stats'}))['agents'], 2)
+        self.service._failed[7] = {1}  # As if its search from (0, 0) had already run out of time
+        reply = await _request(reader, writer, {'type': 'task', 'id': 7, 'pickup': [0, 1], 'delivery': [5, 5]})
+        self.assertEqual((reply['type'], reply['task'], reply['agent']), ('path', 7, 2))
+        self.assertNotIn(7, self.service._failed)
+        writer.close()
+        await writer.wait_closed()
+
+    async def test_failed_batch_is_requeued(self):
+        await self.service.start()
+        reader, writer = await asyncio.open_connection(*self.service.address)
+        self.service._executor.shutdown()
+        # Runs in this process, so the patch applies
+        self.service._executor = ThreadPoolExecutor(1, initializer=_init_worker,
+                                                    initargs=self.service._pool_args['initargs'])
+        with mock.patch('planning_service._assign_batch', side_effect=RuntimeError("worker failed")):
+            writer.write(b'{"type": "agent", "id": 1, "location": [0, 0]}\n')
+            reply = await _request(reader, writer, {'type': 'task', 'id': 7, 'pickup': [2, 3], 'delivery': [5, 5]})
+            self.assertEqual((reply['type'], reply['task']), ('error', 7))
+            await asyncio.sleep(0)
+            self.assertEqual(self.service.stats()['pending'], 1)
+            self.assertEqual(self.service.agents[1], (0, 0))
+        # Retried on a later tick once planning works again
+        while True:
+            reply = json.loads(await asyncio.wait_for(reader.readline(), 30))
+            if reply['type'] == 'path':
+                break
+        self.assertEqual(reply['task'], 7)
+        writer.close()
+        await writer.wait_closed()
+
+    async def test_broken_pool_is_replaced(self):
+        await self.service.start()
+        reader, writer = await asyncio.open_connection(*self.service.address)
+        broken = self.service._executor
+        with mock.patch.object(broken, 'submit', side_effect=BrokenProcessPool("worker died")):
+            writer.write(b'{"type": "agent", "id": 1, "location": [0, 0]}\n')
+            reply = await _request(reader, writer, {'type': 'task', 'id': 7, 'pickup': [2, 3], 'delivery': [5, 5]})
+        self.assertEqual(reply['type'], 'error')
+        self.assertIsNot(self.service._executor, broken)
+        while reply['type'] != 'path':
+            reply = json.loads(await asyncio.wait_for(reader.readline(), 30))
+        writer.close()
+        await writer.wait_closed()
+
+    async def test_unix_socket(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'planner.sock')
+            await self.service.start(path=path)
+            reader, writer = await asyncio.open_unix_connection(path)
+            self.assertEqual((await _request(reader, writer, {'type': 'stats'}))['pending'], 0)
+            writer.close()
+            await writer.wait_closed()
+
+
+class TestImportSideEffects(unittest.TestCase):
+    def test_importing_mla_star_runs_no_demo(self):
+        result = subprocess.run([sys.executable, '-c', 'import logging, mla_star; print(logging.getLogger().handlers)'],
+                                capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(result.stdout.strip(), '[]')
+        self.assertEqual(result.stderr, '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from mapd_problem import Agent, Map
+from rendering import PALETTE, FrameBuffer, Renderer, load_frames
+
+
+def make_map():
+    agents = [Agent(name=f"Agent {index}", location=(index, 0)) for index in range(3)]
+    return Map(10, 10, obstacles=[(1, 2), (2, 2), (3, 2), (4, 5), (5, 5)], agents=agents, seed=3)
+
+
+class TestRendering(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_buffer_matches_display(self):
+        game_map = make_map()
+        buffer = FrameBuffer(game_map.height, game_map.width)
+        for step in range(60):
+            cells, _ = buffer.update(game_map)
+            np.testing.assert_array_equal(buffer.rgb, PALETTE[game_map.display()])
+            if step:
+                self.assertLess(len(cells), 20)  # Only the changed cells are redrawn
+            game_map.time_step()
+        game_map.set_obstacle(9, 9)
+        cells, _ = buffer.update(game_map)
+        self.assertIn(99, cells.tolist())
+
+    def test_inline_npz_export_with_decimation(self):
+        game_map = make_map()
+        with Renderer.for_map(game_map, self.directory, fmt='npz', every=3, chunk_size=4, background=False) as renderer:
+            expected = []
+            for step in range(10):
+                renderer.capture(game_map)
+                if step % 3 == 0:
+                    expected.append(PALETTE[game_map.display()])
+                game_map.time_step()
+        frames, steps = load_frames(self.directory)
+        self.assertEqual(steps.tolist(), [0, 3, 6, 9])
+        np.testing.assert_array_equal(frames, np.stack(expected))
+
+    def test_background_png_export(self):
+        game_map = make_map()
+        with Renderer.for_map(game_map, self.directory, fmt='png', scale=2) as renderer:
+            for _ in range(5):
+                renderer.capture(game_map)
+                game_map.time_step()
+        self.assertEqual(sorted(os.listdir(self.directory)), [f"frame_{step:08d}.png" for step in range(5)])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            Renderer(self.directory, 4, 4, fmt='gif', background=False)
+        with self.assertRaises(ValueError):
+            Renderer(self.directory, 4, 4, fmt='gif')
+
+    def test_dead_writer_raises(self):
+        game_map = make_map()
+        path = os.path.join(self.directory, 'not_a_directory')
+        open(path, 'w').close()  # The worker cannot create its output directory and exits
+        renderer = Renderer.for_map(game_map, path, queue_size=1)
+        with self.assertRaises(RuntimeError):
+            for _ in range(100):
+                renderer.capture(game_map)
+                game_map.time_step()
+        renderer.close()  # Already stopped; nothing left to wait for
+
+    def test_close_reports_dead_writer(self):
+        path = os.path.join(self.directory, 'not_a_directory')
+        open(path, 'w').close()
+        renderer = Renderer(path, 4, 4)
+        renderer._process.join()
+        with self.assertRaises(RuntimeError):
+            renderer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+
+from grid import Grid
+from mla_star import Environment
+from reservation_table import ReservationTable
+from rolling_horizon import RollingHorizonPlanner, windowed_search
+
+
+class TestWindowedSearch(unittest.TestCase):
+    def test_path_spans_window(self):
+        environment = Environment((10, 1))
+        path = windowed_search(environment, ReservationTable(), (0, 0), [(9, 0)], 0, window=4)
+        self.assertEqual(path, [0, 1, 2, 3, 4])
+
+    def test_final_target_stops_early(self):
+        environment = Environment((10, 1))
+        path = windowed_search(environment, ReservationTable(), (0, 0), [(2, 0)], 0, window=6, final=True)
+        self.assertEqual(path, [0, 1, 2])
+
+    def test_visits_targets_in_order(self):
+        environment = Environment((4, 2))
+        path = windowed_search(environment, ReservationTable(), (0, 0), [(3, 0), (3, 1)], 0, window=8, final=True)
+        self.assertEqual(path, [0, 1, 2, 3, 7])
+
+    def test_expansion_budget_is_exact(self):
+        environment = Environment((10, 10))
+        path = windowed_search(environment, ReservationTable(), (0, 0), [(9, 9)], 0, window=8, max_expansions=5)
+        self.assertEqual(environment.nodes_expanded, 5)
+        self.assertEqual(path[0], 0)
+
+    def test_waits_for_reservation(self):
+        environment = Environment((3, 1))
+        reservations = ReservationTable()
+        reservations.commit('other', [1, 1, 2], 0, park=False)
+        path = windowed_search(environment, reservations, (0, 0), [(2, 0)], 0, window=5, final=True)
+        self.assertEqual(path, [0, 0, 1, 2])  # Follows the other agent once it moves on
+
+
+class TestRollingHorizonPlanner(unittest.TestCase):
+    def assert_conflict_free(self, before, after):
+        self.assertEqual(len(set(after.values())), len(after))
+        for a in before:
+            for b in before:
+                if a != b:
+                    self.assertFalse(after[a] == before[b] and after[b] == before[a], "swap conflict")
+
+    def test_crossing_agents_reach_goals(self):
+        environment = Environment.from_grid(Grid(7, 3, [(x, 0) for x in range(7) if x != 3] + [(x, 2) for x in range(7) if x != 3]))
+        planner = RollingHorizonPlanner(environment, window=6, replan_every=2)
+        planner.add_agent('a', (0, 1), [(6, 1)])
+        planner.add_agent('b', (6, 1), [(0, 1)])
+        positions = dict(planner.positions)
+        for _ in range(30):
+            if planner.idle:
+                break
+            after = planner.step()
+            self.assert_conflict_free(positions, after)
+            positions = after
+        self.assertTrue(planner.idle)
+        self.assertEqual(planner.positions, {'a': (6, 1), 'b': (0, 1)})
+        self.assertEqual(planner.collisions, 0)
+
+    def test_goals_in_order(self):
+        planner = RollingHorizonPlanner(Environment((8, 8)), window=4)
+        planner.add_agent(0, (0, 0), [(7, 0), (7, 7)])
+        visited = [planner.step()[0] for _ in range(14)]
+        self.assertLess(visited.index((7, 0)), visited.index((7, 7)))
+
+    def test_time_budget_bounds_replans(self):
+        environment = Environment((40, 40))
+        planner = RollingHorizonPlanner(environment, window=8, time_budget=0.0)
+        for index in range(10):
+            planner.add_agent(index, (index, 0), [(39 - index, 39)])
+        before = dict(planner.positions)
+        after = planner.step()
+        self.assertEqual(planner.budget_exhausted, 1)
+        self.assertEqual(after, before)  # Out of budget: everyone waits
+        self.assertEqual(planner.collisions, 0)
+
+    def test_swaps_count_as_collisions(self):
+        before = {'a': (0, 0), 'b': (1, 0), 'c': (2, 0)}
+        self.assertTrue(RollingHorizonPlanner._conflicting(before, {'a': (1, 0), 'b': (0, 0), 'c': (2, 0)}))
+        self.assertTrue(RollingHorizonPlanner._conflicting(before, {'a': (0, 0), 'b': (2, 0), 'c': (2, 0)}))
+        self.assertFalse(RollingHorizonPlanner._conflicting(before, {'a': (1, 0), 'b': (2, 0), 'c': (3, 0)}))
+
+    def test_invalid_replan_interval(self):
+        with self.assertRaises(ValueError):
+            RollingHorizonPlanner(Environment((4, 4)), window=4, replan_every=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from grid import Grid
+from mla_star import Environment
+from run_benchmarks import parse_line_to_positions, sweep_scenario
+
+SCEN_TEXT = ("version 1\n"
+             "0\tcorridor.map\t4\t1\t0\t0\t3\t0\t3.00000000\n"
+             "0\tcorridor.map\t4\t1\t1\t0\t0\t0\t1.00000000\n"
+             "0\tcorridor.map\t4\t1\t2\t0\t2\t0\t0.00000000\n")
+
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.scen_path = os.path.join(self.directory, 'corridor-even-1.scen')
+        with open(self.scen_path, 'w') as file:
+            file.write(SCEN_TEXT)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_parse_line_to_positions(self):
+        self.assertEqual(parse_line_to_positions(SCEN_TEXT.splitlines()[1]), ((0, 0), (3, 0)))
+        self.assertEqual(parse_line_to_positions("version 1"), (None, None))
+
+    def test_sweep_stops_at_first_failure(self):
+        environment = Environment.from_grid(Grid(4, 1))
+        records = sweep_scenario(environment, self.scen_path, time_limit=10.0, cache_dir=self.directory)
+        # The second agent would have to swap places with the first one in a corridor.
+        self.assertEqual([record['solved'] for record in records], [True, False])
+        self.assertEqual(records[1]['failure'], 'no_path')
+        self.assertGreaterEqual(records[1]['runtime'], records[0]['runtime'])
+
+    def test_sweep_respects_max_agents(self):
+        environment = Environment.from_grid(Grid(4, 1))
+        self.assertEqual(len(sweep_scenario(environment, self.scen_path, max_agents=1, cache_dir=self.directory)), 1)
+
+    def test_memory_limit_is_polled_during_search(self):
+        environment = Environment.from_grid(Grid(4, 1))
+        stops = []
+
+        def search(*args, should_stop=None, **kwargs):
+            stops.append(should_stop())
+            return None  # As if the check had aborted the search
+
+        with mock.patch('run_benchmarks.space_time_mla_star', side_effect=search), \
+                mock.patch('run_benchmarks.current_memory_mb', return_value=1e9):
+            records = sweep_scenario(environment, self.scen_path, memory_limit_mb=100, cache_dir=self.directory)
+        self.assertEqual(stops, [True])
+        self.assertEqual([record['failure'] for record in records], ['memory_limit'])
@@ -0,0 +1,73 @@
+import unittest
+
+from grid import Grid
+from mapd_problem import Agent, Map, Task
+from simulation import IDLE, TO_DELIVERY, SimulationEngine
+
+
+class TestSimulationEngine(unittest.TestCase):
+    def test_agent_completes_task(self):
+        engine = SimulationEngine(Grid(5, 5), [(0, 0)])
+        engine.assign(0, engine.add_task((2, 2), (4, 2)))
+        engine.run(2)
+        self.assertEqual(engine.position(0), (2, 2))
+        self.assertEqual(engine.phase[0], TO_DELIVERY)
+        engine.run(2)
+        self.assertEqual(engine.phase[0], IDLE)
+        self.assertEqual(engine.delivered, 1)
+        self.assertEqual(engine.task_delivered_at[0], 4)
+
+    def test_same_cell_conflict_goes_to_lowest_index(self):
+        engine = SimulationEngine(Grid(3, 1), [(0, 0), (2, 0)])
+        engine.assign(0, engine.add_task((2, 0), (2, 0)))
+        engine.assign(1, engine.add_task((0, 0), (0, 0)))
+        engine.step()
+        self.assertEqual(engine.position(0), (1, 0))
+        self.assertEqual(engine.position(1), (2, 0))
+        self.assertEqual(int(engine.occupancy.sum()), 2)
+
+    def test_obstacles_block_moves(self):
+        engine = SimulationEngine(Grid(3, 1, obstacles=[(1, 0)]), [(0, 0)])
+        engine.assign(0, engine.add_task((2, 0), (2, 0)))
+        engine.run(3)
+        self.assertEqual(engine.position(0), (0, 0))
+
+    def test_task_queue(self):
+        engine = SimulationEngine(Grid(4, 1), [(0, 0)])
+        engine.assign(0, engine.add_task((1, 0), (2, 0)))
+        engine.assign(0, engine.add_task((3, 0), (0, 0)))
+        engine.run(6)
+        self.assertEqual(engine.delivered, 2)
+        self.assertEqual(engine.position(0), (0, 0))
+
+    def test_run_vectorized_writes_back_to_map(self):
+        agent = Agent(name="A", location=(0, 0))
+        game_map = Map(width=5, height=5, obstacles=[], agents=[agent])
+        task = Task(name="Task 1", pickup_location=(2, 2), delivery_location=(4, 4))
+        agent.assign_task(task)
+        game_map.run_vectorized(4)
+        self.assertTrue(task.picked_up)
+        self.assertTrue(task.delivered)
+        self.assertEqual(agent.location, (4, 4))
+        self.assertIsNone(agent.current_task)
+
+    def test_assign_tasks_to_idle_agents(self):
+        engine = SimulationEngine(Grid(5, 1), [(0, 0), (4, 0)])
+        near_right = engine.add_task((3, 0), (3, 0))
+        near_left = engine.add_task((1, 0), (1, 0))
+        extra = engine.add_task((2, 0), (2, 0))
+        self.assertEqual(engine.assign_tasks([near_right, near_left, extra], strategy='hungarian'), [extra])
+        self.assertEqual(engine.task[0], near_left)
+        self.assertEqual(engine.task[1], near_right)
+
+    def test_retired_task_slots_are_reused(self):
+        engine = SimulationEngine(Grid(3, 1), [(0, 0)])
+        first = engine.add_task((1, 0), (2, 0))
+        with self.assertRaises(ValueError):
+            engine.retire_task(first)
+        engine.assign(0, first)
+        engine.run(2)
+        self.assertEqual(engine.last_delivered.tolist(), [first])
+        engine.retire_task(first)
+        self.assertEqual(engine.add_task((0, 0), (1, 0)), first)
+        self.assertEqual((engine.num_tasks, engine.active_tasks), (1, 1))